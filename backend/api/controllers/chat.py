@@ -8,13 +8,13 @@ Supports agentic tool calling (email drafting, interest calculation).
 import logging
 import os
 import tempfile
-import json
+import orjson
 from typing import List, Dict, Optional, Any, AsyncGenerator
 from fastapi import HTTPException, File, UploadFile
 from pydantic import BaseModel
 
 from api.services.conversation_service import ConversationService
-from api.services.email_service import send_email
+from api.services.email_service import send_email_async
 from api.services.ocr_service import get_ocr_service
 from api.daos.conversation_dao import ConversationDAO, MessageDAO
 from api.daos.document_dao import DocumentDAO
@@ -87,7 +87,7 @@ class ChatController:
         self.message_dao = MessageDAO()
         self.document_dao = DocumentDAO()
 
-    def process_chat_message(self, request: ChatRequest) -> ChatResponse:
+    async def process_chat_message(self, request: ChatRequest) -> ChatResponse:
         """
         Process chat message and get AI response.
         Saves both user message and AI response to the database.
@@ -111,9 +111,17 @@ class ChatController:
                 for msg in request.messages
             ]
 
+            # The request's last message is the user's new turn; hand it to
+            # the service so it doesn't re-scan history for it
+            latest_message = request.messages[-1] if request.messages else None
+            user_query = (
+                latest_message.content
+                if latest_message and latest_message.role == "user"
+                else None
+            )
+
             # Save the latest user message to database (if it's a text message)
-            if request.message_type == "text" and len(request.messages) > 0:
-                latest_message = request.messages[-1]
+            if request.message_type == "text" and latest_message:
                 if latest_message.role == "user":
                     user_message = MessageCreate(
                         conversation_id=request.conversation_id,
@@ -124,10 +132,11 @@ class ChatController:
                     self.message_dao.create_message(user_message)
 
             # Get AI response
-            result = self.conversation_service.get_ai_response(
+            result = await self.conversation_service.get_ai_response(
                 messages=messages_dict,
                 conversation_id=request.conversation_id,
-                message_type=request.message_type
+                message_type=request.message_type,
+                user_query=user_query,
             )
 
             # Build metadata for the saved message
@@ -159,7 +168,7 @@ class ChatController:
                 detail=f"Error processing chat message: {str(e)}"
             )
 
-    def upload_document(
+    async def upload_document(
         self,
         file: UploadFile,
         conversation_id: str
@@ -227,7 +236,7 @@ class ChatController:
                     doc_type = DocumentType.INVOICE  # Default to invoice for MSME use case
 
                 # Process document with OCR service
-                extracted_result = self.ocr_service.process_document(
+                extracted_result = await self.ocr_service.process_document_async(
                     file_path=tmp_path,
                     file_type=file.content_type,
                     document_type=doc_type.value
@@ -297,7 +306,7 @@ class ChatController:
                 detail=f"Error uploading document: {str(e)}"
             )
 
-    def summarize_conversation(
+    async def summarize_conversation(
         self,
         conversation_id: str,
         messages: List[ChatMessage]
@@ -321,7 +330,7 @@ class ChatController:
                 for msg in messages
             ]
 
-            result = self.conversation_service.summarize_conversation(messages_dict)
+            result = await self.conversation_service.summarize_conversation(messages_dict)
 
             return {
                 "conversation_id": conversation_id,
@@ -334,7 +343,7 @@ class ChatController:
                 detail=f"Error summarizing conversation: {str(e)}"
             )
 
-    def send_email_to_buyer(self, request: SendEmailRequest) -> SendEmailResponse:
+    async def send_email_to_buyer(self, request: SendEmailRequest) -> SendEmailResponse:
         """
         Send a previously drafted email to the buyer.
 
@@ -353,7 +362,7 @@ class ChatController:
         try:
             self.conversation_dao.get_or_create_conversation(request.conversation_id)
 
-            result = send_email(
+            result = await send_email_async(
                 to_email=request.to_email,
                 subject=request.subject,
                 body_html=request.body_html,
@@ -425,9 +434,17 @@ class ChatController:
                 for msg in request.messages
             ]
 
+            # The request's last message is the user's new turn; hand it to
+            # the service so it doesn't re-scan history for it
+            latest_message = request.messages[-1] if request.messages else None
+            user_query = (
+                latest_message.content
+                if latest_message and latest_message.role == "user"
+                else None
+            )
+
             # Save the latest user message to database (if it's a text message)
-            if request.message_type == "text" and len(request.messages) > 0:
-                latest_message = request.messages[-1]
+            if request.message_type == "text" and latest_message:
                 if latest_message.role == "user":
                     user_message = MessageCreate(
                         conversation_id=request.conversation_id,
@@ -446,53 +463,34 @@ class ChatController:
             async for event in self.conversation_service.get_ai_response_stream(
                 messages=messages_dict,
                 conversation_id=request.conversation_id,
-                message_type=request.message_type
+                message_type=request.message_type,
+                user_query=user_query,
             ):
                 event_type = event.get("type")
 
                 if event_type == "tool_start":
                     # Emit tool execution start
-                    yield f"event: tool_start\ndata: {json.dumps(event['data'])}\n\n"
+                    yield f"event: tool_start\ndata: {orjson.dumps(event['data']).decode()}\n\n"
 
                 elif event_type == "tool_end":
                     # Emit tool execution end
-                    yield f"event: tool_end\ndata: {json.dumps(event['data'])}\n\n"
-
-                    # Capture email draft if available
-                    if event['data'].get('tool') == 'draft_demand_notice_email':
-                        result = event['data'].get('result', {})
-                        if isinstance(result, str):
-                            try:
-                                result = json.loads(result)
-                            except:
-                                pass
-                        if isinstance(result, dict) and result.get('status') == 'drafted':
-                            email_draft = result
-
-                    # Capture completeness if available
-                    if event['data'].get('tool') == 'verify_document':
-                        result = event['data'].get('result', {})
-                        if isinstance(result, str):
-                            try:
-                                result = json.loads(result)
-                            except:
-                                pass
-                        if isinstance(result, dict):
-                            completeness = result
+                    yield f"event: tool_end\ndata: {orjson.dumps(event['data']).decode()}\n\n"
+
+                elif event_type == "tool_error":
+                    # Tool call rejected before execution (malformed arguments)
+                    yield f"event: tool_error\ndata: {orjson.dumps(event['data']).decode()}\n\n"
 
                 elif event_type == "content":
                     # Stream content token
                     token = event.get("content", "")
                     full_response += token
-                    yield f"event: message\ndata: {json.dumps({'content': token})}\n\n"
+                    yield f"event: message\ndata: {orjson.dumps({'content': token}).decode()}\n\n"
 
                 elif event_type == "done":
-                    # Final event with metadata
+                    # Final event with metadata (send_email action already included)
                     actions = event.get("actions", [])
-
-                    # If email was drafted, add send_email action
-                    if email_draft and email_draft.get("status") == "drafted":
-                        actions.append({"type": "send_email", "label": "Send Email"})
+                    email_draft = event.get("email_draft")
+                    completeness = event.get("completeness")
 
                     done_data = {
                         "actions": actions,
@@ -503,7 +501,7 @@ class ChatController:
                     if completeness:
                         done_data["completeness"] = completeness
 
-                    yield f"event: done\ndata: {json.dumps(done_data)}\n\n"
+                    yield f"event: done\ndata: {orjson.dumps(done_data).decode()}\n\n"
 
             # Save AI response to database
             ai_metadata: Dict[str, Any] = {"actions": actions}
@@ -522,4 +520,4 @@ class ChatController:
         except Exception as e:
             logger.exception("Error in streaming chat")
             error_data = {"error": str(e)}
-            yield f"event: error\ndata: {json.dumps(error_data)}\n\n"
+            yield f"event: error\ndata: {orjson.dumps(error_data).decode()}\n\n"
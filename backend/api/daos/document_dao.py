@@ -218,6 +218,50 @@ class DocumentDAO:
         except Exception as e:
             raise Exception(f"Error verifying document by type: {str(e)}")
 
+    def verify_and_get_completeness(
+        self,
+        conversation_id: str,
+        document_type: str,
+        verified: bool = True,
+        notes: str = "",
+    ) -> DocumentCompleteness:
+        """
+        Verify the most recent document of a type and return the updated completeness.
+
+        Supabase's REST client has no multi-statement transactions, so this
+        fetches the conversation's documents once, updates the matching row,
+        and computes completeness from that same list with the updated row
+        swapped in - one conversation lookup and one SELECT instead of two.
+
+        Args:
+            conversation_id: Conversation identifier
+            document_type: DocumentType value string (e.g. "invoice")
+            verified: True to verify, False to reject
+            notes: Optional officer notes
+
+        Returns:
+            DocumentCompleteness reflecting the verification
+        """
+        try:
+            documents = self.get_documents_by_conversation(conversation_id)
+            docs = [d for d in documents if d.document_type == document_type]
+
+            if docs:
+                latest_doc = max(docs, key=lambda d: d.created_at)
+                status = VerificationStatus.VERIFIED if verified else VerificationStatus.REJECTED
+                update = DisputeDocumentUpdate(
+                    verification_status=status,
+                    officer_notes=notes or None,
+                )
+                updated = self.update_document(latest_doc.id, update)
+                if updated:
+                    documents = [updated if d.id == updated.id else d for d in documents]
+
+            return self._build_completeness(conversation_id, documents)
+
+        except Exception as e:
+            raise Exception(f"Error verifying document and calculating completeness: {str(e)}")
+
     def get_completeness(self, conversation_id: str) -> DocumentCompleteness:
         """
         Check document completeness for a conversation.
@@ -231,54 +275,60 @@ class DocumentDAO:
         """
         try:
             documents = self.get_documents_by_conversation(conversation_id)
-
-            # Track best status per doc type (verified > pending > rejected)
-            status_priority = {"verified": 3, "needs_clarification": 2, "pending": 1, "rejected": 0}
-            type_to_status: dict = {}
-            status_summary = {"pending": 0, "verified": 0, "rejected": 0, "needs_clarification": 0}
-            uploaded_types = set()
-            verified_count = 0
-
-            for doc in documents:
-                dt = doc.document_type
-                status = doc.verification_status
-                uploaded_types.add(dt)
-                if status in status_summary:
-                    status_summary[status] += 1
-                if status == "verified":
-                    verified_count += 1
-                # Keep the best status per type
-                if dt not in type_to_status or status_priority.get(status, 0) > status_priority.get(type_to_status[dt], 0):
-                    type_to_status[dt] = status
-
-            # Build per-document status for all 5 required types
-            required_type_values = [dt.value for dt in REQUIRED_DOCUMENT_TYPES]
-            per_document = {req: type_to_status.get(req, "missing") for req in required_type_values}
-
-            missing_types = [t for t in required_type_values if t not in uploaded_types]
-            uploaded_list = [t for t in uploaded_types if t in required_type_values]
-
-            total_required = len(required_type_values)
-            uploaded_count = len(uploaded_list)
-            # Percentage based on verified required docs only
-            verified_required = sum(1 for t in required_type_values if type_to_status.get(t) == "verified")
-            completeness_pct = (verified_required / total_required * 100) if total_required > 0 else 0
-
-            return DocumentCompleteness(
-                conversation_id=conversation_id,
-                total_required=total_required,
-                uploaded_count=uploaded_count,
-                completeness_percentage=round(completeness_pct, 1),
-                uploaded_types=list(uploaded_types),
-                missing_types=missing_types,
-                verified_count=verified_count,
-                status_summary=status_summary,
-                per_document=per_document,
-            )
+            return self._build_completeness(conversation_id, documents)
 
         except Exception as e:
             raise Exception(f"Error calculating completeness: {str(e)}")
 
+    @staticmethod
+    def _build_completeness(
+        conversation_id: str, documents: List[DisputeDocumentResponse]
+    ) -> DocumentCompleteness:
+        """Aggregate a conversation's documents into a DocumentCompleteness."""
+        # Track best status per doc type (verified > pending > rejected)
+        status_priority = {"verified": 3, "needs_clarification": 2, "pending": 1, "rejected": 0}
+        type_to_status: dict = {}
+        status_summary = {"pending": 0, "verified": 0, "rejected": 0, "needs_clarification": 0}
+        uploaded_types = set()
+        verified_count = 0
+
+        for doc in documents:
+            dt = doc.document_type
+            status = doc.verification_status
+            uploaded_types.add(dt)
+            if status in status_summary:
+                status_summary[status] += 1
+            if status == "verified":
+                verified_count += 1
+            # Keep the best status per type
+            if dt not in type_to_status or status_priority.get(status, 0) > status_priority.get(type_to_status[dt], 0):
+                type_to_status[dt] = status
+
+        # Build per-document status for all 5 required types
+        required_type_values = [dt.value for dt in REQUIRED_DOCUMENT_TYPES]
+        per_document = {req: type_to_status.get(req, "missing") for req in required_type_values}
+
+        missing_types = [t for t in required_type_values if t not in uploaded_types]
+        uploaded_list = [t for t in uploaded_types if t in required_type_values]
+
+        total_required = len(required_type_values)
+        uploaded_count = len(uploaded_list)
+        # Percentage based on verified required docs only
+        verified_required = sum(1 for t in required_type_values if type_to_status.get(t) == "verified")
+        completeness_pct = (verified_required / total_required * 100) if total_required > 0 else 0
+
+        return DocumentCompleteness(
+            conversation_id=conversation_id,
+            total_required=total_required,
+            uploaded_count=uploaded_count,
+            completeness_percentage=round(completeness_pct, 1),
+            uploaded_types=list(uploaded_types),
+            missing_types=missing_types,
+            verified_count=verified_count,
+            status_summary=status_summary,
+            per_document=per_document,
+        )
+
     def get_pending_documents(self, limit: int = 50) -> List[DisputeDocumentResponse]:
         """
         Get all pending documents for officer review.
@@ -7,6 +7,7 @@ import os
 from api.routes.speech_to_text import router as speech_to_text_router
 from api.routes.chat import router as chat_router
 from api.routes.documents import router as documents_router
+from api.services.ocr_service import get_ocr_service
 from api.services.rag_service import get_rag_service
 
 load_dotenv()
@@ -19,6 +20,7 @@ async def lifespan(app: FastAPI):
     logger.info("Loading RAG embedding model...")
     get_rag_service()._ensure_loaded()
     logger.info("RAG model ready.")
+    get_ocr_service().warm_up()
     yield
 
 
@@ -3,9 +3,10 @@ Pydantic models for dispute documents.
 Used for officer review workflow and document verification.
 """
 
+import re
 from datetime import datetime
-from typing import Optional, Dict, Any
-from pydantic import BaseModel, Field
+from typing import Annotated, Optional, Dict, Any, List
+from pydantic import BaseModel, BeforeValidator, ConfigDict, Field
 from enum import Enum
 
 
@@ -122,3 +123,157 @@ OPTIONAL_DOCUMENT_TYPES = [
     DocumentType.LEGAL_NOTICE,
     DocumentType.OTHER,
 ]
+
+
+_CURRENCY_PREFIX_RE = re.compile(r"^\s*(?:₹|rs\.?|inr)\s*", re.IGNORECASE)
+# Trailing markers on Indian amounts: "1,00,000/-", "500/= only", "750 INR"
+_CURRENCY_SUFFIX_RE = re.compile(r"(?:\s*(?:/-|/=|only|inr))+\s*$", re.IGNORECASE)
+
+
+def _parse_amount(value: Any) -> Any:
+    """Accept amounts written like "₹1,00,000", "Rs. 500.00" or "Rs. 1,00,000/-"."""
+    if isinstance(value, str):
+        cleaned = _CURRENCY_PREFIX_RE.sub("", value)
+        cleaned = _CURRENCY_SUFFIX_RE.sub("", cleaned).replace(",", "").strip()
+        return cleaned or None
+    return value
+
+
+def _strip_currency(value: Any) -> Any:
+    """Drop a leading currency marker from amounts kept as text; formatters add ₹."""
+    if isinstance(value, str):
+        return _CURRENCY_PREFIX_RE.sub("", value).strip() or None
+    return value
+
+
+def _as_list(value: Any) -> Any:
+    """Wrap a single value the model returned where a list was asked for."""
+    if isinstance(value, (str, dict)):
+        return [value] if value else None
+    return value
+
+
+Amount = Annotated[Optional[float], BeforeValidator(_parse_amount)]
+# Amounts that may carry words ("5,00,000 with interest"), kept as text
+AmountText = Annotated[Optional[str], BeforeValidator(_strip_currency)]
+ItemList = Annotated[Optional[List[Any]], BeforeValidator(_as_list)]
+TextList = Annotated[Optional[List[str]], BeforeValidator(_as_list)]
+
+
+class ExtractedDocument(BaseModel):
+    """Base for LLM extraction results; fields the schema doesn't name are kept."""
+    model_config = ConfigDict(extra="allow", coerce_numbers_to_str=True)
+
+
+class InvoiceExtraction(ExtractedDocument):
+    """Structured fields extracted from an invoice."""
+    invoice_number: Optional[str] = None
+    invoice_date: Optional[str] = None
+    due_date: Optional[str] = None
+    seller_name: Optional[str] = None
+    seller_gstin: Optional[str] = None
+    buyer_name: Optional[str] = None
+    buyer_gstin: Optional[str] = None
+    total_amount: Amount = None
+    tax_amount: Amount = None
+    items: ItemList = None
+    payment_terms: Optional[str] = None
+
+
+class PurchaseOrderExtraction(ExtractedDocument):
+    """Structured fields extracted from a purchase order."""
+    po_number: Optional[str] = None
+    po_date: Optional[str] = None
+    buyer_name: Optional[str] = None
+    buyer_address: Optional[str] = None
+    seller_name: Optional[str] = None
+    items: ItemList = None
+    total_amount: Amount = None
+    delivery_date: Optional[str] = None
+    payment_terms: Optional[str] = None
+
+
+class MSMECertificateExtraction(ExtractedDocument):
+    """Structured fields extracted from an MSME/Udyam registration certificate."""
+    udyam_registration_number: Optional[str] = None
+    enterprise_name: Optional[str] = None
+    enterprise_type: Optional[str] = None
+    owner_name: Optional[str] = None
+    date_of_registration: Optional[str] = None
+    date_of_incorporation: Optional[str] = None
+    major_activity: Optional[str] = None
+    address: Optional[str] = None
+    district: Optional[str] = None
+    state: Optional[str] = None
+    mobile: Optional[str] = None
+    email: Optional[str] = None
+
+
+class DeliveryProofExtraction(ExtractedDocument):
+    """Structured fields extracted from a delivery challan or receipt."""
+    delivery_date: Optional[str] = None
+    delivery_challan_number: Optional[str] = None
+    receiver_name: Optional[str] = None
+    receiver_signature: Optional[bool] = None
+    sender_name: Optional[str] = None
+    recipient_company: Optional[str] = None
+    items_delivered: ItemList = None
+    vehicle_number: Optional[str] = None
+    remarks: Optional[str] = None
+
+
+class CommunicationExtraction(ExtractedDocument):
+    """Structured fields extracted from an email or letter."""
+    date: Optional[str] = None
+    sender: Optional[str] = Field(default=None, alias="from")
+    to: Optional[str] = None
+    subject: Optional[str] = None
+    key_points: TextList = None
+    payment_mentioned: Optional[bool] = None
+    amount_mentioned: AmountText = None
+    deadline_mentioned: Optional[str] = None
+    tone: Optional[str] = None
+
+
+class BankStatementExtraction(ExtractedDocument):
+    """Structured fields extracted from a bank statement."""
+    account_holder_name: Optional[str] = None
+    account_number: Optional[str] = None
+    bank_name: Optional[str] = None
+    statement_period: Optional[str] = None
+    transactions: ItemList = None
+    opening_balance: AmountText = None
+    closing_balance: AmountText = None
+    payment_received_from: Optional[str] = None
+
+
+class LegalNoticeExtraction(ExtractedDocument):
+    """Structured fields extracted from a legal notice."""
+    notice_date: Optional[str] = None
+    from_party: Optional[str] = None
+    to_party: Optional[str] = None
+    lawyer_name: Optional[str] = None
+    subject_matter: Optional[str] = None
+    amount_claimed: AmountText = None
+    deadline_given: Optional[str] = None
+    legal_sections_cited: TextList = None
+    relief_sought: Optional[str] = None
+
+
+class GenericExtraction(ExtractedDocument):
+    """Fields of an unclassified document; only the ones formatters rely on are typed."""
+    parties: TextList = None
+
+
+# Document types whose extraction output is validated against a schema
+EXTRACTION_MODELS = {
+    DocumentType.INVOICE.value: InvoiceExtraction,
+    DocumentType.PURCHASE_ORDER.value: PurchaseOrderExtraction,
+    DocumentType.MSME_CERTIFICATE.value: MSMECertificateExtraction,
+    DocumentType.DELIVERY_PROOF.value: DeliveryProofExtraction,
+    DocumentType.COMMUNICATION.value: CommunicationExtraction,
+    DocumentType.BANK_STATEMENT.value: BankStatementExtraction,
+    DocumentType.LEGAL_NOTICE.value: LegalNoticeExtraction,
+    DocumentType.OTHER.value: GenericExtraction,
+    "generic": GenericExtraction,
+}
@@ -38,7 +38,7 @@ async def chat(request: ChatRequest):
     Returns:
         ChatResponse with AI's response and actions
     """
-    return chat_controller.process_chat_message(request)
+    return await chat_controller.process_chat_message(request)
 
 
 @router.post("/chat/stream")
@@ -79,7 +79,7 @@ async def send_email(request: SendEmailRequest):
     Returns:
         SendEmailResponse with send status
     """
-    return chat_controller.send_email_to_buyer(request)
+    return await chat_controller.send_email_to_buyer(request)
 
 
 @router.post("/chat/upload-document", response_model=DocumentUploadResponse)
@@ -97,7 +97,7 @@ async def upload_document(
     Returns:
         DocumentUploadResponse with extracted data
     """
-    return chat_controller.upload_document(file, conversation_id)
+    return await chat_controller.upload_document(file, conversation_id)
 
 
 @router.get("/conversations/{conversation_id}", response_model=ConversationResponse)
@@ -3,17 +3,21 @@ Services package for business logic.
 """
 
 from .conversation_service import ConversationService
-from .email_service import send_email
-from .interest_calculator import calculate_section15_interest
+from .email_service import send_email, send_email_async
+from .interest_calculator import calculate_section15_interest, calculate_section15_interest_batch
 from .ocr_service import OCRService, get_ocr_service
 from .rag_service import RAGService, get_rag_service
+from .semantic_cache import SemanticCache
 
 __all__ = [
     'ConversationService',
     'send_email',
+    'send_email_async',
     'calculate_section15_interest',
+    'calculate_section15_interest_batch',
     'OCRService',
     'get_ocr_service',
     'RAGService',
     'get_rag_service',
+    'SemanticCache',
 ]
@@ -6,20 +6,160 @@ Uses RAG for dynamic knowledge retrieval from MSMED Act and other documents.
 
 from dotenv import load_dotenv
 import os
-import json
+import asyncio
+import time
+import hashlib
 import logging
-from openai import OpenAI
-from typing import List, Dict, Any
+import re
+import string
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import httpx
+import orjson
+import tiktoken
+from openai import AsyncOpenAI
+from typing import List, Dict, Any, Optional, Tuple
 
 from .rag_service import get_rag_service
+from .semantic_cache import SemanticCache
 from .interest_calculator import calculate_section15_interest
 from api.utils.datetime_utils import get_current_date
 from api.daos.document_dao import DocumentDAO
+from api.models.document import DocumentCompleteness, DisputeDocumentResponse, REQUIRED_DOCUMENT_TYPES
 
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Connection pool shared by every OpenAI call in this process
+HTTP_MAX_CONNECTIONS = 200
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 50
+HTTP_TIMEOUT_SECONDS = 60.0  # generous read timeout for long streamed completions
+HTTP_CONNECT_TIMEOUT_SECONDS = 5.0  # fail fast when the API is unreachable
+
+# Blocking tool/DAO work runs on its own bounded pool so a burst of Supabase
+# calls can't starve the default executor used for embedding and re-ranking
+DAO_POOL_MAX_WORKERS = 16
+_DAO_POOL = ThreadPoolExecutor(max_workers=DAO_POOL_MAX_WORKERS, thread_name_prefix="dao")
+
+# Token budget for conversation history sent with each request. Older turns
+# beyond this are dropped; the latest message is always kept.
+MAX_HISTORY_TOKENS = 6000
+TOKENIZER_ENCODING = "o200k_base"  # gpt-4o / gpt-4o-mini tokenizer
+
+# Reuse answers to near-identical tool-free questions across conversations.
+# Only opening questions are shared, per phase: a later turn's answer can
+# draw on the user's own case, and short replies ("yes", "ok") only make
+# sense in their conversation.
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+SEMANTIC_CACHE_MIN_QUERY_CHARS = 20
+
+# Answer unambiguous interest-calculation questions without calling the model.
+# Off by default: the intent match only sees the user's text, not where the
+# conversation is in intake.
+INTEREST_SHORTCUT_ENABLED = os.getenv("INTEREST_SHORTCUT_ENABLED", "false").lower() == "true"
+
+# Summaries are cached per exact conversation content; any new message
+# changes the key, so stale entries simply age out. Summary calls are
+# pinned (temperature 0, top_p 1, fixed seed) for reproducible output, so
+# a cached summary stands in for a fresh call and can be kept for a day.
+SUMMARY_CACHE_TTL_SECONDS = 86400
+SUMMARY_CACHE_MAX_ENTRIES = 4096
+SUMMARY_SEED = 42
+
+# Conversations marshalled into a single batch summarization request
+SUMMARY_BATCH_SIZE = 8
+
+# Offline summaries go through the OpenAI Batch API (half price, separate
+# rate-limit pool). Jobs still unfinished after this long are cancelled and
+# summarized online instead.
+SUMMARY_BATCH_SLA_SECONDS = int(os.getenv("SUMMARY_BATCH_SLA_SECONDS", "3600"))
+_BATCH_PENDING_STATUSES = frozenset({"validating", "in_progress", "finalizing"})
+
+# RAG retrieval is skipped for short confirmations ("ok", "uploaded") and
+# reused when a follow-up in the same conversation embeds almost identically
+# to the previous turn's query.
+RAG_MIN_QUERY_CHARS = 10
+RAG_REUSE_SIMILARITY = 0.95
+RAG_CACHE_TTL_SECONDS = 600
+RAG_CACHE_MAX_ENTRIES = 1000
+
+# Tool-free answers are replayed for byte-identical requests (retries,
+# double taps, common openers) without calling the model again
+RESPONSE_CACHE_TTL_SECONDS = 3600
+RESPONSE_CACHE_MAX_ENTRIES = 1024
+REPLAY_CHUNK_CHARS = 20
+
+# Streamed tokens are coalesced into content events: the first flush is a
+# single token for TTFT, later ones grow geometrically up to the cap
+STREAM_FLUSH_INITIAL_CHARS = 1
+STREAM_FLUSH_GROWTH = 3
+STREAM_FLUSH_MAX_CHARS = 50
+STREAM_FLUSH_INTERVAL_SECONDS = 0.04
+
+# Retrieved context is also shared across conversations: common questions
+# ("what documents do I need?") embed close together regardless of who asks.
+RAG_CONTEXT_CACHE_SIMILARITY = 0.95
+RAG_CONTEXT_CACHE_MAX_ENTRIES = 512
+RAG_CONTEXT_CACHE_TTL_SECONDS = 3600
+
+# Long conversations are compacted: the last HISTORY_KEEP_RECENT messages are
+# sent verbatim and everything older is replaced by a "case state" block.
+# Its facts come from the conversation's documents and the tool results
+# recorded for it; only the narrative of the older turns is summarized by the
+# LLM, in the background once HISTORY_SUMMARY_INTERVAL new messages have
+# piled up beyond the verbatim tail.
+HISTORY_COMPACTION_ENABLED = os.getenv("HISTORY_COMPACTION_ENABLED", "false").lower() == "true"
+HISTORY_KEEP_RECENT = 6
+HISTORY_SUMMARY_INTERVAL = 10
+CASE_STATE_MAX_ENTRIES = 1000
+
+# How long a completeness result from verify_document is trusted by the
+# drafting guardrail before it goes back to the database.
+COMPLETENESS_CACHE_TTL_SECONDS = 30
+# Tools that update or read document completeness. Tool calls otherwise run
+# concurrently; these run one at a time per conversation, in call order, so
+# each sees the verifications requested before it.
+_COMPLETENESS_TOOLS = frozenset({"verify_document", "draft_demand_notice_email"})
+
+SUMMARY_SCHEMA = """{
+  "buyer_name": string,
+  "amount_inr": number,
+  "invoice_numbers": [string],
+  "invoice_dates": [string],
+  "payment_due_date": string,
+  "days_overdue": integer,
+  "dispute_description": string,
+  "documents": [string]
+}"""
+
+SUMMARY_PROMPT = f"""Based on this conversation, extract the following information about the MSME payment dispute and return it as a JSON object with exactly these keys:
+
+{SUMMARY_SCHEMA}
+
+If information is not available, set the value to null. Return ONLY the JSON object."""
+
+CASE_NARRATIVE_PROMPT = """Summarize the MSME payment dispute conversation above in at most 5 sentences for an assistant continuing it: what the user asked, what the assistant explained or promised, and what is still open. Document details and calculation results are tracked separately, so don't restate them. Return only the summary."""
+
+# Extracted fields shown in the case state, per document type
+CASE_DOCUMENT_FIELDS = {
+    "invoice": ("invoice_number", "invoice_date", "buyer_name", "seller_name", "total_amount"),
+    "purchase_order": ("po_number", "po_date", "buyer_name", "total_amount"),
+    "msme_certificate": ("enterprise_name", "udyam_registration_number"),
+    "delivery_proof": ("delivery_date",),
+}
+_EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+
+BATCH_SUMMARY_PROMPT = f"""Below are several separate MSME payment dispute conversations, each marked with "=== CONVERSATION <n> ===". Summarize each one independently.
+
+Return a JSON object of the form {{"summaries": [...]}} where the array has exactly one entry per conversation, in the same order, and each entry has exactly these keys:
+
+{SUMMARY_SCHEMA}
+
+If information is not available, set the value to null. Return ONLY the JSON object."""
+
 # Tool definitions for Groq's native tool calling
 TOOLS = [
     {
@@ -167,96 +307,165 @@ TOOLS = [
     },
 ]
 
+# Delimiters wrapped around retrieved knowledge. The context goes in its own
+# system message after the history so the static prompt + TOOLS + earlier
+# turns stay a byte-identical prefix for OpenAI prompt caching.
+_RAG_HEADER = "--- RELEVANT KNOWLEDGE FROM MSMED ACT & DOCUMENTS ---\n\n"
+_RAG_FOOTER = "\n\n--- END OF CONTEXT ---"
 
 
-
-def _build_demand_notice_draft(args: Dict[str, Any]) -> Dict[str, Any]:
+@lru_cache(maxsize=512)
+def _wrap_rag_context(rag_context: str) -> str:
     """
-    Build an HTML demand notice email draft from structured arguments.
+    Add the knowledge header/footer to retrieved context.
 
-    Returns a dict with subject, body_html, and metadata -- does NOT send.
+    Follow-up turns usually reuse the very same context string (see the RAG
+    caches), so the multi-KB concatenation is memoized; str hashes are cached
+    on the object, making repeat lookups cheap.
     """
-    buyer_name = args["buyer_name"]
-    msme_name = args["msme_name"]
-    principal = args["principal_amount"]
-    days = args["days_overdue"]
-    total_due = args["total_due"]
-    notice_date = args["notice_date"]
-    invoice_number = args.get("invoice_number", "N/A")
-    invoice_date = args.get("invoice_date", "N/A")
-    interest_amount = args.get("interest_amount", round(total_due - principal, 2))
-    buyer_email = args.get("buyer_email", "")
+    return "".join((_RAG_HEADER, rag_context, _RAG_FOOTER))
 
-    subject = f"Demand Notice under MSMED Act, 2006 - Outstanding Payment of INR {total_due:,.2f}"
+# Keywords in the AI response that trigger frontend action buttons
+UPLOAD_DOCUMENT_KEYWORDS = frozenset({
+    "upload", "document", "invoice", "purchase order", "receipt", "contract",
+})
+CREATE_CLAIM_KEYWORDS = frozenset({
+    "ready to file", "file your claim", "submit", "proceed with filing",
+})
 
-    body_html = f"""
-<div style="font-family: 'Segoe UI', Arial, sans-serif; max-width: 700px; margin: auto; color: #222;">
-  <div style="text-align: center; padding: 20px 0; border-bottom: 3px solid #1a237e;">
-    <h2 style="margin: 0; color: #1a237e;">DEMAND NOTICE</h2>
-    <p style="margin: 4px 0 0; color: #555;">Under Section 15 of the Micro, Small and Medium Enterprises Development Act, 2006</p>
-  </div>
 
-  <div style="padding: 24px 0;">
-    <p><strong>Date:</strong> {notice_date}</p>
-    <p><strong>To:</strong> {buyer_name}</p>
-    <p><strong>From:</strong> {msme_name}</p>
+# Frontend action emitted for each keyword set, in display order
+_KEYWORD_ACTIONS = (
+    ("upload_document", "Upload Document", UPLOAD_DOCUMENT_KEYWORDS),
+    ("create_claim", "File Dispute Claim", CREATE_CLAIM_KEYWORDS),
+)
 
-    <p style="margin-top: 20px;">Dear Sir/Madam,</p>
 
-    <p>This is to bring to your attention that the payment against the following invoice(s) has been outstanding for <strong>{days} days</strong> beyond the agreed payment date, in violation of Section 15 of the MSMED Act, 2006:</p>
+def _compile_action_pattern() -> "re.Pattern[str]":
+    """
+    Compile every action's keywords into one case-insensitive alternation.
 
-    <table style="width: 100%; border-collapse: collapse; margin: 16px 0;">
-      <tr style="background: #e8eaf6;">
-        <th style="padding: 10px; border: 1px solid #ccc; text-align: left;">Particulars</th>
-        <th style="padding: 10px; border: 1px solid #ccc; text-align: right;">Amount (INR)</th>
-      </tr>
-      <tr>
-        <td style="padding: 10px; border: 1px solid #ccc;">Invoice No: {invoice_number} (Dated: {invoice_date})</td>
-        <td style="padding: 10px; border: 1px solid #ccc; text-align: right;">{principal:,.2f}</td>
-      </tr>
-      <tr>
-        <td style="padding: 10px; border: 1px solid #ccc;">Interest under Section 16 (3x RBI bank rate, compounded monthly, {days} days)</td>
-        <td style="padding: 10px; border: 1px solid #ccc; text-align: right;">{interest_amount:,.2f}</td>
-      </tr>
-      <tr style="background: #fff3e0; font-weight: bold;">
-        <td style="padding: 10px; border: 1px solid #ccc;">Total Amount Due</td>
-        <td style="padding: 10px; border: 1px solid #ccc; text-align: right;">{total_due:,.2f}</td>
-      </tr>
-    </table>
+    Each action gets a named group so a single scan over the response
+    tells us which actions matched. All keywords are ASCII, so scanning
+    the raw response avoids lowercasing a copy of it. Longest keywords go
+    first so overlapping phrases win.
+    """
+    groups = []
+    for action_type, _, keywords in _KEYWORD_ACTIONS:
+        alternation = "|".join(re.escape(kw) for kw in sorted(keywords, key=lambda kw: (-len(kw), kw)))
+        groups.append(f"(?P<{action_type}>{alternation})")
+    return re.compile("|".join(groups), re.IGNORECASE | re.ASCII)
+
+
+_ACTION_KEYWORDS_RE = _compile_action_pattern()
+
+
+# Explicit "interest on Rs X overdue N days" questions are answered straight
+# from the calculator. The normal path spends one completion emitting the
+# tool call and a second one just re-wording its numbers. Anything ambiguous
+# (no currency marker, several amounts, drafting intent) goes to the model.
+_INTEREST_INTENT_RE = re.compile(r"\binterest\b|ब्याज", re.IGNORECASE)
+_INTEREST_EXCLUDE_RE = re.compile(r"\b(?:draft|notice|email|letter|document|upload)", re.IGNORECASE)
+_DAYS_RE = re.compile(r"(\d{1,5})\s*(?:days?\b|दिन)", re.IGNORECASE)
+_AMOUNT_RE = re.compile(
+    r"(?:(?:₹|\brs\.?|\binr)\s*([\d,]+(?:\.\d+)?)"
+    r"|\b([\d,]+(?:\.\d+)?)(?=\s*(?:lakh|lac|crore|cr\b|लाख|करोड़)))"
+    r"\s*(lakhs?|lacs?|crores?|cr|k|लाख|करोड़)?(?![a-z\d])",
+    re.IGNORECASE,
+)
+_AMOUNT_UNITS = {"k": 1e3, "lakh": 1e5, "lac": 1e5, "लाख": 1e5, "crore": 1e7, "cr": 1e7, "करोड़": 1e7}
+_DEVANAGARI_RE = re.compile(r"[\u0900-\u097F]")
+
+_INTEREST_REPLY_EN = string.Template(
+    "Under Section 16 of the MSMED Act, 2006, interest on a delayed payment is "
+    "compounded monthly at three times the RBI bank rate (${rate}% per annum).\n\n"
+    "For an outstanding amount of ₹${principal} that is ${days} days overdue:\n"
+    "- **Interest:** ₹${interest}\n"
+    "- **Total due:** ₹${total}\n\n"
+    "The buyer is legally liable to pay this interest on top of the principal. "
+    "Would you like help preparing a demand notice for this amount?"
+)
+_INTEREST_REPLY_HI = string.Template(
+    "MSMED अधिनियम, 2006 की धारा 16 के अनुसार, विलंबित भुगतान पर ब्याज RBI बैंक दर "
+    "के तीन गुना (${rate}% वार्षिक) की दर से मासिक चक्रवृद्धि के आधार पर लगता है।\n\n"
+    "₹${principal} की बकाया राशि पर, जो ${days} दिनों से लंबित है:\n"
+    "- **ब्याज:** ₹${interest}\n"
+    "- **कुल देय:** ₹${total}\n\n"
+    "खरीदार मूल राशि के साथ यह ब्याज चुकाने के लिए कानूनी रूप से बाध्य है। "
+    "क्या आप इस राशि के लिए मांग नोटिस तैयार करने में मदद चाहेंगे?"
+)
+
+
+def _match_interest_calculation(user_query: str) -> Optional[Tuple[float, int]]:
+    """
+    Return (principal_amount, days_overdue) if the query is an unambiguous
+    interest-calculation request, else None.
+    """
+    if not _INTEREST_INTENT_RE.search(user_query) or _INTEREST_EXCLUDE_RE.search(user_query):
+        return None
 
-    <p>As per Section 15 of the MSMED Act, 2006, any buyer who purchases goods or services from a micro/small enterprise supplier is required to make payment within 45 days of acceptance of goods/services. Failure to do so attracts compound interest at three times the bank rate under Section 16.</p>
+    days = _DAYS_RE.findall(user_query)
+    amounts = _AMOUNT_RE.findall(user_query)
+    if len(days) != 1 or len(amounts) != 1:
+        return None
 
-    <p>You are hereby requested to settle the above outstanding amount of <strong>INR {total_due:,.2f}</strong> within <strong>15 days</strong> from the date of this notice.</p>
+    marked_value, bare_value, unit = amounts[0]
+    value = marked_value or bare_value
+    try:
+        principal = float(value.replace(",", ""))
+    except ValueError:
+        return None
+    unit = unit.lower().rstrip("s")
+    principal *= _AMOUNT_UNITS.get(unit, 1)
 
-    <p>Please note that if the payment is not received within the stipulated period, we shall be compelled to file a formal complaint under <strong>Section 18</strong> of the MSMED Act, 2006, before the Micro and Small Enterprises Facilitation Council for recovery of the due amount along with interest.</p>
+    if principal <= 0:
+        return None
+    return principal, int(days[0])
 
-    <p style="margin-top: 24px;">Regards,<br><strong>{msme_name}</strong></p>
-  </div>
 
-  <div style="border-top: 2px solid #e0e0e0; padding-top: 12px; font-size: 12px; color: #888;">
-    <p>This notice is generated through the MSME Saathi Dispute Resolution Platform, an initiative of the Ministry of MSME, Government of India.</p>
-  </div>
-</div>
-"""
+# The shortcut is skipped right after an assistant turn that offered a draft
+# or asked the user something; the reply then belongs to that thread
+_DRAFT_PROMISE_RE = re.compile(r"draft|notice|e-?mail|मसौदा|नोटिस|ईमेल", re.IGNORECASE)
 
-    return {
-        "status": "drafted",
-        "subject": subject,
-        "body_html": body_html,
-        "to_email": buyer_email,
-        "buyer_name": buyer_name,
-        "msme_name": msme_name,
-        "principal_amount": principal,
-        "interest_amount": interest_amount,
-        "total_due": total_due,
-        "notice": "This is a DRAFT. The email has NOT been sent. The user must click 'Send Email' to deliver it.",
-    }
 
+def _interest_shortcut_allowed(messages: List[Dict[str, str]]) -> bool:
+    """Whether the last assistant message leaves room for a standalone calculation."""
+    last_reply = next(
+        (m.get("content") or "" for m in reversed(messages) if m.get("role") == "assistant"), ""
+    )
+    return "?" not in last_reply and not _DRAFT_PROMISE_RE.search(last_reply)
 
-class ConversationService:
-    """Service for managing AI conversations about MSME disputes with tool calling."""
 
-    SYSTEM_PROMPT = """You are Saathi (साथी), the official AI Dispute Resolution Assistant of the Ministry of Micro, Small and Medium Enterprises (MoMSME), Government of India.
+def _semantic_cache_eligible(messages: List[Dict[str, str]], user_query: str) -> bool:
+    """
+    Whether a turn's answer can be shared with other conversations: the
+    conversation's first question, long enough to be specific, and free of
+    digits (amounts, invoice numbers, dates, GSTINs).
+    """
+    user_turns = sum(1 for m in messages if m.get("role") == "user")
+    return (
+        user_turns <= 1
+        and len(user_query.strip()) >= SEMANTIC_CACHE_MIN_QUERY_CHARS
+        and not any(char.isdigit() for char in user_query)
+    )
+
+
+def _format_interest_reply(user_query: str, result: Dict[str, Any]) -> str:
+    """Render calculate_section15_interest output in the user's script (Hindi or English)."""
+    template = _INTEREST_REPLY_HI if _DEVANAGARI_RE.search(user_query) else _INTEREST_REPLY_EN
+    return template.substitute(
+        rate=result["interest_rate"],
+        principal=_format_inr(result["principal"]),
+        days=result["days_overdue"],
+        interest=_format_inr(result["interest_amount"]),
+        total=_format_inr(result["total_due"]),
+    )
+
+
+# System prompt fragments. The first three form a static prefix shared by
+# every phase (so OpenAI's prompt cache hits across phases); phase-specific
+# detail is appended after them. See PHASE_FRAGMENTS.
+SYSTEM_CORE = """You are Saathi (साथी), the official AI Dispute Resolution Assistant of the Ministry of Micro, Small and Medium Enterprises (MoMSME), Government of India.
 
 WHO YOU ARE:
 - You are NOT a chatbot or a general AI. You are Saathi - a specialized dispute resolution agent.
@@ -271,45 +480,15 @@ You don't just advise - you ACT. You are the first layer of negotiation and docu
 3. Ensure zero document gaps - officers should never have to ask "where is the invoice?"
 4. Guide the MSME through the entire dispute lifecycle until resolution or escalation
 
-STRICT WORKFLOW — FOLLOW THIS EXACTLY IN ORDER:
-
-Phase 1 - INTAKE (Be warm and explain the process first):
-- When the user first mentions their dispute, acknowledge it warmly
-- Calculate interest to show them what's accruing (builds urgency)
-- Then EXPLAIN: "Here's how I can help: I'll collect your case documents, calculate the exact amount due, and draft a formal demand notice email to send to the buyer under the MSMED Act. This typically prompts payment within 15-30 days. Shall we start?"
-- Wait for confirmation, then ask focused questions ONE AT A TIME:
-  • Buyer company name
-  • Buyer email address (where we'll send the notice)
-  • Your company name (the MSME/supplier)
-  • Confirm the outstanding amount
-  • Confirm days overdue or payment due date
-- Do NOT jump to document collection until you have these basics
-
-Phase 2 - DOCUMENT COLLECTION:
-After intake, say something friendly like: "Perfect! Now I need 4 key documents to build your legally valid case. Let's go through them one by one — this will take just 3-4 minutes."
-
-Required documents (collect in this order):
-1. Invoice — proof of goods/services delivered
-2. Purchase Order or Contract — proof of agreement
-3. Delivery Receipt/Proof — confirmation buyer received goods
-4. MSME/Udyam Certificate — proof of MSME status
-5. (OPTIONAL) Communication Records — emails/messages showing payment follow-ups (helpful but not mandatory)
-
-DOCUMENT VERIFICATION WORKFLOW (MANDATORY):
-When you see document extracted data in the conversation:
-1. IMMEDIATELY call verify_document tool with the document_type and is_valid=True/False
-2. The tool will return updated completeness percentage
-3. ONLY AFTER the tool returns, acknowledge what you found
-4. Then tell them which document is next
-NEVER skip step 1 - the verify_document tool MUST be called to update the completeness tracker.
-
-Phase 3 - DRAFTING: ONLY after all 4 required documents are verified (invoice, purchase_order, delivery_proof, msme_certificate = 100% completeness) AND you have buyer email, MSME name, invoice details from the documents. Then draft the demand notice.
-
-Phase 4 - NEGOTIATION: Draft negotiation correspondence to the buyer after sending the demand notice.
+STRICT WORKFLOW — FOLLOW THESE PHASES IN ORDER:
+Phase 1 - INTAKE: collect the buyer and claim basics.
+Phase 2 - DOCUMENT COLLECTION: collect and verify the 4 required documents (invoice, purchase order/contract, delivery proof, MSME/Udyam certificate).
+Phase 3 - DRAFTING: draft the demand notice once all 4 documents are verified.
+Phase 4 - NEGOTIATION: follow up with the buyer after the notice is sent.
+Phase 5 - ESCALATION: prepare a Section 18 complaint if unresolved in 45 days.
+Detailed instructions for the phase this case is in are at the end."""
 
-Phase 5 - ESCALATION: If unresolved in 45 days, prepare Section 18 complaint for Facilitation Council.
-
-HARD RULES — NEVER BREAK THESE:
+TOOL_RULES = """HARD RULES — NEVER BREAK THESE:
 - NEVER call draft_demand_notice_email before all 4 required documents are verified (completeness = 100%)
 - NEVER call draft_demand_notice_email with placeholder values like "Unknown", "N/A", or empty strings for buyer_name, buyer_email, msme_name, or principal_amount
 - NEVER skip Phase 1 intake — you MUST collect buyer email before drafting
@@ -332,9 +511,9 @@ CRITICAL TOOL CALLING RULES (NEVER VIOLATE):
 - After EVERY document upload, your FIRST action must be calling verify_document, not explaining what you see
 - Only provide conversational responses AFTER the tool has been called and executed
 
-IMPORTANT: You DRAFT emails, but the user SENDS them. Always say "I've prepared the draft. Please review it and click 'Send Email' when ready." Never claim to have sent an email.
+IMPORTANT: You DRAFT emails, but the user SENDS them. Always say "I've prepared the draft. Please review it and click 'Send Email' when ready." Never claim to have sent an email."""
 
-HOW YOU COMMUNICATE:
+BOUNDARIES = """HOW YOU COMMUNICATE:
 - Be warm but professional - you represent the Government of India
 - Be action-oriented: "Let me prepare your demand notice" not "You should consider sending a demand notice"
 - Ask focused questions - maximum 2 at a time
@@ -358,18 +537,603 @@ CRITICAL - DOCUMENT HANDLING (NEVER VIOLATE THIS):
 
 Remember: Every case you handle well means an MSME gets their rightful payment, their business survives, and their workers get paid. This matters. But making up data destroys trust and causes real harm.
 
-Use the context provided below to give accurate information about the MSMED Act and dispute resolution process."""
+Use the relevant knowledge provided in later system messages to give accurate information about the MSMED Act and dispute resolution process."""
+
+PHASE_INTAKE = """Phase 1 - INTAKE (Be warm and explain the process first):
+- When the user first mentions their dispute, acknowledge it warmly
+- Calculate interest to show them what's accruing (builds urgency)
+- Then EXPLAIN: "Here's how I can help: I'll collect your case documents, calculate the exact amount due, and draft a formal demand notice email to send to the buyer under the MSMED Act. This typically prompts payment within 15-30 days. Shall we start?"
+- Wait for confirmation, then ask focused questions ONE AT A TIME:
+  • Buyer company name
+  • Buyer email address (where we'll send the notice)
+  • Your company name (the MSME/supplier)
+  • Confirm the outstanding amount
+  • Confirm days overdue or payment due date
+- Do NOT jump to document collection until you have these basics"""
+
+PHASE_DOCS = """Phase 2 - DOCUMENT COLLECTION:
+After intake, say something friendly like: "Perfect! Now I need 4 key documents to build your legally valid case. Let's go through them one by one — this will take just 3-4 minutes."
+
+Required documents (collect in this order):
+1. Invoice — proof of goods/services delivered
+2. Purchase Order or Contract — proof of agreement
+3. Delivery Receipt/Proof — confirmation buyer received goods
+4. MSME/Udyam Certificate — proof of MSME status
+5. (OPTIONAL) Communication Records — emails/messages showing payment follow-ups (helpful but not mandatory)
+
+DOCUMENT VERIFICATION WORKFLOW (MANDATORY):
+When you see document extracted data in the conversation:
+1. IMMEDIATELY call verify_document tool with the document_type and is_valid=True/False
+2. The tool will return updated completeness percentage
+3. ONLY AFTER the tool returns, acknowledge what you found
+4. Then tell them which document is next
+NEVER skip step 1 - the verify_document tool MUST be called to update the completeness tracker."""
+
+PHASE_DRAFT = """Phase 3 - DRAFTING: ONLY after all 4 required documents are verified (invoice, purchase_order, delivery_proof, msme_certificate = 100% completeness) AND you have buyer email, MSME name, invoice details from the documents. Then draft the demand notice."""
+
+PHASE_FOLLOWUP = """Phase 4 - NEGOTIATION: Draft negotiation correspondence to the buyer after sending the demand notice.
+
+Phase 5 - ESCALATION: If unresolved in 45 days, prepare Section 18 complaint for Facilitation Council."""
+
+# Phase-specific fragments per inferred case phase. Neighbouring phases are
+# included so the model can still handle a step back or forward; "full" is
+# used when the phase can't be determined.
+PHASE_FRAGMENTS = {
+    "intake": (PHASE_INTAKE,),
+    "docs": (PHASE_INTAKE, PHASE_DOCS),
+    "draft": (PHASE_DOCS, PHASE_DRAFT, PHASE_FOLLOWUP),
+    "followup": (PHASE_DRAFT, PHASE_FOLLOWUP),
+    "full": (PHASE_INTAKE, PHASE_DOCS, PHASE_DRAFT, PHASE_FOLLOWUP),
+}
+PHASE_PROMPTS = {
+    phase: "\n\n".join((SYSTEM_CORE, TOOL_RULES, BOUNDARIES, *fragments))
+    for phase, fragments in PHASE_FRAGMENTS.items()
+}
+PHASE_CACHE_MAX_ENTRIES = 1000
+
+# Tools offered per phase, filtered from TOOLS once so order (and the cached
+# prefix) is stable. Drafting is only offered once documents are complete,
+# matching the guardrail in _execute_tool.
+_TOOLS_BY_NAME = {tool["function"]["name"]: tool for tool in TOOLS}
+_BASE_TOOL_NAMES = ("calculate_msme_interest", "get_current_date")
+TOOLS_BY_PHASE = {
+    "intake": [_TOOLS_BY_NAME[name] for name in _BASE_TOOL_NAMES],
+    "docs": [_TOOLS_BY_NAME[name] for name in (*_BASE_TOOL_NAMES, "verify_document")],
+    "draft": TOOLS,
+    "followup": TOOLS,
+    "full": TOOLS,
+}
+
+
+# Demand notice HTML, parsed once at import and filled per draft
+_DEMAND_NOTICE_TEMPLATE = string.Template("""
+<div style="font-family: 'Segoe UI', Arial, sans-serif; max-width: 700px; margin: auto; color: #222;">
+  <div style="text-align: center; padding: 20px 0; border-bottom: 3px solid #1a237e;">
+    <h2 style="margin: 0; color: #1a237e;">DEMAND NOTICE</h2>
+    <p style="margin: 4px 0 0; color: #555;">Under Section 15 of the Micro, Small and Medium Enterprises Development Act, 2006</p>
+  </div>
+
+  <div style="padding: 24px 0;">
+    <p><strong>Date:</strong> ${notice_date}</p>
+    <p><strong>To:</strong> ${buyer_name}</p>
+    <p><strong>From:</strong> ${msme_name}</p>
+
+    <p style="margin-top: 20px;">Dear Sir/Madam,</p>
+
+    <p>This is to bring to your attention that the payment against the following invoice(s) has been outstanding for <strong>${days} days</strong> beyond the agreed payment date, in violation of Section 15 of the MSMED Act, 2006:</p>
+
+    <table style="width: 100%; border-collapse: collapse; margin: 16px 0;">
+      <tr style="background: #e8eaf6;">
+        <th style="padding: 10px; border: 1px solid #ccc; text-align: left;">Particulars</th>
+        <th style="padding: 10px; border: 1px solid #ccc; text-align: right;">Amount (INR)</th>
+      </tr>
+      <tr>
+        <td style="padding: 10px; border: 1px solid #ccc;">Invoice No: ${invoice_number} (Dated: ${invoice_date})</td>
+        <td style="padding: 10px; border: 1px solid #ccc; text-align: right;">${principal_fmt}</td>
+      </tr>
+      <tr>
+        <td style="padding: 10px; border: 1px solid #ccc;">Interest under Section 16 (3x RBI bank rate, compounded monthly, ${days} days)</td>
+        <td style="padding: 10px; border: 1px solid #ccc; text-align: right;">${interest_fmt}</td>
+      </tr>
+      <tr style="background: #fff3e0; font-weight: bold;">
+        <td style="padding: 10px; border: 1px solid #ccc;">Total Amount Due</td>
+        <td style="padding: 10px; border: 1px solid #ccc; text-align: right;">${total_due_fmt}</td>
+      </tr>
+    </table>
+
+    <p>As per Section 15 of the MSMED Act, 2006, any buyer who purchases goods or services from a micro/small enterprise supplier is required to make payment within 45 days of acceptance of goods/services. Failure to do so attracts compound interest at three times the bank rate under Section 16.</p>
+
+    <p>You are hereby requested to settle the above outstanding amount of <strong>INR ${total_due_fmt}</strong> within <strong>15 days</strong> from the date of this notice.</p>
+
+    <p>Please note that if the payment is not received within the stipulated period, we shall be compelled to file a formal complaint under <strong>Section 18</strong> of the MSMED Act, 2006, before the Micro and Small Enterprises Facilitation Council for recovery of the due amount along with interest.</p>
+
+    <p style="margin-top: 24px;">Regards,<br><strong>${msme_name}</strong></p>
+  </div>
+
+  <div style="border-top: 2px solid #e0e0e0; padding-top: 12px; font-size: 12px; color: #888;">
+    <p>This notice is generated through the MSME Saathi Dispute Resolution Platform, an initiative of the Ministry of MSME, Government of India.</p>
+  </div>
+</div>
+""")
+
+
+def _dump_json(obj: Any) -> str:
+    """Serialize a tool result for the model; orjson returns bytes, OpenAI wants str."""
+    return orjson.dumps(obj).decode()
+
+
+# Tool payloads that repeat across requests are serialized once
+_ERR_PRINCIPAL_MISSING = _dump_json({
+    "error": "Cannot draft: principal_amount is missing. Ask the user for the outstanding amount."
+})
+_ERR_INVALID_ARGUMENTS = _dump_json({
+    "error": "Invalid arguments: not valid JSON. Retry the call with valid JSON arguments."
+})
+_date_json: Tuple[str, str] = ("", "")
+
+
+def _current_date_json() -> str:
+    """Return the get_current_date tool payload, re-serialized only when the date changes."""
+    global _date_json
+    today = get_current_date()
+    if _date_json[0] != today:
+        _date_json = (today, _dump_json({"date": today}))
+    return _date_json[1]
+
+
+# Values the model fills in when it doesn't actually know a draft field
+_PLACEHOLDERS = frozenset({"unknown", "n/a", "", "none", "null"})
+_DRAFT_REQUIRED_FIELDS = ("buyer_name", "buyer_email", "msme_name")
+# Draft arguments kept in the case state once a draft succeeds
+_DRAFT_CASE_FIELDS = _DRAFT_REQUIRED_FIELDS + ("invoice_number", "invoice_date", "principal_amount")
+
+
+def _is_placeholder(value: Any) -> bool:
+    """True if a draft field is missing, empty, or a placeholder like 'unknown'."""
+    if value is None:
+        return True
+    if not isinstance(value, str):
+        value = str(value)
+    return value.strip().lower() in _PLACEHOLDERS
+
+
+@lru_cache(maxsize=256)
+def _invalid_field_error(field: str, value: str) -> str:
+    """Serialized guardrail error for a missing or placeholder draft field."""
+    return _dump_json({"error": f"Cannot draft: '{field}' is missing or invalid ('{value}'). Ask the user for this information first."})
+
+
+def _format_inr(amount: float) -> str:
+    """Format an INR amount with thousands separators and two decimals."""
+    return f"{amount:,.2f}"
+
+
+def _build_demand_notice_draft(args: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build an HTML demand notice email draft from structured arguments.
+
+    Returns a dict with subject, body_html, and metadata -- does NOT send.
+    """
+    buyer_name = args["buyer_name"]
+    msme_name = args["msme_name"]
+    principal = args["principal_amount"]
+    days = args["days_overdue"]
+    total_due = args["total_due"]
+    notice_date = args["notice_date"]
+    invoice_number = args.get("invoice_number", "N/A")
+    invoice_date = args.get("invoice_date", "N/A")
+    interest_amount = args.get("interest_amount", round(total_due - principal, 2))
+    buyer_email = args.get("buyer_email", "")
+
+    total_due_fmt = _format_inr(total_due)
+    subject = f"Demand Notice under MSMED Act, 2006 - Outstanding Payment of INR {total_due_fmt}"
+
+    body_html = _DEMAND_NOTICE_TEMPLATE.substitute(
+        notice_date=notice_date,
+        buyer_name=buyer_name,
+        msme_name=msme_name,
+        days=days,
+        invoice_number=invoice_number,
+        invoice_date=invoice_date,
+        principal_fmt=_format_inr(principal),
+        interest_fmt=_format_inr(interest_amount),
+        total_due_fmt=total_due_fmt,
+    )
+
+    return {
+        "status": "drafted",
+        "subject": subject,
+        "body_html": body_html,
+        "to_email": buyer_email,
+        "buyer_name": buyer_name,
+        "msme_name": msme_name,
+        "principal_amount": principal,
+        "interest_amount": interest_amount,
+        "total_due": total_due,
+        "notice": "This is a DRAFT. The email has NOT been sent. The user must click 'Send Email' to deliver it.",
+    }
+
+
+_encoding: Optional[tiktoken.Encoding] = None
+
+
+@lru_cache(maxsize=4096)
+def _count_tokens(text: str) -> int:
+    """Count tokens with tiktoken, memoized so repeated history is not re-encoded."""
+    global _encoding
+    if _encoding is None:
+        _encoding = tiktoken.get_encoding(TOKENIZER_ENCODING)
+    return len(_encoding.encode(text, disallowed_special=()))
+
+
+class _ContentBatcher:
+    """Coalesce streamed content deltas into fewer, larger SSE events."""
 
     def __init__(self):
-        """Initialize conversation service with OpenAI client, RAG service, and document DAO."""
-        openai_api_key = os.getenv("OPENAI_API_KEY")
-        if not openai_api_key:
-            raise ValueError("OPENAI_API_KEY not found in environment variables")
+        self.parts: List[str] = []
+        self.chars = 0
+        self.flush_chars = STREAM_FLUSH_INITIAL_CHARS
+        self.last_flush = time.monotonic()
+
+    def add(self, text: str) -> Optional[str]:
+        """Buffer a delta; return the batch to emit once it is big or old enough."""
+        self.parts.append(text)
+        self.chars += len(text)
+        if (
+            self.chars >= self.flush_chars
+            or time.monotonic() - self.last_flush >= STREAM_FLUSH_INTERVAL_SECONDS
+        ):
+            return self.flush()
+        return None
+
+    def flush(self) -> Optional[str]:
+        """Return and clear whatever is buffered, or None if nothing is."""
+        if not self.parts:
+            return None
+        text = "".join(self.parts)
+        self.parts.clear()
+        self.chars = 0
+        self.flush_chars = min(self.flush_chars * STREAM_FLUSH_GROWTH, STREAM_FLUSH_MAX_CHARS)
+        self.last_flush = time.monotonic()
+        return text
+
+
+def _prepare_chat_messages(
+    messages: List[Dict[str, str]],
+    system_prompt: str,
+    user_query: Optional[str] = None,
+) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Walk the conversation once from the newest message, keeping as much
+    recent history as fits MAX_HISTORY_TOKENS.
+
+    The returned list starts with the static system prompt followed by the
+    kept history. When the caller already knows the latest user query it is
+    used as-is; otherwise it is picked up during the same walk.
+
+    Returns:
+        Tuple of (latest user message content, chat messages).
+    """
+    kept: List[Dict[str, Any]] = []
+    used_tokens = 0
+    truncated = False
+
+    for msg in reversed(messages):
+        if user_query is None and msg.get("role") == "user":
+            user_query = msg.get("content", "")
+        if not truncated:
+            used_tokens += _count_tokens(msg.get("content") or "")
+            if used_tokens > MAX_HISTORY_TOKENS and kept:
+                truncated = True
+            else:
+                kept.append(msg)
+        if truncated and user_query is not None:
+            break
+
+    if truncated:
+        logger.info(f"[History] Truncated to last {len(kept)} of {len(messages)} messages")
+
+    chat_messages: List[Dict[str, Any]] = [{"role": "system", "content": system_prompt}]
+    chat_messages.extend(reversed(kept))
+    return user_query or "", chat_messages
 
-        self.client = OpenAI(api_key=openai_api_key)
+
+class ConversationService:
+    """Service for managing AI conversations about MSME disputes with tool calling."""
+
+    SYSTEM_PROMPT = PHASE_PROMPTS["full"]
+
+    def __init__(self):
+        """Initialize conversation service with OpenAI client, RAG service, and document DAO."""
+        self.client = get_openai_client()
         self.model = "gpt-4o-mini"  # Fast, affordable, excellent tool use support
+        self.summary_model = "gpt-4.1-nano"  # Smallest tier is enough for template extraction
         self.rag_service = get_rag_service()
         self.document_dao = DocumentDAO()
+        self._summary_cache: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        # phase -> cache of opening-question answers
+        self.semantic_caches: Dict[str, SemanticCache] = {
+            phase: SemanticCache(name=f"response:{phase}") for phase in PHASE_PROMPTS
+        } if SEMANTIC_CACHE_ENABLED else {}
+        self._completeness_cache: Dict[str, Tuple[float, DocumentCompleteness]] = {}
+        # Written from DAO pool threads
+        self._completeness_lock = threading.Lock()
+        # conversation_id -> last started completeness tool task
+        self._completeness_tasks: Dict[str, "asyncio.Task[str]"] = {}
+        # conversation_id -> (cached_at, query embedding, retrieved context)
+        self._rag_cache: "OrderedDict[str, Tuple[float, Any, str]]" = OrderedDict()
+        # Retrieval runs in worker threads (asyncio.to_thread)
+        self._rag_cache_lock = threading.Lock()
+        # request key -> (cached_at, response, actions)
+        self._response_cache: "OrderedDict[str, Tuple[float, str, List[Dict[str, str]]]]" = OrderedDict()
+        self.rag_context_cache = SemanticCache(
+            similarity_threshold=RAG_CONTEXT_CACHE_SIMILARITY,
+            max_entries=RAG_CONTEXT_CACHE_MAX_ENTRIES,
+            ttl_seconds=RAG_CONTEXT_CACHE_TTL_SECONDS,
+            name="rag_context",
+        )
+        # conversation_id -> (number of leading messages covered, narrative)
+        self._case_state: "OrderedDict[str, Tuple[int, str]]" = OrderedDict()
+        self._case_state_pending: set = set()
+        # conversation_id -> facts recorded from tool results
+        self._case_facts: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # Tools run on DAO pool threads
+        self._case_facts_lock = threading.Lock()
+        self._background_tasks: set = set()
+        # conversation_id -> case phase (a PHASE_PROMPTS key)
+        self._phase_cache: "OrderedDict[str, str]" = OrderedDict()
+
+        # The phase prompts never change, so tokenize them once up front
+        # instead of on every request.
+        self.system_prompt_tokens = {phase: _count_tokens(prompt) for phase, prompt in PHASE_PROMPTS.items()}
+        logger.info(f"[Prompt] System prompt tokens by phase: {self.system_prompt_tokens}")
+
+        # Chat completion parameters are fixed per phase; build them once and
+        # only add the messages on each call
+        self._chat_kwargs_by_phase = {
+            phase: {
+                "model": self.model,
+                "temperature": 0.7,
+                "max_tokens": 4096,
+                "top_p": 0.9,
+                "tools": tools,
+                "tool_choice": "auto",
+                "stream": True,
+            }
+            for phase, tools in TOOLS_BY_PHASE.items()
+        }
+
+    def _retrieve_rag_context(
+        self,
+        user_query: str,
+        conversation_id: str,
+        query_embedding: Any = None,
+    ) -> str:
+        """
+        Retrieve knowledge-base context for the user's query, or "" if unavailable.
+
+        Short confirmations skip retrieval. A query that embeds almost
+        identically to this conversation's previous one, or to any recent
+        query in rag_context_cache, reuses that context instead of searching
+        the index again.
+        """
+        if len(user_query.strip()) < RAG_MIN_QUERY_CHARS:
+            logger.info("[RAG] Query too short - skipping retrieval")
+            return ""
+
+        if not self.rag_service.is_index_available():
+            logger.warning("[RAG] Index not available - using base prompt only")
+            return ""
+
+        if query_embedding is None:
+            query_embedding = self.rag_service.embed_query(user_query)
+
+        with self._rag_cache_lock:
+            cached = self._rag_cache.get(conversation_id)
+        if cached is not None:
+            cached_at, cached_embedding, cached_context = cached
+            if (
+                time.monotonic() - cached_at <= RAG_CACHE_TTL_SECONDS
+                and float(query_embedding @ cached_embedding) >= RAG_REUSE_SIMILARITY
+            ):
+                logger.info("[RAG] Follow-up matches previous query - reusing context")
+                with self._rag_cache_lock:
+                    # Another thread may have evicted it since the read
+                    if conversation_id in self._rag_cache:
+                        self._rag_cache.move_to_end(conversation_id)
+                return cached_context
+
+        shared = self.rag_context_cache.lookup(query_embedding)
+        if shared is not None:
+            rag_context = shared["context"]
+        else:
+            rag_context = self.rag_service.get_context_for_query(
+                user_query, query_embedding=query_embedding
+            )
+            if rag_context:
+                logger.info(f"[RAG] Retrieved {len(rag_context)} chars of context")
+                self.rag_context_cache.store(query_embedding, {"context": rag_context})
+            else:
+                logger.info("[RAG] No context retrieved")
+
+        with self._rag_cache_lock:
+            self._rag_cache[conversation_id] = (time.monotonic(), query_embedding, rag_context)
+            self._rag_cache.move_to_end(conversation_id)
+            while len(self._rag_cache) > RAG_CACHE_MAX_ENTRIES:
+                self._rag_cache.popitem(last=False)
+        return rag_context
+
+    async def _compact_history(
+        self,
+        messages: List[Dict[str, str]],
+        conversation_id: str,
+    ) -> List[Dict[str, str]]:
+        """
+        Replace turns already covered by the case-state narrative with one
+        system message; newer turns are kept verbatim.
+
+        The message lists the conversation's documents with their status and
+        key extracted fields, the tool results recorded for it and any email
+        addresses from the dropped turns, followed by the narrative.
+
+        Returns messages unchanged when no narrative exists yet.
+        """
+        entry = self._case_state.get(conversation_id)
+        if entry is None:
+            return messages
+
+        covered, narrative = entry
+        if covered <= 0 or covered > len(messages) - HISTORY_KEEP_RECENT:
+            return messages
+
+        lines = []
+        try:
+            documents = await asyncio.get_running_loop().run_in_executor(
+                _DAO_POOL, self.document_dao.get_documents_by_conversation, conversation_id
+            )
+            lines.extend(self._document_fact_lines(documents))
+        except Exception as e:
+            logger.warning(f"[History] Could not load documents for {conversation_id}: {e}")
+
+        with self._case_facts_lock:
+            facts = dict(self._case_facts.get(conversation_id, {}))
+        lines.extend(f"- {key}: {value}" for key, value in facts.items())
+
+        emails = dict.fromkeys(
+            email
+            for m in messages[:covered] if m.get("role") == "user"
+            for email in _EMAIL_RE.findall(m.get("content") or "")
+        )
+        if emails:
+            lines.append(f"- emails_mentioned_by_user: {', '.join(emails)}")
+        if narrative:
+            lines.append(f"- narrative: {narrative}")
+
+        self._case_state.move_to_end(conversation_id)
+        logger.info(f"[History] Compacted {covered} of {len(messages)} messages into case state")
+        case_state = {"role": "system", "content": "CASE STATE SO FAR:\n" + "\n".join(lines)}
+        return [case_state, *messages[covered:]]
+
+    @staticmethod
+    def _document_fact_lines(documents: List[DisputeDocumentResponse]) -> List[str]:
+        """Describe each document's status and key fields, then the missing required types."""
+        lines = []
+        for doc in documents:
+            data = doc.extracted_data or {}
+            fields = [
+                f"{key} {_format_inr(data[key]) if isinstance(data[key], float) else data[key]}"
+                for key in CASE_DOCUMENT_FIELDS.get(doc.document_type, ())
+                if data.get(key) not in (None, "", [])
+            ]
+            lines.append(
+                f"- {doc.document_type} ({doc.verification_status})"
+                + (f": {', '.join(fields)}" if fields else "")
+            )
+        uploaded = {doc.document_type for doc in documents}
+        missing = [t.value for t in REQUIRED_DOCUMENT_TYPES if t.value not in uploaded]
+        lines.append(f"- missing_documents: {', '.join(missing) or 'none'}")
+        return lines
+
+    def _record_case_facts(self, conversation_id: str, facts: Dict[str, Any]) -> None:
+        """Remember facts a tool established for the case state, evicting the least recently used."""
+        with self._case_facts_lock:
+            stored = self._case_facts.setdefault(conversation_id, {})
+            stored.update((key, value) for key, value in facts.items() if value not in (None, ""))
+            self._case_facts.move_to_end(conversation_id)
+            while len(self._case_facts) > CASE_STATE_MAX_ENTRIES:
+                self._case_facts.popitem(last=False)
+
+    def _schedule_case_state_refresh(
+        self,
+        messages: List[Dict[str, str]],
+        conversation_id: str,
+    ) -> None:
+        """Start a background case-state summary once enough older turns have accumulated."""
+        older = len(messages) - HISTORY_KEEP_RECENT
+        entry = self._case_state.get(conversation_id)
+        covered = entry[0] if entry else 0
+        if older - covered < HISTORY_SUMMARY_INTERVAL or conversation_id in self._case_state_pending:
+            return
+
+        self._case_state_pending.add(conversation_id)
+        task = asyncio.create_task(self._refresh_case_state(conversation_id, messages[:older]))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def _refresh_case_state(
+        self,
+        conversation_id: str,
+        older_messages: List[Dict[str, str]],
+    ) -> None:
+        """Summarize older turns into the narrative for _compact_history."""
+        try:
+            chat_completion = await self.client.chat.completions.create(
+                messages=older_messages + [{"role": "user", "content": CASE_NARRATIVE_PROMPT}],
+                model=self.summary_model,
+                temperature=0.0,
+                max_tokens=256,
+            )
+            narrative = (chat_completion.choices[0].message.content or "").strip()
+            del chat_completion
+
+            self._case_state[conversation_id] = (len(older_messages), narrative)
+            self._case_state.move_to_end(conversation_id)
+            while len(self._case_state) > CASE_STATE_MAX_ENTRIES:
+                self._case_state.popitem(last=False)
+            logger.info(f"[History] Case state refreshed for {conversation_id} ({len(older_messages)} messages)")
+        except Exception as e:
+            logger.warning(f"[History] Case state refresh failed for {conversation_id}: {e}")
+        finally:
+            self._case_state_pending.discard(conversation_id)
+
+    @staticmethod
+    def _phase_from_completeness(completeness: Dict[str, Any]) -> str:
+        """Map a completeness result to the case phase it implies."""
+        if completeness.get("completeness_percentage", 0) >= 100:
+            return "draft"
+        if completeness.get("uploaded_count", 0) > 0:
+            return "docs"
+        return "intake"
+
+    def _set_phase(self, conversation_id: str, phase: str) -> None:
+        """Remember a conversation's phase, evicting the least recently used."""
+        self._phase_cache[conversation_id] = phase
+        self._phase_cache.move_to_end(conversation_id)
+        while len(self._phase_cache) > PHASE_CACHE_MAX_ENTRIES:
+            self._phase_cache.popitem(last=False)
+
+    async def _infer_phase(self, conversation_id: str, message_type: str) -> str:
+        """
+        Infer the case phase for prompt assembly.
+
+        Uses the phase cached from earlier turns (updated whenever a
+        document is uploaded or verify_document or drafting runs); otherwise derives it from document
+        completeness. Falls back to "full" if completeness can't be read.
+        """
+        phase = self._phase_cache.get(conversation_id)
+        if phase is None:
+            try:
+                completeness = await asyncio.get_running_loop().run_in_executor(
+                    _DAO_POOL, self._get_completeness, conversation_id
+                )
+            except Exception as e:
+                logger.warning(f"[Prompt] Could not infer phase for {conversation_id}: {e}")
+                return "full"
+            phase = self._phase_from_completeness(completeness.model_dump())
+            self._set_phase(conversation_id, phase)
+
+        # A document upload needs the verification instructions even if the
+        # case hasn't left intake yet; the document stays on file, so later
+        # turns keep them whether or not it was verified on this one
+        if message_type == "document" and phase == "intake":
+            phase = "docs"
+            self._set_phase(conversation_id, phase)
+        return phase
+
+    @staticmethod
+    def _build_context_message(rag_context: str) -> Dict[str, str]:
+        """Wrap retrieved knowledge in a standalone system message."""
+        return {"role": "system", "content": _wrap_rag_context(rag_context)}
 
     def _execute_tool(self, tool_name: str, arguments: Dict[str, Any], conversation_id: str) -> str:
         """
@@ -388,196 +1152,171 @@ Use the context provided below to give accurate information about the MSMED Act
                 principal_amount=arguments["principal_amount"],
                 days_overdue=arguments["days_overdue"],
             )
-            return json.dumps(result)
+            self._record_interest_facts(conversation_id, result)
+            return _dump_json(result)
 
         if tool_name == "get_current_date":
-            return json.dumps({"date": get_current_date()})
+            return _current_date_json()
 
         if tool_name == "draft_demand_notice_email":
             # Guardrail: reject placeholder/unknown values
-            placeholders = {"unknown", "n/a", "", "none", "null"}
-            for field in ("buyer_name", "buyer_email", "msme_name"):
-                val = str(arguments.get(field, "")).strip().lower()
-                if val in placeholders or not val:
-                    return json.dumps({"error": f"Cannot draft: '{field}' is missing or invalid ('{arguments.get(field)}'). Ask the user for this information first."})
+            bad_field = next((f for f in _DRAFT_REQUIRED_FIELDS if _is_placeholder(arguments.get(f))), None)
+            if bad_field is not None:
+                return _invalid_field_error(bad_field, str(arguments.get(bad_field)))
             if not arguments.get("principal_amount"):
-                return json.dumps({"error": "Cannot draft: principal_amount is missing. Ask the user for the outstanding amount."})
+                return _ERR_PRINCIPAL_MISSING
             # Guardrail: reject if all 4 required documents not verified
             try:
-                completeness = self.document_dao.get_completeness(conversation_id)
+                completeness = self._get_completeness(conversation_id)
                 if completeness.completeness_percentage < 100:
                     missing = completeness.missing_types
-                    return json.dumps({"error": f"Cannot draft: only {completeness.completeness_percentage}% documents verified. Still missing: {missing}. Ask the user to upload these documents first."})
+                    return _dump_json({"error": f"Cannot draft: only {completeness.completeness_percentage}% documents verified. Still missing: {missing}. Ask the user to upload these documents first."})
             except Exception as e:
-                logger.warning(f"Could not check completeness before drafting: {e}")
+                logger.warning("Could not check completeness before drafting: %s", e)
             result = _build_demand_notice_draft(arguments)
-            return json.dumps(result)
+            self._record_case_facts(conversation_id, {
+                field: arguments.get(field) for field in _DRAFT_CASE_FIELDS
+            })
+            return _dump_json(result)
 
         if tool_name == "verify_document":
             doc_type = arguments.get("document_type", "")
             is_valid = arguments.get("is_valid", True)
             notes = arguments.get("notes", "")
             try:
-                self.document_dao.verify_document_by_type(conversation_id, doc_type, is_valid, notes)
-            except Exception as e:
-                logger.warning(f"Could not update document verification status: {e}")
-            try:
-                completeness = self.document_dao.get_completeness(conversation_id)
-                return json.dumps(completeness.model_dump())
+                completeness = self.document_dao.verify_and_get_completeness(
+                    conversation_id, doc_type, is_valid, notes
+                )
             except Exception as e:
-                return json.dumps({"error": f"Verified but completeness check failed: {str(e)}"})
+                logger.warning("Could not update document verification status: %s", e)
+                try:
+                    completeness = self.document_dao.get_completeness(conversation_id)
+                except Exception as e:
+                    return _dump_json({"error": f"Verified but completeness check failed: {str(e)}"})
+            self._store_completeness(conversation_id, completeness)
+            return _dump_json(completeness.model_dump())
+
+        logger.warning("Unknown tool called: %s", tool_name)
+        return _dump_json({"error": f"Unknown tool: {tool_name}"})
+
+    def _record_interest_facts(self, conversation_id: str, result: Dict[str, Any]) -> None:
+        """Record a Section 15 interest calculation for the case state."""
+        self._record_case_facts(conversation_id, {
+            "principal_amount": result["principal"],
+            "days_overdue": result["days_overdue"],
+            "interest_amount": result["interest_amount"],
+            "total_due": result["total_due"],
+        })
+
+    def _get_completeness(self, conversation_id: str) -> DocumentCompleteness:
+        """Return completeness computed by a recent verify_document call, else query the DAO."""
+        with self._completeness_lock:
+            cached = self._completeness_cache.get(conversation_id)
+        if cached and time.monotonic() - cached[0] <= COMPLETENESS_CACHE_TTL_SECONDS:
+            return cached[1]
+        return self.document_dao.get_completeness(conversation_id)
+
+    def _store_completeness(self, conversation_id: str, completeness: DocumentCompleteness) -> None:
+        """Cache a fresh completeness result, dropping entries that have expired."""
+        now = time.monotonic()
+        with self._completeness_lock:
+            for key in [k for k, (ts, _) in self._completeness_cache.items() if now - ts > COMPLETENESS_CACHE_TTL_SECONDS]:
+                del self._completeness_cache[key]
+            self._completeness_cache[conversation_id] = (now, completeness)
+
+    def _dispatch_tool_call(
+        self,
+        tool_call: Dict[str, Any],
+        conversation_id: str,
+    ) -> Tuple[str, Optional[Dict[str, Any]], "asyncio.Future[str]"]:
+        """
+        Finalize a streamed tool call's arguments and start executing it.
 
-        logger.warning(f"Unknown tool called: {tool_name}")
-        return json.dumps({"error": f"Unknown tool: {tool_name}"})
+        Malformed arguments are not executed: the returned arguments are None
+        and the future already holds an error asking the model to retry.
 
-    def get_ai_response(
+        Returns:
+            Tuple of (tool name, parsed arguments, future for the JSON result).
+        """
+        function = tool_call["function"]
+        function["arguments"] = "".join(function.pop("arguments_parts"))
+        fn_name = function["name"]
+        try:
+            fn_args = orjson.loads(function["arguments"])
+        except orjson.JSONDecodeError:
+            logger.error("Failed to parse arguments for %s: %s", fn_name, function["arguments"])
+            future = asyncio.get_running_loop().create_future()
+            future.set_result(_ERR_INVALID_ARGUMENTS)
+            return fn_name, None, future
+
+        logger.info("[Tool Call] %s(%s)", fn_name, fn_args)
+        task = asyncio.ensure_future(self._execute_tool_async(fn_name, fn_args, conversation_id))
+        return fn_name, fn_args, task
+
+    async def _execute_tool_async(self, tool_name: str, arguments: Dict[str, Any], conversation_id: str) -> str:
+        """
+        Run _execute_tool on the DAO pool so blocking DAO calls don't stall the event loop.
+
+        Completeness tools first wait for the previous one started for the
+        same conversation. Otherwise two verify_document calls would each
+        report completeness from a snapshot missing the other's update.
+        """
+        if tool_name not in _COMPLETENESS_TOOLS:
+            return await asyncio.get_running_loop().run_in_executor(
+                _DAO_POOL, self._execute_tool, tool_name, arguments, conversation_id
+            )
+
+        task = asyncio.current_task()
+        previous = self._completeness_tasks.get(conversation_id)
+        self._completeness_tasks[conversation_id] = task
+        try:
+            if previous is not None and not previous.done():
+                await asyncio.wait([previous])
+            return await asyncio.get_running_loop().run_in_executor(
+                _DAO_POOL, self._execute_tool, tool_name, arguments, conversation_id
+            )
+        finally:
+            if self._completeness_tasks.get(conversation_id) is task:
+                del self._completeness_tasks[conversation_id]
+
+    async def get_ai_response(
         self,
         messages: List[Dict[str, str]],
         conversation_id: str,
         message_type: str = "text",
+        user_query: Optional[str] = None,
     ) -> Dict[str, Any]:
         """
-        Get AI response, executing any tool calls the model requests.
+        Get the complete AI response, executing any tool calls the model requests.
 
-        Implements a tool-call loop: if the model returns tool_calls instead of
-        content, we execute each tool, append results, and call the model again
-        until it produces a final text response (max 5 iterations to prevent loops).
+        Drains get_ai_response_stream and joins the streamed content, for
+        callers that need the whole reply at once.
 
         Args:
             messages: Conversation history with 'role' and 'content'.
             conversation_id: Unique conversation identifier.
             message_type: One of 'text', 'voice', 'document'.
+            user_query: Latest user message, if the caller has it; otherwise
+                it is taken from messages.
 
         Returns:
-            Dict with 'response', 'actions', 'conversation_id', and optional 'email_draft'.
+            Dict with 'response', 'actions', 'conversation_id', and optional
+            'email_draft' / 'completeness'.
         """
         try:
-            # Extract latest user message for RAG retrieval
-            user_query = ""
-            for msg in reversed(messages):
-                if msg.get("role") == "user":
-                    user_query = msg.get("content", "")
-                    break
-
-            # Retrieve relevant context from knowledge base
-            rag_context = ""
-            if user_query and self.rag_service.is_index_available():
-                rag_context = self.rag_service.get_context_for_query(user_query)
-                if rag_context:
-                    logger.info(f"[RAG] Retrieved {len(rag_context)} chars of context")
-                else:
-                    logger.info("[RAG] No context retrieved")
-            else:
-                logger.warning("[RAG] Index not available - using base prompt only")
-
-            # Build system prompt with RAG context
-            system_prompt = self.SYSTEM_PROMPT
-            if rag_context:
-                system_prompt += (
-                    f"\n\n--- RELEVANT KNOWLEDGE FROM MSMED ACT & DOCUMENTS ---\n\n"
-                    f"{rag_context}\n\n--- END OF CONTEXT ---"
-                )
-
-            chat_messages = [{"role": "system", "content": system_prompt}] + messages
-
-            # Tool-call loop (max 5 iterations)
-            email_draft = None
-            latest_completeness = None
-            for iteration in range(5):
-                logger.info(f"[Tool Loop] Iteration {iteration + 1}, {len(chat_messages)} messages")
-
-                completion = self.client.chat.completions.create(
-                    messages=chat_messages,
-                    model=self.model,
-                    temperature=0.7,
-                    max_tokens=4096,
-                    top_p=0.9,
-                    tools=TOOLS,
-                    tool_choice="auto",
-                )
-
-                response_message = completion.choices[0].message
-
-                # If no tool calls, we have the final response
-                if not response_message.tool_calls:
-                    ai_response = response_message.content or ""
-                    break
-
-                # Append assistant message with tool calls to the conversation
-                chat_messages.append({
-                    "role": "assistant",
-                    "tool_calls": [
-                        {
-                            "id": tc.id,
-                            "type": "function",
-                            "function": {
-                                "name": tc.function.name,
-                                "arguments": tc.function.arguments,
-                            },
-                        }
-                        for tc in response_message.tool_calls
-                    ],
-                })
-
-                # Execute each tool call and append results
-                for tool_call in response_message.tool_calls:
-                    fn_name = tool_call.function.name
-                    try:
-                        fn_args = json.loads(tool_call.function.arguments)
-                    except json.JSONDecodeError:
-                        logger.error(f"Failed to parse arguments for {fn_name}: {tool_call.function.arguments}")
-                        fn_args = {}
-
-                    logger.info(f"[Tool Call] {fn_name}({fn_args})")
-                    tool_result = self._execute_tool(fn_name, fn_args, conversation_id)
-                    logger.info(f"[Tool Result] {fn_name} → {tool_result[:200]}...")
-
-                    # Capture email draft for frontend (only on success)
-                    if fn_name == "draft_demand_notice_email":
-                        try:
-                            parsed = json.loads(tool_result)
-                            if parsed.get("status") == "drafted":
-                                email_draft = parsed
-                        except json.JSONDecodeError:
-                            pass
-
-                    # Capture updated completeness after document verification
-                    if fn_name == "verify_document":
-                        try:
-                            latest_completeness = json.loads(tool_result)
-                        except json.JSONDecodeError:
-                            pass
-
-                    chat_messages.append({
-                        "role": "tool",
-                        "tool_call_id": tool_call.id,
-                        "content": tool_result,
-                    })
-            else:
-                # Exhausted iterations -- use whatever content we have
-                ai_response = response_message.content or "I encountered an issue processing your request. Could you try rephrasing?"
-                logger.warning("[Tool Loop] Exhausted max iterations without final response")
-
-            actions = self._extract_actions(ai_response, messages)
-
-            # If an email was drafted, add a send_email action for the frontend
-            if email_draft and email_draft.get("status") == "drafted":
-                actions.append({
-                    "type": "send_email",
-                    "label": "Send Email",
-                })
+            result: Dict[str, Any] = {"conversation_id": conversation_id}
 
-            result = {
-                "response": ai_response,
-                "actions": actions,
-                "conversation_id": conversation_id,
-            }
-
-            if email_draft:
-                result["email_draft"] = email_draft
-
-            if latest_completeness:
-                result["completeness"] = latest_completeness
+            async for event in self.get_ai_response_stream(
+                messages, conversation_id, message_type, user_query
+            ):
+                if event["type"] != "done":
+                    continue
+                result["response"] = event["response"]
+                result["actions"] = event["actions"]
+                if event.get("email_draft"):
+                    result["email_draft"] = event["email_draft"]
+                if event.get("completeness"):
+                    result["completeness"] = event["completeness"]
 
             return result
 
@@ -600,22 +1339,79 @@ Use the context provided below to give accurate information about the MSMED Act
         Returns:
             List of action dictionaries with 'type' and 'label'.
         """
-        actions = []
-        response_lower = response.lower()
-
-        if any(kw in response_lower for kw in [
-            'upload', 'document', 'invoice', 'purchase order', 'receipt', 'contract'
-        ]):
-            actions.append({"type": "upload_document", "label": "Upload Document"})
-
-        if any(kw in response_lower for kw in [
-            'ready to file', 'file your claim', 'submit', 'proceed with filing'
-        ]):
-            actions.append({"type": "create_claim", "label": "File Dispute Claim"})
-
-        return actions
+        matched = set()
+        for match in _ACTION_KEYWORDS_RE.finditer(response):
+            matched.add(match.lastgroup)
+            if len(matched) == len(_KEYWORD_ACTIONS):
+                break
 
-    def summarize_conversation(
+        return [
+            {"type": action_type, "label": label}
+            for action_type, label, _ in _KEYWORD_ACTIONS
+            if action_type in matched
+        ]
+
+    @staticmethod
+    def _conversation_hash(messages: List[Dict[str, str]]) -> str:
+        """Hash the role/content of every message into a stable cache key."""
+        serialized = orjson.dumps([(msg.get("role"), msg.get("content")) for msg in messages])
+        return hashlib.sha256(serialized).hexdigest()
+
+    def _response_cache_key(self, phase: str, chat_messages: List[Dict[str, Any]]) -> str:
+        """Hash the model, prompt phase and history (everything after the system prompt)."""
+        serialized = orjson.dumps(
+            [self.model, phase, chat_messages[1:]],
+            option=orjson.OPT_SORT_KEYS,
+        )
+        return hashlib.sha256(serialized).hexdigest()
+
+    def _get_cached_response(self, key: str) -> Optional[Tuple[str, List[Dict[str, str]]]]:
+        """Return a cached (response, actions) pair if present and not expired."""
+        entry = self._response_cache.get(key)
+        if entry is None:
+            return None
+        cached_at, response, actions = entry
+        if time.monotonic() - cached_at > RESPONSE_CACHE_TTL_SECONDS:
+            del self._response_cache[key]
+            return None
+        self._response_cache.move_to_end(key)
+        return response, actions
+
+    def _store_response(self, key: str, response: str, actions: List[Dict[str, str]]) -> None:
+        """Cache a tool-free response, evicting the least recently used entries."""
+        self._response_cache[key] = (time.monotonic(), response, list(actions))
+        self._response_cache.move_to_end(key)
+        while len(self._response_cache) > RESPONSE_CACHE_MAX_ENTRIES:
+            self._response_cache.popitem(last=False)
+
+    @staticmethod
+    async def _replay_response(response: str, actions: List[Dict[str, str]]):
+        """Re-emit a cached response as small content events followed by done."""
+        for start in range(0, len(response), REPLAY_CHUNK_CHARS):
+            yield {"type": "content", "content": response[start:start + REPLAY_CHUNK_CHARS]}
+            await asyncio.sleep(0)
+        yield {"type": "done", "response": response, "actions": list(actions)}
+
+    def _get_cached_summary(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a cached summary if present and not expired."""
+        entry = self._summary_cache.get(key)
+        if entry is None:
+            return None
+        cached_at, summary = entry
+        if time.monotonic() - cached_at > SUMMARY_CACHE_TTL_SECONDS:
+            del self._summary_cache[key]
+            return None
+        self._summary_cache.move_to_end(key)
+        return summary
+
+    def _store_summary(self, key: str, summary: Dict[str, Any]) -> None:
+        """Cache a summary, evicting the least recently used entry when full."""
+        self._summary_cache[key] = (time.monotonic(), summary)
+        self._summary_cache.move_to_end(key)
+        while len(self._summary_cache) > SUMMARY_CACHE_MAX_ENTRIES:
+            self._summary_cache.popitem(last=False)
+
+    async def summarize_conversation(
         self,
         messages: List[Dict[str, str]],
     ) -> Dict[str, Any]:
@@ -626,34 +1422,42 @@ Use the context provided below to give accurate information about the MSMED Act
             messages: List of conversation messages.
 
         Returns:
-            Dictionary with extracted claim information.
+            Dictionary with the extracted claim fields under 'summary'.
         """
         try:
-            summary_prompt = """Based on this conversation, extract the following information about the MSME payment dispute:
-
-1. Buyer/Customer Name
-2. Amount Owed (in INR)
-3. Invoice Number(s)
-4. Invoice Date(s)
-5. Payment Due Date
-6. Days Overdue
-7. Brief Description of Dispute
-8. Documents Mentioned/Uploaded
-
-Return the information in a structured format. If information is not available, mark as "Not provided"."""
+            cache_key = self._conversation_hash(messages)
+            cached = self._get_cached_summary(cache_key)
+            if cached is not None:
+                logger.info("[Summary] Cache hit")
+                return {
+                    "summary": cached,
+                    "conversation_length": len(messages),
+                }
 
             summary_messages = messages + [
-                {"role": "user", "content": summary_prompt}
+                {"role": "user", "content": SUMMARY_PROMPT}
             ]
 
-            chat_completion = self.client.chat.completions.create(
+            chat_completion = await self.client.chat.completions.create(
                 messages=summary_messages,
-                model=self.model,
-                temperature=0.3,
-                max_tokens=512,
+                model=self.summary_model,
+                temperature=0.0,
+                top_p=1.0,
+                seed=SUMMARY_SEED,
+                max_tokens=256,
+                response_format={"type": "json_object"},
             )
 
-            summary = chat_completion.choices[0].message.content
+            summary_text = chat_completion.choices[0].message.content or "{}"
+            # Only the text is needed; don't keep the response object alive
+            del chat_completion
+            try:
+                summary = orjson.loads(summary_text)
+            except orjson.JSONDecodeError:
+                logger.warning("[Summary] Could not parse summary response as JSON")
+                summary = {"raw_summary": summary_text}
+            else:
+                self._store_summary(cache_key, summary)
 
             return {
                 "summary": summary,
@@ -663,115 +1467,415 @@ Return the information in a structured format. If information is not available,
         except Exception as e:
             raise Exception(f"Error summarizing conversation: {str(e)}")
 
+    async def summarize_batch(
+        self,
+        conversations: List[List[Dict[str, str]]],
+    ) -> List[Dict[str, Any]]:
+        """
+        Summarize many conversations, marshalling up to SUMMARY_BATCH_SIZE of
+        them into each LLM request.
+
+        Intended for reporting/export jobs where throughput under provider
+        rate limits matters more than per-conversation latency. Cached
+        summaries are reused; a group whose batched response can't be parsed
+        falls back to per-conversation calls.
+
+        Args:
+            conversations: List of conversation message lists.
+
+        Returns:
+            One summary dict per conversation, in input order.
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(conversations)
+        pending: List[Tuple[int, str]] = []
+
+        for i, messages in enumerate(conversations):
+            cache_key = self._conversation_hash(messages)
+            cached = self._get_cached_summary(cache_key)
+            if cached is not None:
+                results[i] = {"summary": cached, "conversation_length": len(messages)}
+            else:
+                pending.append((i, cache_key))
+
+        for start in range(0, len(pending), SUMMARY_BATCH_SIZE):
+            group = pending[start:start + SUMMARY_BATCH_SIZE]
+            summaries = await self._summarize_group([conversations[i] for i, _ in group])
+
+            for (i, cache_key), summary in zip(group, summaries):
+                if summary is None:
+                    results[i] = await self.summarize_conversation(conversations[i])
+                    continue
+                self._store_summary(cache_key, summary)
+                results[i] = {"summary": summary, "conversation_length": len(conversations[i])}
+
+        return results
+
+    async def _summarize_group(
+        self,
+        conversations: List[List[Dict[str, str]]],
+    ) -> List[Optional[Dict[str, Any]]]:
+        """
+        Summarize a group of conversations in one LLM call.
+
+        Returns:
+            Parsed summaries in input order, or all None if the response
+            could not be parsed into the expected number of entries.
+        """
+        parts = []
+        for n, messages in enumerate(conversations, 1):
+            transcript = "\n".join(f"{msg.get('role')}: {msg.get('content', '')}" for msg in messages)
+            parts.append(f"=== CONVERSATION {n} ===\n{transcript}")
+
+        try:
+            chat_completion = await self.client.chat.completions.create(
+                messages=[
+                    {"role": "system", "content": BATCH_SUMMARY_PROMPT},
+                    {"role": "user", "content": "\n\n".join(parts)},
+                ],
+                model=self.summary_model,
+                temperature=0.0,
+                top_p=1.0,
+                seed=SUMMARY_SEED,
+                max_tokens=256 * len(conversations),
+                response_format={"type": "json_object"},
+            )
+            summaries = orjson.loads(chat_completion.choices[0].message.content or "{}").get("summaries")
+            del chat_completion
+        except Exception as e:
+            logger.warning(f"[Summary] Batch summarization failed: {e}")
+            summaries = None
+
+        if not isinstance(summaries, list) or len(summaries) != len(conversations):
+            logger.warning("[Summary] Batch response malformed, falling back to single calls")
+            return [None] * len(conversations)
+
+        return [s if isinstance(s, dict) else None for s in summaries]
+
+    async def enqueue_summary_batch(
+        self,
+        conversations: Dict[str, List[Dict[str, str]]],
+    ) -> str:
+        """
+        Submit conversations for summarization through the OpenAI Batch API.
+
+        For nightly digests and exports that can wait; results are picked up
+        later with collect_summary_batch().
+
+        Args:
+            conversations: Conversation messages keyed by conversation ID.
+
+        Returns:
+            The batch ID to poll.
+        """
+        try:
+            lines = []
+            for conversation_id, messages in conversations.items():
+                lines.append(_dump_json({
+                    "custom_id": conversation_id,
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": {
+                        "model": self.summary_model,
+                        "messages": messages + [{"role": "user", "content": SUMMARY_PROMPT}],
+                        "temperature": 0.0,
+                        "top_p": 1.0,
+                        "seed": SUMMARY_SEED,
+                        "max_tokens": 256,
+                        "response_format": {"type": "json_object"},
+                    },
+                }, ensure_ascii=False))
+
+            batch_file = await self.client.files.create(
+                file=("summaries.jsonl", "\n".join(lines).encode("utf-8")),
+                purpose="batch",
+            )
+            batch = await self.client.batches.create(
+                input_file_id=batch_file.id,
+                endpoint="/v1/chat/completions",
+                completion_window="24h",
+            )
+            logger.info(f"[Summary] Enqueued batch {batch.id} with {len(lines)} conversations")
+            return batch.id
+
+        except Exception as e:
+            raise Exception(f"Error enqueuing summary batch: {str(e)}")
+
+    async def collect_summary_batch(
+        self,
+        batch_id: str,
+        conversations: Dict[str, List[Dict[str, str]]],
+    ) -> Optional[Dict[str, Dict[str, Any]]]:
+        """
+        Poll a summary batch and return its results once available.
+
+        Conversations whose batch line failed are summarized online. If the
+        batch failed, expired, or is still running past
+        SUMMARY_BATCH_SLA_SECONDS, it is cancelled and every conversation is
+        summarized online via summarize_batch().
+
+        Args:
+            batch_id: ID returned by enqueue_summary_batch().
+            conversations: The same mapping that was enqueued.
+
+        Returns:
+            Summary dicts keyed by conversation ID, or None if the batch is
+            still running within its SLA.
+        """
+        try:
+            batch = await self.client.batches.retrieve(batch_id)
+
+            if batch.status == "completed" and batch.output_file_id:
+                output = await self.client.files.content(batch.output_file_id)
+                results: Dict[str, Dict[str, Any]] = {}
+
+                for line in output.text.splitlines():
+                    if not line.strip():
+                        continue
+                    record = orjson.loads(line)
+                    conversation_id = record.get("custom_id")
+                    if conversation_id not in conversations:
+                        continue
+                    try:
+                        body = record["response"]["body"]
+                        summary = orjson.loads(body["choices"][0]["message"]["content"])
+                    except (KeyError, IndexError, TypeError, orjson.JSONDecodeError):
+                        continue
+
+                    messages = conversations[conversation_id]
+                    self._store_summary(self._conversation_hash(messages), summary)
+                    results[conversation_id] = {"summary": summary, "conversation_length": len(messages)}
+
+                for conversation_id in conversations.keys() - results.keys():
+                    results[conversation_id] = await self.summarize_conversation(conversations[conversation_id])
+
+                logger.info(f"[Summary] Collected batch {batch_id}: {len(results)} summaries")
+                return results
+
+            overdue = time.time() - batch.created_at > SUMMARY_BATCH_SLA_SECONDS
+            if batch.status in _BATCH_PENDING_STATUSES and not overdue:
+                return None
+
+            if batch.status in _BATCH_PENDING_STATUSES:
+                await self.client.batches.cancel(batch_id)
+            logger.warning(f"[Summary] Batch {batch_id} {batch.status} (overdue={overdue}), summarizing online")
+
+            conversation_ids = list(conversations)
+            summaries = await self.summarize_batch([conversations[cid] for cid in conversation_ids])
+            return dict(zip(conversation_ids, summaries))
+
+        except Exception as e:
+            raise Exception(f"Error collecting summary batch: {str(e)}")
+
     async def get_ai_response_stream(
         self,
         messages: List[Dict[str, str]],
         conversation_id: str,
         message_type: str = "text",
+        user_query: Optional[str] = None,
     ):
         """
         Get AI response with streaming support.
 
-        Tool calls are executed server-side and emitted as events.
-        Final text response is streamed token-by-token.
+        Tool calls are executed server-side (concurrently within a turn) and
+        emitted as events. Final text response is streamed token-by-token.
 
         Args:
             messages: Conversation history with 'role' and 'content'.
             conversation_id: Unique conversation identifier.
             message_type: One of 'text', 'voice', 'document'.
+            user_query: Latest user message, if the caller has it; otherwise
+                it is taken from messages.
 
         Yields:
             Dict events with 'type' and 'data' fields:
             - {"type": "tool_start", "data": {"tool": "...", "args": {...}}}
             - {"type": "tool_end", "data": {"tool": "...", "result": {...}}}
+            - {"type": "tool_error", "data": {"tool": "...", "error": "invalid_json"}}
             - {"type": "content", "content": "token"}
-            - {"type": "done", "actions": [...]}
+            - {"type": "done", "response": "...", "actions": [...],
+               "email_draft": {...}, "completeness": {...}}
+              (email_draft / completeness only when produced by a tool)
         """
         try:
-            # Extract latest user message for RAG retrieval
-            user_query = ""
-            for msg in reversed(messages):
-                if msg.get("role") == "user":
-                    user_query = msg.get("content", "")
-                    break
-
-            # Retrieve relevant context from knowledge base
-            rag_context = ""
-            if user_query and self.rag_service.is_index_available():
-                rag_context = self.rag_service.get_context_for_query(user_query)
-                if rag_context:
-                    logger.info(f"[RAG] Retrieved {len(rag_context)} chars of context")
-                else:
-                    logger.info("[RAG] No context retrieved")
-            else:
-                logger.warning("[RAG] Index not available - using base prompt only")
+            # Lay out the chat messages behind the static system prompt, picking
+            # up the latest user message for RAG if the caller didn't pass it
+            history = messages
+            if HISTORY_COMPACTION_ENABLED:
+                history = await self._compact_history(messages, conversation_id)
+                self._schedule_case_state_refresh(messages, conversation_id)
+            phase = await self._infer_phase(conversation_id, message_type)
+            logger.info("[Prompt] Phase '%s' for %s", phase, conversation_id)
+            user_query, chat_messages = _prepare_chat_messages(
+                history, PHASE_PROMPTS[phase], user_query
+            )
 
-            # Build system prompt with RAG context
-            system_prompt = self.SYSTEM_PROMPT
-            if rag_context:
-                system_prompt += (
-                    f"\n\n--- RELEVANT KNOWLEDGE FROM MSMED ACT & DOCUMENTS ---\n\n"
-                    f"{rag_context}\n\n--- END OF CONTEXT ---"
-                )
+            # Replay identical requests whose answer needed no tools
+            response_key = self._response_cache_key(phase, chat_messages)
+            cached_response = self._get_cached_response(response_key)
+            if cached_response is not None:
+                logger.info("[Response Cache] Hit")
+                async for event in self._replay_response(*cached_response):
+                    yield event
+                return
+
+            # Serve near-identical opening questions from the semantic cache.
+            # Document turns are excluded since their answer depends on upload
+            # state.
+            query_embedding = None
+            semantic_cache = None
+            if user_query and message_type != "document" and _semantic_cache_eligible(messages, user_query):
+                semantic_cache = self.semantic_caches.get(phase)
+            if semantic_cache is not None:
+                query_embedding = await asyncio.to_thread(self.rag_service.embed_query, user_query)
+                cached = semantic_cache.lookup(query_embedding)
+                if cached is not None:
+                    async for event in self._replay_response(cached["response"], cached["actions"]):
+                        yield event
+                    return
+
+            # Plain interest questions don't need the model at all
+            shortcut = None
+            if INTEREST_SHORTCUT_ENABLED and message_type == "text" and _interest_shortcut_allowed(messages):
+                shortcut = _match_interest_calculation(user_query)
+            if shortcut is not None:
+                principal_amount, days_overdue = shortcut
+                fn_args = {"principal_amount": principal_amount, "days_overdue": days_overdue}
+                logger.info("[Tool Call] calculate_msme_interest(%s) [shortcut]", fn_args)
+                yield {"type": "tool_start", "data": {"tool": "calculate_msme_interest", "args": fn_args}}
+                result = calculate_section15_interest(**fn_args)
+                self._record_interest_facts(conversation_id, result)
+                yield {
+                    "type": "tool_end",
+                    "data": {"tool": "calculate_msme_interest", "result": _dump_json(result)},
+                }
+                ai_response = _format_interest_reply(user_query, result)
+                yield {"type": "content", "content": ai_response}
+                yield {
+                    "type": "done",
+                    "response": ai_response,
+                    "actions": self._extract_actions(ai_response, messages),
+                }
+                return
+
+            # Retrieve relevant context off the event loop so embedding and
+            # re-ranking don't stall other streams sharing this worker
+            rag_context = await asyncio.to_thread(
+                self._retrieve_rag_context, user_query, conversation_id, query_embedding
+            )
 
-            chat_messages = [{"role": "system", "content": system_prompt}] + messages
+            # Append RAG context last so it doesn't invalidate the cached prefix
+            if rag_context:
+                chat_messages.append(self._build_context_message(rag_context))
 
             # Tool-call loop (max 5 iterations)
+            email_draft = None
+            latest_completeness = None
+            tools_called = False
             for iteration in range(5):
-                logger.info(f"[Tool Loop] Iteration {iteration + 1}, {len(chat_messages)} messages")
+                logger.info("[Tool Loop] Iteration %d, %d messages", iteration + 1, len(chat_messages))
 
                 # Make streaming API call
-                stream = self.client.chat.completions.create(
+                stream = await self.client.chat.completions.create(
                     messages=chat_messages,
-                    model=self.model,
-                    temperature=0.7,
-                    max_tokens=4096,
-                    top_p=0.9,
-                    tools=TOOLS,
-                    tool_choice="auto",
-                    stream=True,
+                    **self._chat_kwargs_by_phase[phase],
                 )
 
                 # Collect streaming response
                 tool_calls_buffer = []
+                # (tool_call, fn_name, fn_args, task) for calls already started
+                dispatched = []
                 content_buffer = ""
+                batcher = _ContentBatcher()
                 current_tool_call = None
-
-                for chunk in stream:
-                    delta = chunk.choices[0].delta if chunk.choices else None
-                    if not delta:
-                        continue
-
-                    # Handle tool calls
-                    if delta.tool_calls:
-                        for tc_delta in delta.tool_calls:
-                            # Initialize new tool call
-                            if tc_delta.index is not None:
-                                while len(tool_calls_buffer) <= tc_delta.index:
-                                    tool_calls_buffer.append({
-                                        "id": "",
-                                        "type": "function",
-                                        "function": {"name": "", "arguments": ""}
-                                    })
-                                current_tool_call = tool_calls_buffer[tc_delta.index]
-
-                            # Append tool call data
-                            if tc_delta.id:
-                                current_tool_call["id"] = tc_delta.id
-                            if tc_delta.function:
-                                if tc_delta.function.name:
-                                    current_tool_call["function"]["name"] = tc_delta.function.name
-                                if tc_delta.function.arguments:
-                                    current_tool_call["function"]["arguments"] += tc_delta.function.arguments
-
-                    # Handle content tokens
-                    if delta.content:
-                        content_buffer += delta.content
-                        # Stream content token to client
-                        yield {"type": "content", "content": delta.content}
+                aborted = False
+
+                # Close the stream even when the turn is cut short, so its
+                # HTTP response is released before the next call or done event
+                try:
+                    async for chunk in stream:
+                        delta = chunk.choices[0].delta if chunk.choices else None
+                        if not delta:
+                            continue
+
+                        # Handle tool calls
+                        if delta.tool_calls:
+                            for tc_delta in delta.tool_calls:
+                                # Initialize new tool call
+                                if tc_delta.index is not None:
+                                    # Tool calls stream in index order, so a new
+                                    # index means every earlier call's arguments are
+                                    # complete: start those while the model keeps
+                                    # generating
+                                    while len(dispatched) < min(tc_delta.index, len(tool_calls_buffer)):
+                                        pending_content = batcher.flush()
+                                        if pending_content:
+                                            yield {"type": "content", "content": pending_content}
+                                        tool_call = tool_calls_buffer[len(dispatched)]
+                                        fn_name, fn_args, task = self._dispatch_tool_call(tool_call, conversation_id)
+                                        dispatched.append((tool_call, fn_name, fn_args, task))
+                                        if fn_args is None:
+                                            # The model has to retry this turn anyway;
+                                            # stop paying for the rest of it
+                                            yield {"type": "tool_error", "data": {"tool": fn_name, "error": "invalid_json"}}
+                                            aborted = True
+                                            break
+                                        yield {"type": "tool_start", "data": {"tool": fn_name, "args": fn_args}}
+                                    if aborted:
+                                        break
+
+                                    while len(tool_calls_buffer) <= tc_delta.index:
+                                        tool_calls_buffer.append({
+                                            "id": "",
+                                            "type": "function",
+                                            "function": {"name": "", "arguments_parts": []}
+                                        })
+                                    current_tool_call = tool_calls_buffer[tc_delta.index]
+
+                                # Append tool call data
+                                if tc_delta.id:
+                                    current_tool_call["id"] = tc_delta.id
+                                if tc_delta.function:
+                                    if tc_delta.function.name:
+                                        current_tool_call["function"]["name"] = tc_delta.function.name
+                                    if tc_delta.function.arguments:
+                                        # Collect fragments and join once, instead of
+                                        # re-copying the whole string per delta
+                                        current_tool_call["function"]["arguments_parts"].append(tc_delta.function.arguments)
+
+                        # Handle content tokens
+                        if delta.content:
+                            content_buffer += delta.content
+                            # Stream content to client in growing batches
+                            batch = batcher.add(delta.content)
+                            if batch:
+                                yield {"type": "content", "content": batch}
+
+                        if aborted:
+                            break
+                finally:
+                    await stream.close()
+
+                if aborted:
+                    # Drop the calls streamed after the malformed one
+                    del tool_calls_buffer[len(dispatched):]
+
+                batch = batcher.flush()
+                if batch:
+                    yield {"type": "content", "content": batch}
 
                 # If we have tool calls, execute them
                 if tool_calls_buffer:
+                    tools_called = True
+
+                    # Start whatever wasn't started mid-stream (always the last call)
+                    for tool_call in tool_calls_buffer[len(dispatched):]:
+                        fn_name, fn_args, task = self._dispatch_tool_call(tool_call, conversation_id)
+                        dispatched.append((tool_call, fn_name, fn_args, task))
+                        if fn_args is None:
+                            yield {"type": "tool_error", "data": {"tool": fn_name, "error": "invalid_json"}}
+                        else:
+                            yield {"type": "tool_start", "data": {"tool": fn_name, "args": fn_args}}
+
                     # Add assistant message with tool calls to conversation
                     chat_messages.append({
                         "role": "assistant",
@@ -788,30 +1892,50 @@ Return the information in a structured format. If information is not available,
                         ],
                     })
 
-                    # Execute each tool call
-                    for tool_call in tool_calls_buffer:
-                        fn_name = tool_call["function"]["name"]
-                        try:
-                            fn_args = json.loads(tool_call["function"]["arguments"])
-                        except json.JSONDecodeError:
-                            logger.error(f"Failed to parse arguments for {fn_name}: {tool_call['function']['arguments']}")
-                            fn_args = {}
-
-                        # Emit tool execution start
-                        yield {
-                            "type": "tool_start",
-                            "data": {"tool": fn_name, "args": fn_args}
-                        }
-
-                        logger.info(f"[Tool Call] {fn_name}({fn_args})")
-                        tool_result = self._execute_tool(fn_name, fn_args, conversation_id)
-                        logger.info(f"[Tool Result] {fn_name} → {tool_result[:200]}...")
-
-                        # Emit tool execution end
-                        yield {
-                            "type": "tool_end",
-                            "data": {"tool": fn_name, "result": tool_result}
-                        }
+                    # Tool calls within one turn are independent and already
+                    # running; report each one as soon as it finishes
+                    pending = {task: i for i, (*_, task) in enumerate(dispatched)}
+                    tool_results: List[Optional[str]] = [None] * len(dispatched)
+                    while pending:
+                        done, _ = await asyncio.wait(list(pending), return_when=asyncio.FIRST_COMPLETED)
+                        for task in sorted(done, key=pending.get):
+                            i = pending.pop(task)
+                            tool_results[i] = task.result()
+                            _, fn_name, fn_args, _ = dispatched[i]
+                            if fn_args is None:
+                                # Already reported as tool_error
+                                continue
+                            logger.info("[Tool Result] %s → %.200s...", fn_name, tool_results[i])
+                            yield {
+                                "type": "tool_end",
+                                "data": {"tool": fn_name, "result": tool_results[i]}
+                            }
+
+                    # Apply results in call order so tool messages match the
+                    # assistant's tool_calls
+                    for (tool_call, fn_name, _, _), tool_result in zip(dispatched, tool_results):
+                        # Capture email draft for frontend (only on success)
+                        if fn_name == "draft_demand_notice_email":
+                            try:
+                                parsed = orjson.loads(tool_result)
+                                if parsed.get("status") == "drafted":
+                                    email_draft = parsed
+                                    self._set_phase(conversation_id, "followup")
+                            except orjson.JSONDecodeError:
+                                pass
+
+                        # Capture updated completeness after document verification
+                        if fn_name == "verify_document":
+                            try:
+                                latest_completeness = orjson.loads(tool_result)
+                            except orjson.JSONDecodeError:
+                                pass
+                            else:
+                                if "completeness_percentage" in latest_completeness:
+                                    self._set_phase(
+                                        conversation_id,
+                                        self._phase_from_completeness(latest_completeness),
+                                    )
 
                         # Add tool result to conversation
                         chat_messages.append({
@@ -820,26 +1944,79 @@ Return the information in a structured format. If information is not available,
                             "content": tool_result,
                         })
 
+                    # A verification may have completed the document set, so
+                    # the follow-up call gets the tools for the updated phase
+                    phase = self._phase_cache.get(conversation_id, phase)
+
                     # Continue loop to get next response
                     continue
 
                 # No tool calls - we have final response
                 ai_response = content_buffer
+                # Only tool-free answers are safe to replay
+                tool_free = not tools_called and bool(ai_response)
                 break
             else:
                 # Exhausted iterations
+                tool_free = False
                 ai_response = content_buffer or "I encountered an issue processing your request. Could you try rephrasing?"
                 logger.warning("[Tool Loop] Exhausted max iterations without final response")
 
             # Extract actions from response
             actions = self._extract_actions(ai_response, messages)
 
+            if tool_free:
+                self._store_response(response_key, ai_response, actions)
+
+            if tool_free and semantic_cache is not None:
+                semantic_cache.store(query_embedding, {
+                    "response": ai_response,
+                    "actions": list(actions),
+                })
+
+            # If an email was drafted, add a send_email action for the frontend
+            if email_draft:
+                actions.append({
+                    "type": "send_email",
+                    "label": "Send Email",
+                })
+
             # Emit done event
-            yield {
+            done_event: Dict[str, Any] = {
                 "type": "done",
+                "response": ai_response,
                 "actions": actions,
             }
+            if email_draft:
+                done_event["email_draft"] = email_draft
+            if latest_completeness:
+                done_event["completeness"] = latest_completeness
+            yield done_event
 
         except Exception as e:
             logger.exception("Error getting AI response stream")
             raise Exception(f"Error getting AI response stream: {str(e)}")
+
+
+# Singleton client so all service instances reuse one HTTP/2 connection pool
+_openai_client: Optional[AsyncOpenAI] = None
+
+
+def get_openai_client() -> AsyncOpenAI:
+    """Get or create the shared async OpenAI client."""
+    global _openai_client
+    if _openai_client is None:
+        openai_api_key = os.getenv("OPENAI_API_KEY")
+        if not openai_api_key:
+            raise ValueError("OPENAI_API_KEY not found in environment variables")
+
+        http_client = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            ),
+            timeout=httpx.Timeout(HTTP_TIMEOUT_SECONDS, connect=HTTP_CONNECT_TIMEOUT_SECONDS),
+        )
+        _openai_client = AsyncOpenAI(api_key=openai_api_key, http_client=http_client)
+    return _openai_client
@@ -4,6 +4,9 @@ Used for demand notices, payment reminders, and legal notices.
 """
 
 import os
+import time
+import asyncio
+import queue
 import smtplib
 import logging
 from email.mime.text import MIMEText
@@ -13,6 +16,79 @@ from typing import Dict, Any
 
 logger = logging.getLogger(__name__)
 
+SMTP_HOST = "smtp.gmail.com"
+SMTP_PORT = 587
+SMTP_TIMEOUT_SECONDS = 30
+# Authenticated connections kept warm between sends
+SMTP_POOL_SIZE = 4
+# Gmail drops idle sessions after ~10 minutes; retire ours well before that
+SMTP_IDLE_TIMEOUT_SECONDS = 300
+
+
+class _SMTPPool:
+    """
+    Pool of logged-in SMTP connections.
+    Reusing a connection skips the TCP connect, STARTTLS handshake and LOGIN
+    that otherwise precede every message.
+    """
+
+    def __init__(self, size: int, idle_timeout: float):
+        # LIFO so the most recently used (least likely to be stale) goes first
+        self._idle: "queue.LifoQueue" = queue.LifoQueue(maxsize=size)
+        self.idle_timeout = idle_timeout
+
+    def acquire(self, address: str, password: str) -> smtplib.SMTP:
+        """Return a live connection logged in as `address`, opening one if needed."""
+        while True:
+            try:
+                server, login, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect(address, password)
+
+            if login != address or time.monotonic() - last_used > self.idle_timeout:
+                self._close(server)
+                continue
+
+            try:
+                code, _ = server.noop()
+            except (smtplib.SMTPException, OSError):
+                code = None
+            if code == 250:
+                return server
+            self._close(server)
+
+    def release(self, server: smtplib.SMTP, address: str) -> None:
+        """Return a healthy connection to the pool, closing it if the pool is full."""
+        try:
+            self._idle.put_nowait((server, address, time.monotonic()))
+        except queue.Full:
+            self._close(server)
+
+    def discard(self, server: smtplib.SMTP) -> None:
+        """Drop a connection that failed mid-send."""
+        self._close(server)
+
+    @staticmethod
+    def _connect(address: str, password: str) -> smtplib.SMTP:
+        server = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT_SECONDS)
+        try:
+            server.starttls()
+            server.login(address, password)
+        except Exception:
+            _SMTPPool._close(server)
+            raise
+        return server
+
+    @staticmethod
+    def _close(server: smtplib.SMTP) -> None:
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            server.close()
+
+
+_pool = _SMTPPool(SMTP_POOL_SIZE, SMTP_IDLE_TIMEOUT_SECONDS)
+
 
 def send_email(
     to_email: str,
@@ -58,10 +134,13 @@ def send_email(
         recipients.append(gmail_address)
 
     try:
-        with smtplib.SMTP("smtp.gmail.com", 587, timeout=30) as server:
-            server.starttls()
-            server.login(gmail_address, gmail_app_password)
+        server = _pool.acquire(gmail_address, gmail_app_password)
+        try:
             server.sendmail(gmail_address, recipients, msg.as_string())
+        except Exception:
+            _pool.discard(server)
+            raise
+        _pool.release(server, gmail_address)
 
         logger.info(f"Email sent to {to_email}: {subject}")
         return {
@@ -92,3 +171,28 @@ def send_email(
             "error": f"Unexpected error: {str(e)}",
             "timestamp": datetime.now().isoformat(),
         }
+
+
+async def send_email_async(
+    to_email: str,
+    subject: str,
+    body_html: str,
+    cc_user: bool = False,
+) -> Dict[str, Any]:
+    """
+    Send an email without blocking the event loop.
+
+    Runs send_email on a worker thread, so async callers keep serving other
+    requests while the SMTP exchange is in flight. Connections still come
+    from the shared pool.
+
+    Args:
+        to_email: Recipient email address.
+        subject: Email subject line.
+        body_html: HTML body of the email.
+        cc_user: If True, CC the sender (GMAIL_ADDRESS) on the email.
+
+    Returns:
+        Dict with status, timestamp, and any error details.
+    """
+    return await asyncio.to_thread(send_email, to_email, subject, body_html, cc_user)
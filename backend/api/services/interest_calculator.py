@@ -7,6 +7,8 @@ import logging
 import math
 from typing import Dict, Any
 
+import numpy as np
+
 logger = logging.getLogger(__name__)
 
 # RBI bank rate (as of 2024-25). Update when RBI changes it.
@@ -14,6 +16,20 @@ RBI_BANK_RATE = 6.5
 # Section 16: rate = 3x the bank rate
 INTEREST_RATE = RBI_BANK_RATE * 3  # 19.5%
 
+# (1 + r)^n for the monthly rate, precomputed for the first 50 years of
+# delay. Derived from INTEREST_RATE at import, so a bank-rate change above
+# regenerates it. Built with math.pow (not exp/log1p) so amounts stay
+# identical to the paisa on large, long-overdue claims.
+MONTHLY_RATE = INTEREST_RATE / (12 * 100)
+_COMPOUND_FACTORS = tuple(math.pow(1 + MONTHLY_RATE, n) for n in range(600))
+
+
+def _compound_factor(full_months: int) -> float:
+    """Return (1 + MONTHLY_RATE) ** full_months, from the table when possible."""
+    if full_months < len(_COMPOUND_FACTORS):
+        return _COMPOUND_FACTORS[full_months]
+    return math.pow(1 + MONTHLY_RATE, full_months)
+
 
 def calculate_section15_interest(
     principal_amount: float,
@@ -55,14 +71,14 @@ def calculate_section15_interest(
         }
 
     # Monthly rate from annual rate
-    monthly_rate = INTEREST_RATE / (12 * 100)
+    monthly_rate = MONTHLY_RATE
 
     # Full months and remaining days
     full_months = days_overdue // 30
     remaining_days = days_overdue % 30
 
     # Compound interest for full months: P * (1 + r)^n - P
-    compound_factor = math.pow(1 + monthly_rate, full_months)
+    compound_factor = _compound_factor(int(full_months))
     amount_after_months = principal_amount * compound_factor
 
     # Simple interest for remaining partial month
@@ -84,3 +100,43 @@ def calculate_section15_interest(
         "interest_amount": interest_amount,
         "total_due": total_due,
     }
+
+
+def calculate_section15_interest_batch(
+    principal_amounts: np.ndarray,
+    days_overdue: np.ndarray,
+) -> Dict[str, Any]:
+    """
+    Vectorized calculate_section15_interest for portfolios and aging reports.
+
+    Applies the same monthly-compounding rule element-wise. Non-positive
+    principals or days accrue no interest, as in the scalar function.
+
+    Args:
+        principal_amounts: Outstanding amounts in INR.
+        days_overdue: Days past due, same shape as principal_amounts.
+
+    Returns:
+        Dict with arrays principal, days_overdue, interest_amount, total_due
+        and the scalar interest_rate.
+    """
+    principals = np.asarray(principal_amounts, dtype=np.float64)
+    days = np.maximum(np.asarray(days_overdue, dtype=np.int64), 0)
+
+    monthly_rate = MONTHLY_RATE
+    full_months = days // 30
+    remaining_days = days % 30
+
+    compound_factor = np.power(1 + monthly_rate, full_months)
+    amount = principals * compound_factor * (1 + (monthly_rate / 30) * remaining_days)
+
+    interest_amount = np.where(principals > 0, np.round(amount - principals, 2), 0.0)
+    total_due = np.round(principals + interest_amount, 2)
+
+    return {
+        "principal": principals,
+        "days_overdue": days,
+        "interest_rate": INTEREST_RATE,
+        "interest_amount": interest_amount,
+        "total_due": total_due,
+    }
@@ -5,28 +5,590 @@ Uses Groq LLM for extracting structured invoice/document data.
 """
 
 import os
+import re
+import queue
+import asyncio
 import logging
 import tempfile
-import json
+import hashlib
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from functools import lru_cache
+from itertools import islice
 from pathlib import Path
-from typing import Dict, Optional, List, Any
+from typing import Callable, Dict, Iterable, Optional, List, Any, Sequence, Tuple, Union
+import httpx
+import orjson
 from dotenv import load_dotenv
-from groq import Groq
+from groq import APIConnectionError, Groq, InternalServerError, RateLimitError
+from pydantic import ValidationError
+
+from api.models.document import EXTRACTION_MODELS
+
+# OCR and PDF libraries are imported once here rather than inside every
+# per-page call. Each one is optional: without it the matching code path
+# reports itself unavailable instead of the service failing to load.
+try:
+    import pytesseract
+    from PIL import Image
+    _HAS_OCR = True
+except ImportError:
+    pytesseract = Image = None
+    _HAS_OCR = False
+try:
+    from pdf2image import convert_from_path, pdfinfo_from_path
+except ImportError:
+    convert_from_path = pdfinfo_from_path = None
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
 
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Pages of a scanned PDF are OCR'd in parallel; each page runs its own
+# tesseract process, so threads scale with cores
+OCR_CONCURRENCY = int(os.getenv("OCR_CONCURRENCY", os.cpu_count() or 1))
+_OCR_POOL = ThreadPoolExecutor(max_workers=OCR_CONCURRENCY, thread_name_prefix="ocr")
+# Only the first PDF_MAX_PAGES pages of a PDF are read (0 = all). Dispute
+# evidence carries its key details up front, and the extraction prompt is
+# clipped well before this many pages of text anyway.
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "50")) or None
+# Rendered pages waiting for OCR; rendering pauses beyond this so a long
+# scan never has every page on disk at once
+OCR_PAGES_AHEAD = OCR_CONCURRENCY * 2
+# Tesseract's own OpenMP threads fight each other when several pages are
+# OCR'd at once; parallelism comes from the pool instead
+if OCR_CONCURRENCY > 1:
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+# tesserocr (optional) binds libtesseract in-process; when installed, OCR
+# reuses loaded engines instead of starting a tesseract process per page.
+# Imported only here: its OpenMP runtime reads OMP_THREAD_LIMIT on load.
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+# Rendered pages only live until tesseract has read them; keep them in RAM
+# where a tmpfs is available
+OCR_TEMP_DIR = "/dev/shm" if os.access("/dev/shm", os.W_OK) else None
+# Formats tesseract reads itself. Images already in one of these (and in a
+# mode it handles) are passed by path instead of being decoded with PIL and
+# re-encoded to a temp file by pytesseract.
+TESSERACT_NATIVE_FORMATS = {"PNG", "JPEG", "TIFF", "BMP"}
+# Scanned pages are OCR'd at OCR_DPI first, which is enough for printed
+# invoices; a page whose mean word confidence (tesseract's 0-100 scale)
+# falls below OCR_MIN_CONFIDENCE, or that yields no text or fewer than
+# OCR_MIN_PAGE_CHARS characters, is re-rendered at OCR_RETRY_DPI
+OCR_DPI = 150
+OCR_RETRY_DPI = 300
+OCR_MIN_CONFIDENCE = 70
+OCR_MIN_PAGE_CHARS = 20
+NO_TEXT_DETECTED = "[No text detected in image]"
+OCR_JPEG_QUALITY = 90
+# With several languages requested, probe the page's script with tesseract
+# OSD first and OCR with only the matching models. Off by default: the
+# probe is an extra tesseract run and a minority script on a mixed page is
+# lost. English is kept alongside Indic scripts for numbers and names.
+OCR_DETECT_SCRIPT = os.getenv("OCR_DETECT_SCRIPT", "false").lower() == "true"
+SCRIPT_LANGS = {
+    "Latin": ("eng",),
+    "Devanagari": ("hin", "eng"),
+    "Kannada": ("kan", "eng"),
+}
+# Binarise (Otsu) and deskew images with OpenCV before OCR; needs the
+# optional opencv-python-headless package. Skew beyond the limit is left
+# alone since it is more likely a misdetection than a tilted scan.
+OCR_PREPROCESS = os.getenv("OCR_PREPROCESS", "false").lower() == "true"
+OCR_MIN_DESKEW_DEGREES = 0.5
+OCR_MAX_DESKEW_DEGREES = 10
+# Skip tesseract for rendered PDF pages that are blank (separator sheets,
+# empty backs) or solid black, judged by the share of dark pixels. Off by
+# default: a page holding only a stamp or signature can fall under the
+# minimum.
+OCR_SKIP_BLANK = os.getenv("OCR_SKIP_BLANK", "false").lower() == "true"
+OCR_BLANK_MIN_INK = 0.005
+OCR_BLANK_MAX_INK = 0.95
+
+# Successful structured extractions are cached on disk by model, prompt
+# version, document type and OCR text, so re-processing the same text
+# (retries, re-uploads) skips the LLM call
+EXTRACTION_CACHE_DIR = Path(os.getenv("LLM_CACHE_DIR", os.path.join(tempfile.gettempdir(), "ocr_cache")))
+# Raw OCR text is cached in the same directory by file contents, so a file
+# re-processed as another document type or after a prompt change skips
+# OCR. Settings that change the OCR output are part of the key.
+OCR_TEXT_CACHE_SETTINGS = (
+    f"{OCR_DPI}|{OCR_RETRY_DPI}|{OCR_MIN_CONFIDENCE}|{OCR_MIN_PAGE_CHARS}|{PDF_MAX_PAGES}|{OCR_PREPROCESS}|{OCR_DETECT_SCRIPT}|{OCR_SKIP_BLANK}"
+)
+
+FILE_HASH_CHUNK_BYTES = 1 << 20
+
+# Extraction prompts: per-type instructions, then the OCR text, then a
+# shared suffix. Stored as plain prefixes so a prompt is a single concat.
+# Verified identifiers, if any, go between the end of the text and "JSON:".
+EXTRACTION_PROMPT_TEXT_END = "\n---"
+EXTRACTION_PROMPT_SUFFIX = "\n\nJSON:"
+
+EXTRACTION_PROMPT_PREFIXES = {
+    "invoice": """Extract the following information from this invoice text and return as JSON:
+
+Required fields:
+- invoice_number: The invoice/bill number
+- invoice_date: Date of invoice (format: YYYY-MM-DD)
+- due_date: Payment due date if mentioned (format: YYYY-MM-DD)
+- seller_name: Name of the seller/vendor company
+- seller_gstin: Seller's GST number (15 characters)
+- buyer_name: Name of the buyer company
+- buyer_gstin: Buyer's GST number if present
+- total_amount: Total invoice amount (number only, in INR)
+- tax_amount: Tax/GST amount if shown separately
+- items: List of items with description, quantity, rate, amount
+- payment_terms: Payment terms if mentioned
+
+Return ONLY valid JSON, no explanations.
+
+Invoice Text:
+---
+""",
+    "purchase_order": """Extract the following information from this purchase order and return as JSON:
+
+Required fields:
+- po_number: Purchase order number
+- po_date: Date of PO (format: YYYY-MM-DD)
+- buyer_name: Name of the buyer company
+- buyer_address: Buyer's address
+- seller_name: Name of the vendor/supplier
+- items: List of ordered items with description, quantity, rate
+- total_amount: Total PO value
+- delivery_date: Expected delivery date if mentioned
+- payment_terms: Payment terms
+
+Return ONLY valid JSON, no explanations.
+
+Purchase Order Text:
+---
+""",
+    "msme_certificate": """Extract the following information from this MSME/Udyam Registration Certificate and return as JSON:
+
+Required fields:
+- udyam_registration_number: The Udyam Registration Number (format: UDYAM-XX-00-0000000)
+- enterprise_name: Name of the enterprise/business
+- enterprise_type: Type (Micro/Small/Medium)
+- owner_name: Name of the owner/proprietor
+- date_of_registration: Registration date (format: YYYY-MM-DD)
+- date_of_incorporation: Incorporation date if mentioned
+- major_activity: NIC code or activity description
+- address: Registered address
+- district: District name
+- state: State name
+- mobile: Mobile number if present
+- email: Email if present
+
+CRITICAL: If a field is not clearly visible in the text, set it to null. DO NOT guess or make up values.
+If the text appears to be garbage/unreadable, set all fields to null and add "extraction_quality": "poor".
+
+Return ONLY valid JSON, no explanations.
+
+Certificate Text:
+---
+""",
+    "delivery_proof": """Extract the following information from this delivery receipt/proof and return as JSON:
+
+Required fields:
+- delivery_date: Date of delivery (format: YYYY-MM-DD)
+- delivery_challan_number: Challan/receipt number
+- receiver_name: Name of person who received
+- receiver_signature: Whether signature is present (true/false)
+- sender_name: Sender/supplier company name
+- recipient_company: Receiving company name
+- items_delivered: List of items with quantities
+- vehicle_number: Vehicle/transport details if present
+- remarks: Any remarks or notes
+
+CRITICAL: If a field is not clearly visible in the text, set it to null. DO NOT guess or make up values.
+
+Return ONLY valid JSON, no explanations.
+
+Delivery Proof Text:
+---
+""",
+    "communication": """Extract the following information from this email/communication and return as JSON:
+
+Required fields:
+- date: Date of communication (format: YYYY-MM-DD)
+- from: Sender name/email
+- to: Recipient name/email
+- subject: Subject line
+- key_points: List of main points discussed
+- payment_mentioned: Whether payment/amount is discussed (true/false)
+- amount_mentioned: Any specific amount mentioned
+- deadline_mentioned: Any deadline or due date mentioned
+- tone: Overall tone (formal/informal/threatening/reminder)
+
+CRITICAL: If a field is not clearly visible in the text, set it to null. DO NOT guess or make up values.
+
+Return ONLY valid JSON, no explanations.
+
+Communication Text:
+---
+""",
+    "bank_statement": """Extract the following information from this bank statement and return as JSON:
+
+Required fields:
+- account_holder_name: Name on the account
+- account_number: Bank account number (may be partially masked)
+- bank_name: Name of the bank
+- statement_period: Start and end date of statement
+- transactions: List of transactions with date, description, amount, type (credit/debit)
+- opening_balance: Opening balance
+- closing_balance: Closing balance
+- payment_received_from: Any payments received from the buyer in dispute
+
+CRITICAL: If a field is not clearly visible in the text, set it to null. DO NOT guess or make up values.
+
+Return ONLY valid JSON, no explanations.
+
+Bank Statement Text:
+---
+""",
+    "legal_notice": """Extract the following information from this legal notice and return as JSON:
+
+Required fields:
+- notice_date: Date of notice (format: YYYY-MM-DD)
+- from_party: Who is sending the notice
+- to_party: Who is receiving the notice
+- lawyer_name: Lawyer/advocate name if mentioned
+- subject_matter: What the notice is about
+- amount_claimed: Amount being claimed
+- deadline_given: Response deadline
+- legal_sections_cited: Any laws/sections mentioned
+- relief_sought: What action is demanded
+
+CRITICAL: If a field is not clearly visible in the text, set it to null. DO NOT guess or make up values.
+
+Return ONLY valid JSON, no explanations.
+
+Legal Notice Text:
+---
+""",
+    "generic": """Extract key information from this document and return as JSON:
+
+Try to identify:
+- document_type: What type of document is this?
+- date: Any dates mentioned
+- parties: Names of companies/people involved
+- amounts: Any monetary amounts
+- reference_numbers: Any reference/ID numbers
+- key_details: Other important information
+
+IMPORTANT: If a field is not clearly visible in the text, set it to null. DO NOT make up or guess values.
+
+Return ONLY valid JSON, no explanations.
+
+Document Text:
+---
+""",
+}
+
+# Re-scans of an already extracted document produce slightly different OCR
+# text. A semantically near-identical earlier extraction is reused only if
+# every key value it found also appears verbatim in the new text, so a
+# different invoice from the same vendor never inherits another's data.
+EXTRACTION_SEMANTIC_CACHE_ENABLED = os.getenv("EXTRACTION_SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+EXTRACTION_SEMANTIC_SIMILARITY = 0.95
+# Values the LLM reformats (dates, free text) can't be matched against the
+# OCR text and are not used as evidence
+_ISO_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+_EXTRACTION_META_KEYS = frozenset({"raw_text", "extraction_status", "cache_hit"})
+
+# Identifiers with a fixed format are found by pattern and handed to the LLM
+# as verified values, so it copies rather than re-reads them. GSTINs must
+# also pass their check digit, which filters out OCR misreads.
+_GSTIN_RE = re.compile(r"\b\d{2}[A-Z]{5}\d{4}[A-Z][1-9A-Z]Z[0-9A-Z]\b")
+_UDYAM_RE = re.compile(r"\bUDYAM-[A-Z]{2}-\d{2}-\d{7}\b", re.IGNORECASE)
+_GSTIN_ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+# Groq calls fail fast: one SDK retry and a short timeout. After
+# GROQ_BREAKER_THRESHOLD consecutive connection, rate-limit or server errors
+# extraction is skipped for GROQ_BREAKER_COOLDOWN_SECONDS instead of every
+# upload waiting out its own timeouts.
+GROQ_TIMEOUT = httpx.Timeout(10.0, connect=3.0)
+GROQ_MAX_RETRIES = 1
+GROQ_BREAKER_THRESHOLD = 3
+GROQ_BREAKER_COOLDOWN_SECONDS = 30
+_GROQ_OUTAGE_ERRORS = (APIConnectionError, RateLimitError, InternalServerError)
+
+# OCR text sent to the LLM has blank-line runs and trailing spaces removed
+# and is clipped per document; the cached result keeps the full text
+EXTRACTION_MAX_INPUT_CHARS = 15000
+_TRAILING_SPACE_RE = re.compile(r"[ \t]+\n")
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+# OCR text is only sent to the LLM if, without page labels, no-text
+# placeholders and per-page OCR errors, it has at least this many letters or
+# digits; a scan of blank or unreadable pages otherwise costs a Groq call for
+# nothing
+EXTRACTION_MIN_TEXT_CHARS = 10
+_OCR_FILLER_RE = re.compile(
+    r"^--- Page \d+ ---$|^\[OCR (?:Error|not available)[^\n]*$|" + re.escape(NO_TEXT_DETECTED),
+    re.MULTILINE,
+)
+_NON_WORD_RE = re.compile(r"[\W_]+")
+
+# Extraction requests use JSON mode; a response that still fails validation
+# is sent back to the model with the error, up to this many attempts in total
+EXTRACTION_MAX_ATTEMPTS = 3
+# Completion budget per document. Types with a fixed, short schema get a
+# tight one; a response cut off by it is retried with the default.
+EXTRACTION_DEFAULT_MAX_TOKENS = 1024
+EXTRACTION_MAX_TOKENS = {
+    "invoice": 512,
+    "purchase_order": 512,
+}
+
+EXTRACTION_SYSTEM_PROMPT = "You are a document extraction AI. Extract structured data from documents and return valid JSON only. Be precise with numbers and dates."
+
+# Documents of one type packed into a single extraction request by
+# process_documents_batch
+EXTRACTION_BATCH_SIZE = 4
+BATCH_EXTRACTION_PREAMBLE = """The text below contains {count} separate documents, each starting with a line "=== DOC <n> ===". Extract the fields listed below for each document independently. Return a JSON object of the form {{"documents": [...]}} with exactly one object per document, in the same order.
+
+"""
+# Groups mixing document types give each document its own instructions
+MIXED_BATCH_EXTRACTION_PREAMBLE = """The text below contains {count} separate documents of different types. Each starts with a line "=== DOC <n> ===", followed by the fields to extract for that document and then its text. Extract each document independently, using only its own field list. Return a JSON object of the form {{"documents": [...]}} with exactly one object per document, in the same order.
+
+"""
+
+
+def _file_digest(path: str) -> str:
+    """SHA-256 of a file, streamed in chunks rather than read into memory."""
+    with open(path, "rb") as f:
+        if hasattr(hashlib, "file_digest"):  # Python 3.11+
+            return hashlib.file_digest(f, "sha256").hexdigest()
+        digest = hashlib.sha256()
+        for chunk in iter(lambda: f.read(FILE_HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+        return digest.hexdigest()
+
+
+def _mean_word_confidence(tsv: str) -> Optional[float]:
+    """Mean confidence of the recognised words in tesseract TSV output."""
+    confidences = []
+    for row in tsv.splitlines()[1:]:
+        columns = row.split("\t")
+        # Non-word rows (blocks, lines) carry a confidence of -1
+        if len(columns) == 12 and columns[11].strip() and float(columns[10]) >= 0:
+            confidences.append(float(columns[10]))
+    return sum(confidences) / len(confidences) if confidences else None
+
+
+# Language code mapping for Tesseract
+LANG_MAP = {
+    "en": "eng",
+    "hi": "hin",
+    "kn": "kan",
+    "kan": "kan",
+    "hin": "hin",
+    "eng": "eng",
+    "english": "eng",
+    "hindi": "hin",
+    "kannada": "kan",
+}
+
+
+# tesserocr engines per language string: at most OCR_CONCURRENCY exist,
+# each holding its language models. Pages come from several thread pools,
+# so a caller beyond that waits for an engine instead of loading another.
+# An engine is created only when every existing one is busy.
+_tesserocr_pools: Dict[str, Tuple[threading.BoundedSemaphore, "queue.Queue[Any]"]] = {}
+_tesserocr_pools_lock = threading.Lock()
+
+
+@contextmanager
+def _tesserocr_api(lang: str):
+    """Borrow an initialised tesserocr engine for lang, returned on exit."""
+    with _tesserocr_pools_lock:
+        pool = _tesserocr_pools.get(lang)
+        if pool is None:
+            pool = _tesserocr_pools[lang] = (
+                threading.BoundedSemaphore(OCR_CONCURRENCY), queue.Queue(maxsize=OCR_CONCURRENCY)
+            )
+    slots, idle = pool
+
+    with slots:
+        try:
+            api = idle.get_nowait()
+        except queue.Empty:
+            api = tesserocr.PyTessBaseAPI(lang=lang)
+        try:
+            yield api
+        finally:
+            api.Clear()
+            idle.put_nowait(api)
+
+
+def _tesserocr_text_with_confidence(image: Any, lang: str) -> Tuple[str, Optional[float]]:
+    """OCR a PIL image or image path in-process with tesserocr."""
+    with _tesserocr_api(lang) as api:
+        if isinstance(image, str):
+            api.SetImageFile(image)
+        else:
+            api.SetImage(image)
+        text = api.GetUTF8Text()
+        confidences = [c for c in api.AllWordConfidences() if c >= 0]
+    return text, (sum(confidences) / len(confidences) if confidences else None)
+
+
+@lru_cache(maxsize=32)
+def _resolve_tesseract_lang(language: str) -> str:
+    """Map a "+"-joined language argument to Tesseract codes, deduplicated."""
+    lang_codes = []
+    for lang in language.split('+'):
+        mapped = LANG_MAP.get(lang.lower(), lang)
+        if mapped not in lang_codes:
+            lang_codes.append(mapped)
+    return '+'.join(lang_codes)
+
+
+def _is_extractable(raw_text: str) -> bool:
+    """Whether OCR text is worth an extraction call (not an error or empty scan)."""
+    if not raw_text or raw_text.startswith("["):
+        return False
+    content = _NON_WORD_RE.sub("", _OCR_FILLER_RE.sub("", raw_text))
+    return len(content) >= EXTRACTION_MIN_TEXT_CHARS
+
+
+def _prompt_text(raw_text: str) -> str:
+    """Compact OCR text for an extraction prompt and clip it to the input cap."""
+    text = _BLANK_LINES_RE.sub("\n\n", _TRAILING_SPACE_RE.sub("\n", raw_text))
+    if len(text) > EXTRACTION_MAX_INPUT_CHARS:
+        text = text[:EXTRACTION_MAX_INPUT_CHARS] + "\n[... text truncated]"
+    return text
+
+
+@lru_cache(maxsize=1)
+def _opencv() -> Any:
+    """Import OpenCV once; None (with a warning) if it isn't installed."""
+    try:
+        import cv2
+    except ImportError:
+        logger.warning("[OCR] OCR_PREPROCESS is set but OpenCV is not installed, skipping preprocessing")
+        return None
+    return cv2
+
+
+def _preprocess_for_ocr(image_path: str) -> Any:
+    """
+    Binarise an image with Otsu's threshold and correct small skew.
+
+    Returns:
+        The cleaned page as a PIL image, or None if OpenCV is unavailable
+        or can't read the file
+    """
+    cv2 = _opencv()
+    if cv2 is None:
+        return None
+
+    gray = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+    if gray is None:
+        return None
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+
+    ink = cv2.findNonZero(255 - binary)
+    if ink is not None:
+        angle = cv2.minAreaRect(ink)[-1]
+        # Reported in (0, 90] by OpenCV >= 4.5 and [-90, 0) before that
+        if angle > 45:
+            angle -= 90
+        elif angle < -45:
+            angle += 90
+        if OCR_MIN_DESKEW_DEGREES <= abs(angle) <= OCR_MAX_DESKEW_DEGREES:
+            height, width = binary.shape
+            rotation = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+            binary = cv2.warpAffine(
+                binary, rotation, (width, height), flags=cv2.INTER_NEAREST, borderValue=255
+            )
+    return Image.fromarray(binary)
+
+
+def _is_blank_page(image_path: str) -> bool:
+    """Whether a page's share of dark pixels is outside the OCR_BLANK_*_INK range."""
+    try:
+        with Image.open(image_path) as img:
+            histogram = img.convert("L").histogram()
+    except Exception as e:
+        logger.debug(f"[OCR] Could not check {image_path} for a blank page: {e}")
+        return False
+    ink = sum(histogram[:128]) / sum(histogram)
+    return ink < OCR_BLANK_MIN_INK or ink > OCR_BLANK_MAX_INK
+
+
+def _gstin_check_digit_ok(gstin: str) -> bool:
+    """Verify the mod-36 check digit in the last position of a GSTIN."""
+    total = 0
+    for i, char in enumerate(gstin[:14]):
+        value = _GSTIN_ALPHABET.index(char) * (2 if i % 2 else 1)
+        total += value // 36 + value % 36
+    return _GSTIN_ALPHABET[-total % 36] == gstin[14]
+
+
+def _find_identifiers(raw_text: str) -> Dict[str, List[str]]:
+    """Find GSTINs and Udyam numbers in OCR text, unique and in order."""
+    gstins = [g for g in dict.fromkeys(_GSTIN_RE.findall(raw_text)) if _gstin_check_digit_ok(g)]
+    udyam_numbers = list(dict.fromkeys(u.upper() for u in _UDYAM_RE.findall(raw_text)))
+    return {"GSTIN": gstins, "Udyam Registration Number": udyam_numbers}
+
+
+def _amount_text(value: Any) -> str:
+    """Show whole amounts parsed as floats without a trailing ".0"."""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _rupees(value: Any) -> str:
+    return f"₹{_amount_text(value)}"
+
+
+def _joined(value: Any) -> str:
+    return ", ".join(value) if isinstance(value, list) else str(value)
+
+
+def _yes_no(value: Any) -> str:
+    return "Yes" if value else "No"
+
+
+def _line_item(item: Any) -> str:
+    """Render an invoice line item as "description (Qty) - ₹amount"."""
+    if not isinstance(item, dict):
+        return str(item)
+    desc = item.get("description", item.get("name", "Item"))
+    qty = item.get("quantity", "")
+    amt = item.get("amount", item.get("rate", ""))
+    return f"{desc} {f'(Qty: {qty})' if qty else ''} {f'- {_rupees(amt)}' if amt else ''}"
+
+
 # Lazy load Tesseract to verify availability
 _ocr_available = None
+# Pages are OCR'd from several threads; only one of them runs the check
+_ocr_lock = threading.Lock()
 
 
 def get_ocr_system():
     """Check if Tesseract OCR is available."""
     global _ocr_available
-    if _ocr_available is None:
+    if _ocr_available is not None:
+        return _ocr_available
+    if not _HAS_OCR:
+        logger.warning("[OCR] pytesseract/Pillow not installed")
+        _ocr_available = False
+        return _ocr_available
+    with _ocr_lock:
+        if _ocr_available is not None:
+            return _ocr_available
         try:
-            import pytesseract
             # Verify tesseract is installed
             version = pytesseract.get_tesseract_version()
             logger.info(f"[OCR] Tesseract v{version} initialized successfully")
@@ -61,6 +623,97 @@ class OCRService:
         "bank_details",
     ]
 
+    # Result keys that describe the extraction rather than hold a field
+    NON_FIELD_KEYS = frozenset({
+        'raw_text', 'extraction_status', 'file_path', 'file_type', 'document_type',
+        'error', 'llm_response', 'extraction_quality', 'cache_hit',
+    })
+    EMPTY_VALUES = (None, "", [])
+
+    # Bump whenever an extraction prompt changes to invalidate cached results
+    PROMPT_VERSION = "v4"
+
+    # Chat layout per document type: (title, [(key, label, formatter)], bullets).
+    # Fields render as "**label:** value" when present; bullets is an optional
+    # (key, heading, formatter) list shown as up to 5 "•" lines.
+    _FORMAT_SCHEMA = {
+        "invoice": ("Invoice", [
+            ("invoice_number", "Invoice Number", str),
+            ("invoice_date", "Invoice Date", str),
+            ("seller_name", "Seller", str),
+            ("seller_gstin", "Seller GSTIN", str),
+            ("buyer_name", "Buyer", str),
+            ("buyer_gstin", "Buyer GSTIN", str),
+            ("total_amount", "Total Amount", _rupees),
+            ("tax_amount", "Tax/GST", _rupees),
+            ("due_date", "Due Date", str),
+            ("payment_terms", "Payment Terms", str),
+        ], ("items", "Items", _line_item)),
+        "purchase_order": ("Purchase Order", [
+            ("po_number", "PO Number", str),
+            ("po_date", "PO Date", str),
+            ("buyer_name", "Buyer", str),
+            ("seller_name", "Supplier", str),
+            ("total_amount", "Total Value", _rupees),
+            ("delivery_date", "Delivery Date", str),
+            ("payment_terms", "Payment Terms", str),
+        ], None),
+        "msme_certificate": ("MSME/Udyam Certificate", [
+            ("udyam_registration_number", "Udyam Number", str),
+            ("enterprise_name", "Enterprise Name", str),
+            ("enterprise_type", "Category", str),
+            ("owner_name", "Owner", str),
+            ("date_of_registration", "Registration Date", str),
+            ("major_activity", "Activity", str),
+            ("state", "State", str),
+            ("district", "District", str),
+        ], None),
+        "delivery_proof": ("Delivery Proof", [
+            ("delivery_date", "Delivery Date", str),
+            ("delivery_challan_number", "Challan Number", str),
+            ("sender_name", "Sender", str),
+            ("recipient_company", "Recipient", str),
+            ("receiver_name", "Received By", str),
+            ("receiver_signature", "Signature Present", _yes_no),
+            ("vehicle_number", "Vehicle", str),
+        ], ("items_delivered", "Items Delivered", str)),
+        "communication": ("Communication Record", [
+            ("date", "Date", str),
+            ("from", "From", str),
+            ("to", "To", str),
+            ("subject", "Subject", str),
+            ("amount_mentioned", "Amount Mentioned", _rupees),
+            ("deadline_mentioned", "Deadline", str),
+            ("tone", "Tone", str),
+        ], ("key_points", "Key Points", str)),
+        "bank_statement": ("Bank Statement", [
+            ("bank_name", "Bank", str),
+            ("account_holder_name", "Account Holder", str),
+            ("account_number", "Account Number", str),
+            ("statement_period", "Period", str),
+            ("opening_balance", "Opening Balance", _rupees),
+            ("closing_balance", "Closing Balance", _rupees),
+        ], None),
+        "legal_notice": ("Legal Notice", [
+            ("notice_date", "Notice Date", str),
+            ("from_party", "From", str),
+            ("to_party", "To", str),
+            ("lawyer_name", "Advocate", str),
+            ("amount_claimed", "Amount Claimed", _rupees),
+            ("deadline_given", "Response Deadline", str),
+            ("subject_matter", "Subject", str),
+            ("legal_sections_cited", "Sections Cited", _joined),
+        ], None),
+        "generic": ("Document", [
+            ("document_type", "Type", str),
+            ("date", "Date", str),
+            ("parties", "Parties", _joined),
+            ("amounts", "Amounts", str),
+            ("reference_numbers", "References", str),
+            ("key_details", "Details", str),
+        ], None),
+    }
+
     def __init__(self):
         """Initialize OCR service with Groq client for structured extraction."""
         self.groq_api_key = os.getenv("GROQ_API_KEY")
@@ -68,22 +721,35 @@ class OCRService:
             logger.warning("GROQ_API_KEY not found - structured extraction will be limited")
             self.groq_client = None
         else:
-            self.groq_client = Groq(api_key=self.groq_api_key)
+            self.groq_client = Groq(
+                api_key=self.groq_api_key,
+                max_retries=GROQ_MAX_RETRIES,
+                timeout=GROQ_TIMEOUT,
+            )
 
         self.model = "llama-3.1-8b-instant"
+        # Circuit breaker state, updated from OCR worker threads
+        self._groq_failures = 0
+        self._groq_open_until = 0.0
+        self._groq_breaker_lock = threading.Lock()
+        # document_type -> SemanticCache of extractions keyed by OCR text embedding
+        self._semantic_caches: Dict[str, Any] = {}
+
+    def warm_up(self, language: str = "eng+hin+kan") -> None:
+        """
+        Check Tesseract and OCR a blank image once, so the language data is
+        read from disk at startup rather than by the first upload.
+        """
+        if not get_ocr_system():
+            return
 
-    # Language code mapping for Tesseract
-    LANG_MAP = {
-        "en": "eng",
-        "hi": "hin",
-        "kn": "kan",
-        "kan": "kan",
-        "hin": "hin",
-        "eng": "eng",
-        "english": "eng",
-        "hindi": "hin",
-        "kannada": "kan",
-    }
+        try:
+            with tempfile.TemporaryDirectory(dir=OCR_TEMP_DIR) as folder:
+                image_path = os.path.join(folder, "warm-up.png")
+                Image.new("L", (200, 50), color=255).save(image_path)
+                self._extract_text_with_confidence(image_path, language)
+        except Exception as e:
+            logger.warning(f"[OCR] Warm-up failed: {e}")
 
     def extract_text_from_image(self, image_path: str, language: str = "eng+hin+kan") -> str:
         """
@@ -96,116 +762,333 @@ class OCRService:
         Returns:
             Extracted text string
         """
+        text, _ = self._extract_text_with_confidence(image_path, language)
+        return text
+
+    def _extract_text_with_confidence(self, image_path: str, language: str) -> Tuple[str, Optional[float]]:
+        """
+        Run Tesseract once for both the text and its word confidences.
+
+        Returns:
+            Tuple of (extracted text, mean word confidence or None if no
+            words were recognised or OCR failed)
+        """
         if not get_ocr_system():
             logger.warning("[OCR] Tesseract not available")
-            return "[OCR not available - please install tesseract-ocr]"
+            return "[OCR not available - please install tesseract-ocr]", None
 
         try:
-            import pytesseract
-            from PIL import Image
-
             logger.info(f"[OCR] Extracting text from: {image_path}")
 
-            # Open and preprocess image
-            img = Image.open(image_path)
+            img = _preprocess_for_ocr(image_path) if OCR_PREPROCESS else None
 
-            # Convert to RGB if necessary (handles RGBA, grayscale, etc.)
-            if img.mode not in ('RGB', 'L'):
-                img = img.convert('RGB')
+            if img is None:
+                # Open and preprocess image (only the header is read here)
+                img = Image.open(image_path)
 
-            # Map language codes to Tesseract format
-            lang_codes = []
-            for lang in language.split('+'):
-                mapped = self.LANG_MAP.get(lang.lower(), lang)
-                if mapped not in lang_codes:
-                    lang_codes.append(mapped)
-            tesseract_lang = '+'.join(lang_codes)
+                # Convert to RGB if necessary (handles RGBA, grayscale, etc.)
+                if img.mode not in ('RGB', 'L'):
+                    img = img.convert('RGB')
+                elif img.format in TESSERACT_NATIVE_FORMATS:
+                    img.close()
+                    img = image_path
+
+            tesseract_lang = _resolve_tesseract_lang(language)
+            if OCR_DETECT_SCRIPT and "+" in tesseract_lang:
+                tesseract_lang = self._detect_script_lang(img, tesseract_lang)
 
             logger.info(f"[OCR] Using languages: {tesseract_lang}")
 
             # Run Tesseract OCR
-            text = pytesseract.image_to_string(img, lang=tesseract_lang)
+            if tesserocr is not None:
+                text, confidence = _tesserocr_text_with_confidence(img, tesseract_lang)
+            else:
+                text, tsv = pytesseract.run_and_get_multiple_output(img, ["txt", "tsv"], lang=tesseract_lang)
+                confidence = _mean_word_confidence(tsv)
 
             # Clean up text
             full_text = text.strip()
             logger.info(f"[OCR] Extracted {len(full_text)} characters")
 
-            return full_text if full_text else "[No text detected in image]"
+            return (full_text if full_text else NO_TEXT_DETECTED), confidence
 
         except Exception as e:
             logger.error(f"[OCR] Error extracting text: {e}")
-            return f"[OCR Error: {str(e)}]"
+            return f"[OCR Error: {str(e)}]", None
+
+    @staticmethod
+    def _detect_script_lang(image: Any, tesseract_lang: str) -> str:
+        """
+        Narrow a multi-language Tesseract string to the page's script.
+
+        Returns the requested languages unchanged if OSD fails (too little
+        text, no osd.traineddata) or finds a script that wasn't requested.
+        """
+        try:
+            script = pytesseract.image_to_osd(image, output_type=pytesseract.Output.DICT)["script"]
+        except Exception as e:
+            logger.debug(f"[OCR] Script detection failed, using {tesseract_lang}: {e}")
+            return tesseract_lang
 
-    def extract_text_from_pdf(self, pdf_path: str) -> str:
+        requested = tesseract_lang.split('+')
+        narrowed = [lang for lang in SCRIPT_LANGS.get(script, ()) if lang in requested]
+        if not narrowed:
+            return tesseract_lang
+        logger.info(f"[OCR] Detected {script} script")
+        return '+'.join(narrowed)
+
+    def extract_text_from_pdf(self, pdf_path: str, max_pages: Optional[int] = PDF_MAX_PAGES) -> str:
         """
         Extract text from PDF file.
-        Uses pypdf for digital PDFs, converts to image for scanned PDFs.
+        Uses PyMuPDF when installed (text layer and page rendering in one
+        native library), otherwise pypdf for digital PDFs and pdf2image for
+        scanned ones.
 
         Args:
             pdf_path: Path to PDF file
+            max_pages: Read at most this many leading pages (None for all)
 
         Returns:
             Extracted text string
         """
+        return self._read_pdf(pdf_path, max_pages)[0]
+
+    def _read_pdf(self, pdf_path: str, max_pages: Optional[int] = PDF_MAX_PAGES) -> Tuple[str, bool]:
+        """
+        Extract text from a PDF file as extract_text_from_pdf does.
+
+        Returns:
+            Tuple of (extracted text, whether every page was read without
+            an OCR error)
+        """
+        try:
+            import fitz  # PyMuPDF (optional)
+        except ImportError:
+            fitz = None
+
         try:
-            from pypdf import PdfReader
+            if fitz is not None:
+                return self._extract_pdf_with_pymupdf(fitz, pdf_path, max_pages=max_pages)
+
+            if PdfReader is None:
+                logger.error("[OCR] pypdf not available for PDF text extraction")
+                return "[PDF Error: pypdf required]", False
 
             reader = PdfReader(pdf_path)
             text_parts = []
 
-            for page in reader.pages:
+            # Pages are parsed lazily, so the rest of a long PDF is never read
+            for page in islice(reader.pages, max_pages):
                 text = page.extract_text()
-                if text:
+                # isspace() checks in place instead of copying via strip()
+                if text and not text.isspace():
                     text_parts.append(text)
 
-            full_text = "\n\n".join(text_parts)
-
             # If no text extracted (scanned PDF), try OCR
-            if not full_text.strip():
+            if not text_parts:
                 logger.info("[OCR] PDF appears to be scanned, attempting image conversion")
-                return self._ocr_scanned_pdf(pdf_path)
+                return self._ocr_scanned_pdf(pdf_path, max_pages=max_pages)
 
+            full_text = "\n\n".join(text_parts)
             logger.info(f"[OCR] Extracted {len(full_text)} characters from PDF")
-            return full_text
+            return full_text, True
 
         except Exception as e:
             logger.error(f"[OCR] Error reading PDF: {e}")
-            return f"[PDF Error: {str(e)}]"
+            return f"[PDF Error: {str(e)}]", False
 
-    def _ocr_scanned_pdf(self, pdf_path: str, language: str = "eng+hin+kan") -> str:
+    def _extract_pdf_with_pymupdf(
+        self,
+        fitz: Any,
+        pdf_path: str,
+        language: str = "eng+hin+kan",
+        max_pages: Optional[int] = PDF_MAX_PAGES,
+    ) -> Tuple[str, bool]:
         """
-        Convert scanned PDF to images and OCR each page.
+        Read each page's text layer with PyMuPDF and OCR only the pages that
+        have none, rendering them with the same library.
 
         Args:
+            fitz: The imported PyMuPDF module
             pdf_path: Path to PDF file
             language: Language code(s) for OCR
+            max_pages: Read at most this many leading pages (None for all)
 
         Returns:
-            Extracted text string
+            Tuple of (extracted text, whether every scanned page was OCR'd
+            without an error)
         """
-        try:
-            from pdf2image import convert_from_path
+        complete = True
+        with fitz.open(pdf_path) as doc:
+            page_texts = [page.get_text("text") for page in islice(doc, max_pages)]
+            scanned_pages = [i + 1 for i, text in enumerate(page_texts) if not text or text.isspace()]
+
+            if scanned_pages:
+                logger.info(f"[OCR] {len(scanned_pages)} of {len(page_texts)} PDF pages have no text layer, running OCR")
+
+                # PyMuPDF documents aren't thread-safe; low-confidence pages
+                # are re-rendered from the OCR pool, so rendering is serialised
+                render_lock = threading.Lock()
+
+                def render_page(page_number: int, output_folder: str, dpi: int) -> str:
+                    image_path = os.path.join(output_folder, f"page-{page_number}-{dpi}.jpg")
+                    with render_lock:
+                        # Grayscale: tesseract only uses luminance
+                        pixmap = doc[page_number - 1].get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+                        pixmap.save(image_path, jpg_quality=OCR_JPEG_QUALITY)
+                    return image_path
+
+                ocr_texts, complete = self._ocr_pages(scanned_pages, render_page, language)
+                for page_number, text in zip(scanned_pages, ocr_texts):
+                    page_texts[page_number - 1] = text
+
+        full_text = "\n\n".join(text for text in page_texts if text and not text.isspace())
+        logger.info(f"[OCR] Extracted {len(full_text)} characters from PDF")
+        return full_text, complete
+
+    def _ocr_scanned_pdf(
+        self,
+        pdf_path: str,
+        language: str = "eng+hin+kan",
+        max_pages: Optional[int] = PDF_MAX_PAGES,
+    ) -> Tuple[str, bool]:
+        """
+        Convert scanned PDF to images and OCR each page.
 
-            # Convert PDF pages to images
-            images = convert_from_path(pdf_path, dpi=200)
+        Args:
+            pdf_path: Path to PDF file
+            language: Language code(s) for OCR
+            max_pages: OCR at most this many leading pages (None for all)
 
-            all_text = []
-            for i, image in enumerate(images):
-                # Save temp image
-                with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as tmp:
-                    image.save(tmp.name, 'PNG')
-                    page_text = self.extract_text_from_image(tmp.name, language=language)
-                    all_text.append(f"--- Page {i+1} ---\n{page_text}")
-                    os.unlink(tmp.name)  # Clean up temp file
+        Returns:
+            Tuple of (extracted text, whether every page was OCR'd without
+            an error)
+        """
+        if convert_from_path is None:
+            logger.warning("[OCR] pdf2image not available for scanned PDF OCR")
+            return "[Scanned PDF - pdf2image required for OCR]", False
 
-            return "\n\n".join(all_text)
+        try:
+            page_count = pdfinfo_from_path(pdf_path)["Pages"]
+            if max_pages and page_count > max_pages:
+                logger.info(f"[OCR] OCRing the first {max_pages} of {page_count} scanned pages")
+                page_count = max_pages
+
+            def render_page(page_number: int, output_folder: str, dpi: int) -> str:
+                image_paths = convert_from_path(
+                    pdf_path,
+                    dpi=dpi,
+                    grayscale=True,  # Tesseract only uses luminance
+                    first_page=page_number,
+                    last_page=page_number,
+                    output_folder=output_folder,
+                    fmt="jpeg",
+                    jpegopt={"quality": OCR_JPEG_QUALITY},
+                    paths_only=True,
+                )
+                return image_paths[0]
+
+            all_text, complete = self._ocr_pages(range(1, page_count + 1), render_page, language)
+            return "\n\n".join(all_text), complete
 
-        except ImportError:
-            logger.warning("[OCR] pdf2image not available for scanned PDF OCR")
-            return "[Scanned PDF - pdf2image required for OCR]"
         except Exception as e:
             logger.error(f"[OCR] Error OCRing scanned PDF: {e}")
-            return f"[Scanned PDF OCR Error: {str(e)}]"
+            return f"[Scanned PDF OCR Error: {str(e)}]", False
+
+    def _ocr_pages(
+        self,
+        page_numbers: Iterable[int],
+        render_page: Callable[[int, str, int], str],
+        language: str,
+    ) -> Tuple[List[str], bool]:
+        """
+        Render pages one at a time to JPEG files and OCR them on the pool.
+
+        OCR of earlier pages overlaps rendering of later ones, no page is held
+        in memory as an image, and rendering pauses once OCR_PAGES_AHEAD pages
+        are waiting.
+
+        Args:
+            page_numbers: 1-based page numbers to OCR
+            render_page: Renders a page into the given folder at the given
+                dpi, returns its path
+            language: Language code(s) for OCR
+
+        Returns:
+            Tuple of (page-labelled OCR text in the order of page_numbers,
+            whether every page was OCR'd without an error)
+        """
+        with tempfile.TemporaryDirectory(dir=OCR_TEMP_DIR) as output_folder:
+            futures = []
+            try:
+                for page_number in page_numbers:
+                    in_flight = [f for f in futures if not f.done()]
+                    if len(in_flight) >= OCR_PAGES_AHEAD:
+                        wait(in_flight, return_when=FIRST_COMPLETED)
+
+                    image_path = render_page(page_number, output_folder, OCR_DPI)
+                    futures.append(_OCR_POOL.submit(
+                        self._ocr_page, page_number, image_path, language, render_page, output_folder,
+                    ))
+            finally:
+                # Pages already submitted read from (and may re-render into)
+                # output_folder, so it must outlive them even if rendering fails
+                wait(futures)
+
+            pages = [future.result() for future in futures]
+            return [text for text, _ in pages], all(ok for _, ok in pages)
+
+    def _ocr_page(
+        self,
+        page_number: int,
+        image_path: str,
+        language: str,
+        render_page: Callable[[int, str, int], str],
+        output_folder: str,
+    ) -> Tuple[str, bool]:
+        """
+        OCR a single rendered PDF page and label it with its page number,
+        re-rendering it at OCR_RETRY_DPI if the first pass found little text
+        or was unreliable.
+
+        Returns:
+            Tuple of (page-labelled text, False if OCR failed on the page)
+        """
+        try:
+            if OCR_SKIP_BLANK and _is_blank_page(image_path):
+                logger.info(f"[OCR] Page {page_number} is blank, skipping OCR")
+                return f"--- Page {page_number} ---\n", True
+            page_text, confidence = self._extract_text_with_confidence(image_path, language)
+        finally:
+            os.unlink(image_path)  # Free disk as soon as the page is read
+
+        # Small print can come out empty or as a few fragments at OCR_DPI;
+        # OCR errors (also without a confidence) aren't worth a retry
+        found_chars = len(page_text) if confidence is not None else 0
+        too_short = (
+            found_chars < OCR_MIN_PAGE_CHARS
+            if confidence is not None else page_text == NO_TEXT_DETECTED
+        )
+        low_confidence = confidence is not None and confidence < OCR_MIN_CONFIDENCE
+        ok = confidence is not None or page_text == NO_TEXT_DETECTED
+
+        if too_short or low_confidence:
+            reason = f"{found_chars} characters" if too_short else f"confidence {confidence:.0f}"
+            logger.info(
+                f"[OCR] Page {page_number} {reason} at {OCR_DPI} dpi, "
+                f"retrying at {OCR_RETRY_DPI} dpi"
+            )
+            image_path = render_page(page_number, output_folder, OCR_RETRY_DPI)
+            try:
+                retry_text, retry_confidence = self._extract_text_with_confidence(image_path, language)
+            finally:
+                os.unlink(image_path)
+            if retry_confidence is not None and (
+                len(retry_text) > found_chars if too_short else retry_confidence > confidence
+            ):
+                page_text = retry_text
+
+        return f"--- Page {page_number} ---\n{page_text}", ok
 
     def extract_structured_data(
         self,
@@ -228,291 +1111,344 @@ class OCRService:
                 "error": "Groq client not available for structured extraction"
             }
 
-        if not raw_text or raw_text.startswith("["):
+        if not _is_extractable(raw_text):
             return {
                 "raw_text": raw_text,
                 "error": "No valid text to extract from"
             }
 
-        # Build extraction prompt based on document type
-        if document_type == "invoice":
-            prompt = self._build_invoice_extraction_prompt(raw_text)
-        elif document_type == "purchase_order":
-            prompt = self._build_po_extraction_prompt(raw_text)
-        elif document_type == "msme_certificate":
-            prompt = self._build_msme_certificate_extraction_prompt(raw_text)
-        elif document_type == "delivery_proof":
-            prompt = self._build_delivery_proof_extraction_prompt(raw_text)
-        elif document_type == "communication":
-            prompt = self._build_communication_extraction_prompt(raw_text)
-        elif document_type == "bank_statement":
-            prompt = self._build_bank_statement_extraction_prompt(raw_text)
-        elif document_type == "legal_notice":
-            prompt = self._build_legal_notice_extraction_prompt(raw_text)
-        else:
-            prompt = self._build_generic_extraction_prompt(raw_text)
+        cache_key = self._extraction_cache_key(raw_text, document_type)
+        cached = self._get_cached_extraction(cache_key, document_type)
+        if cached is not None:
+            logger.info("[OCR] Extraction cache hit")
+            cached["raw_text"] = raw_text
+            cached["cache_hit"] = True
+            return cached
+
+        embedding, similar = self._find_similar_extraction(raw_text, document_type)
+        if similar is not None:
+            self._store_extraction(cache_key, similar)
+            similar["raw_text"] = raw_text
+            similar["cache_hit"] = True
+            return similar
+
+        # Cached results need no Groq call, so the breaker only stops new requests
+        if self._groq_circuit_open():
+            return {
+                "raw_text": raw_text,
+                "error": "LLM extraction paused after repeated Groq failures",
+                "extraction_status": "circuit_open"
+            }
+
+        identifiers = _find_identifiers(raw_text)
+        prompt = self._build_extraction_prompt(_prompt_text(raw_text), document_type, identifiers)
+        messages = [
+            {"role": "system", "content": EXTRACTION_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+
+        max_tokens = EXTRACTION_MAX_TOKENS.get(document_type, EXTRACTION_DEFAULT_MAX_TOKENS)
 
         try:
-            response = self.groq_client.chat.completions.create(
-                messages=[
-                    {"role": "system", "content": "You are a document extraction AI. Extract structured data from documents and return valid JSON only. Be precise with numbers and dates."},
-                    {"role": "user", "content": prompt}
-                ],
-                model=self.model,
-                temperature=0.1,  # Low temperature for consistent extraction
-                max_tokens=1024,
-            )
-
-            result_text = response.choices[0].message.content
-
-            # Try to parse JSON from response
-            try:
-                # Find JSON in response (handle markdown code blocks)
-                if "```json" in result_text:
-                    json_str = result_text.split("```json")[1].split("```")[0]
-                elif "```" in result_text:
-                    json_str = result_text.split("```")[1].split("```")[0]
-                else:
-                    json_str = result_text
-
-                extracted_data = json.loads(json_str.strip())
-                extracted_data["raw_text"] = raw_text
+            for attempt in range(EXTRACTION_MAX_ATTEMPTS):
+                response = self.groq_client.chat.completions.create(
+                    messages=messages,
+                    model=self.model,
+                    temperature=0.1,  # Low temperature for consistent extraction
+                    max_tokens=max_tokens,
+                    response_format={"type": "json_object"},
+                )
+                self._record_groq_result(success=True)
+
+                choice = response.choices[0]
+                result_text = choice.message.content
+
+                if choice.finish_reason == "length" and max_tokens < EXTRACTION_DEFAULT_MAX_TOKENS:
+                    # Truncated by the budget rather than wrong: ask again with room
+                    logger.info(f"[OCR] Extraction hit max_tokens={max_tokens}, retrying with {EXTRACTION_DEFAULT_MAX_TOKENS}")
+                    max_tokens = EXTRACTION_DEFAULT_MAX_TOKENS
+                    continue
+
+                try:
+                    extracted_data = self._validate_extraction(result_text, document_type)
+                except (ValueError, ValidationError) as e:
+                    # Show the model its mistake and let it correct itself
+                    logger.warning(f"[OCR] Invalid extraction (attempt {attempt + 1}/{EXTRACTION_MAX_ATTEMPTS}): {e}")
+                    messages = messages + [
+                        {"role": "assistant", "content": result_text},
+                        {"role": "user", "content": f"Your output had an error: {e}\nFix it and return only the corrected JSON object."},
+                    ]
+                    continue
+
+                self._apply_identifiers(extracted_data, identifiers, document_type)
                 extracted_data["extraction_status"] = "success"
+                self._store_extraction(cache_key, extracted_data)
+                if embedding is not None:
+                    self._semantic_caches[document_type].store(embedding, dict(extracted_data))
+                extracted_data["raw_text"] = raw_text
 
                 logger.info(f"[OCR] Successfully extracted structured data: {list(extracted_data.keys())}")
                 return extracted_data
 
-            except json.JSONDecodeError:
-                logger.warning("[OCR] Could not parse LLM response as JSON")
-                return {
-                    "raw_text": raw_text,
-                    "llm_response": result_text,
-                    "extraction_status": "partial"
-                }
+            logger.warning("[OCR] Could not get a valid extraction from the LLM")
+            return {
+                "raw_text": raw_text,
+                "llm_response": result_text,
+                "extraction_status": "partial"
+            }
 
+        except _GROQ_OUTAGE_ERRORS as e:
+            self._record_groq_result(success=False)
+            logger.error(f"[OCR] Groq unavailable for extraction: {e}")
+            return {
+                "raw_text": raw_text,
+                "error": str(e),
+                "extraction_status": "failed"
+            }
         except Exception as e:
-            logger.error(f"[OCR] Error in LLM extraction: {e}")
+            logger.exception(f"[OCR] Error in LLM extraction: {e}")
             return {
                 "raw_text": raw_text,
                 "error": str(e),
                 "extraction_status": "failed"
             }
 
-    def _build_invoice_extraction_prompt(self, raw_text: str) -> str:
-        """Build prompt for invoice data extraction."""
-        return f"""Extract the following information from this invoice text and return as JSON:
-
-Required fields:
-- invoice_number: The invoice/bill number
-- invoice_date: Date of invoice (format: YYYY-MM-DD)
-- due_date: Payment due date if mentioned (format: YYYY-MM-DD)
-- seller_name: Name of the seller/vendor company
-- seller_gstin: Seller's GST number (15 characters)
-- buyer_name: Name of the buyer company
-- buyer_gstin: Buyer's GST number if present
-- total_amount: Total invoice amount (number only, in INR)
-- tax_amount: Tax/GST amount if shown separately
-- items: List of items with description, quantity, rate, amount
-- payment_terms: Payment terms if mentioned
-
-Return ONLY valid JSON, no explanations.
-
-Invoice Text:
----
-{raw_text}
----
-
-JSON:"""
-
-    def _build_po_extraction_prompt(self, raw_text: str) -> str:
-        """Build prompt for purchase order data extraction."""
-        return f"""Extract the following information from this purchase order and return as JSON:
-
-Required fields:
-- po_number: Purchase order number
-- po_date: Date of PO (format: YYYY-MM-DD)
-- buyer_name: Name of the buyer company
-- buyer_address: Buyer's address
-- seller_name: Name of the vendor/supplier
-- items: List of ordered items with description, quantity, rate
-- total_amount: Total PO value
-- delivery_date: Expected delivery date if mentioned
-- payment_terms: Payment terms
-
-Return ONLY valid JSON, no explanations.
-
-Purchase Order Text:
----
-{raw_text}
----
-
-JSON:"""
-
-## TBD - so manyy functions and prompts - need to refactor
-    def _build_generic_extraction_prompt(self, raw_text: str) -> str:
-        """Build prompt for generic document extraction."""
-        return f"""Extract key information from this document and return as JSON:
-
-Try to identify:
-- document_type: What type of document is this?
-- date: Any dates mentioned
-- parties: Names of companies/people involved
-- amounts: Any monetary amounts
-- reference_numbers: Any reference/ID numbers
-- key_details: Other important information
-
-IMPORTANT: If a field is not clearly visible in the text, set it to null. DO NOT make up or guess values.
-
-Return ONLY valid JSON, no explanations.
-
-Document Text:
----
-{raw_text}
----
-
-JSON:"""
-
-    def _build_msme_certificate_extraction_prompt(self, raw_text: str) -> str:
-        """Build prompt for MSME/Udyam certificate extraction."""
-        return f"""Extract the following information from this MSME/Udyam Registration Certificate and return as JSON:
-
-Required fields:
-- udyam_registration_number: The Udyam Registration Number (format: UDYAM-XX-00-0000000)
-- enterprise_name: Name of the enterprise/business
-- enterprise_type: Type (Micro/Small/Medium)
-- owner_name: Name of the owner/proprietor
-- date_of_registration: Registration date (format: YYYY-MM-DD)
-- date_of_incorporation: Incorporation date if mentioned
-- major_activity: NIC code or activity description
-- address: Registered address
-- district: District name
-- state: State name
-- mobile: Mobile number if present
-- email: Email if present
-
-CRITICAL: If a field is not clearly visible in the text, set it to null. DO NOT guess or make up values.
-If the text appears to be garbage/unreadable, set all fields to null and add "extraction_quality": "poor".
-
-Return ONLY valid JSON, no explanations.
-
-Certificate Text:
----
-{raw_text}
----
-
-JSON:"""
-
-    def _build_delivery_proof_extraction_prompt(self, raw_text: str) -> str:
-        """Build prompt for delivery receipt/proof extraction."""
-        return f"""Extract the following information from this delivery receipt/proof and return as JSON:
-
-Required fields:
-- delivery_date: Date of delivery (format: YYYY-MM-DD)
-- delivery_challan_number: Challan/receipt number
-- receiver_name: Name of person who received
-- receiver_signature: Whether signature is present (true/false)
-- sender_name: Sender/supplier company name
-- recipient_company: Receiving company name
-- items_delivered: List of items with quantities
-- vehicle_number: Vehicle/transport details if present
-- remarks: Any remarks or notes
-
-CRITICAL: If a field is not clearly visible in the text, set it to null. DO NOT guess or make up values.
-
-Return ONLY valid JSON, no explanations.
-
-Delivery Proof Text:
----
-{raw_text}
----
-
-JSON:"""
-
-    def _build_communication_extraction_prompt(self, raw_text: str) -> str:
-        """Build prompt for email/communication extraction."""
-        return f"""Extract the following information from this email/communication and return as JSON:
-
-Required fields:
-- date: Date of communication (format: YYYY-MM-DD)
-- from: Sender name/email
-- to: Recipient name/email
-- subject: Subject line
-- key_points: List of main points discussed
-- payment_mentioned: Whether payment/amount is discussed (true/false)
-- amount_mentioned: Any specific amount mentioned
-- deadline_mentioned: Any deadline or due date mentioned
-- tone: Overall tone (formal/informal/threatening/reminder)
-
-CRITICAL: If a field is not clearly visible in the text, set it to null. DO NOT guess or make up values.
+    def _groq_circuit_open(self) -> bool:
+        """True while extraction is paused after repeated Groq failures."""
+        return time.monotonic() < self._groq_open_until
+
+    def _record_groq_result(self, success: bool) -> None:
+        """Track consecutive Groq failures and open the circuit at the threshold."""
+        with self._groq_breaker_lock:
+            if success:
+                self._groq_failures = 0
+                return
+            self._groq_failures += 1
+            if self._groq_failures >= GROQ_BREAKER_THRESHOLD:
+                self._groq_failures = 0
+                self._groq_open_until = time.monotonic() + GROQ_BREAKER_COOLDOWN_SECONDS
+                logger.warning(
+                    f"[OCR] {GROQ_BREAKER_THRESHOLD} consecutive Groq failures, "
+                    f"pausing extraction for {GROQ_BREAKER_COOLDOWN_SECONDS}s"
+                )
+
+    def _build_extraction_prompt(
+        self,
+        raw_text: str,
+        document_type: str,
+        identifiers: Optional[Dict[str, List[str]]] = None,
+    ) -> str:
+        """Build the extraction prompt for a document type around the OCR text."""
+        prefix = self._extraction_prompt_prefix(document_type)
+        verified = ""
+        if identifiers:
+            found = [f"- {label}: {', '.join(values)}" for label, values in identifiers.items() if values]
+            if found:
+                verified = (
+                    "\n\nVerified identifiers found in the document (copy exactly, do not alter):\n"
+                    + "\n".join(found)
+                )
+        return prefix + raw_text + EXTRACTION_PROMPT_TEXT_END + verified + EXTRACTION_PROMPT_SUFFIX
+
+    @staticmethod
+    def _extraction_prompt_prefix(document_type: str) -> str:
+        """Instructions for a document type, falling back to generic."""
+        return EXTRACTION_PROMPT_PREFIXES.get(document_type, EXTRACTION_PROMPT_PREFIXES["generic"])
+
+    @staticmethod
+    def _apply_identifiers(extracted: Dict[str, Any], identifiers: Dict[str, List[str]], document_type: str) -> None:
+        """
+        Replace LLM-copied identifiers with the pattern-matched originals.
 
-Return ONLY valid JSON, no explanations.
+        A GSTIN that matches a found one apart from spacing or case is
+        rewritten to it; a certificate's missing Udyam number is filled in
+        when the text contains exactly one.
+        """
+        gstins = {g: g for g in identifiers["GSTIN"]}
+        for key, value in extracted.items():
+            if key.endswith("gstin") and isinstance(value, str):
+                normalized = re.sub(r"\s", "", value).upper()
+                extracted[key] = gstins.get(normalized, value)
+
+        udyam_numbers = identifiers["Udyam Registration Number"]
+        if document_type == "msme_certificate" and len(udyam_numbers) == 1:
+            value = extracted.get("udyam_registration_number")
+            if not (isinstance(value, str) and _UDYAM_RE.fullmatch(value.strip())):
+                extracted["udyam_registration_number"] = udyam_numbers[0]
+
+    @staticmethod
+    def _validate_extraction(extracted: Any, document_type: str) -> Dict[str, Any]:
+        """
+        Check an extraction against its document type's schema.
 
-Communication Text:
----
-{raw_text}
----
+        Args:
+            extracted: JSON text from the LLM, or an already parsed value
+            document_type: Type of document the extraction is for
 
-JSON:"""
+        Returns:
+            The extraction as a dict, with schema fields normalized
 
-    def _build_bank_statement_extraction_prompt(self, raw_text: str) -> str:
-        """Build prompt for bank statement extraction."""
-        return f"""Extract the following information from this bank statement and return as JSON:
+        Raises:
+            ValueError: If the text is not a JSON object
+            ValidationError: If a field doesn't match the schema
+        """
+        data = orjson.loads(extracted) if isinstance(extracted, str) else extracted
+        if not isinstance(data, dict):
+            raise ValueError("expected a single JSON object")
+        model = EXTRACTION_MODELS.get(document_type)
+        return model.model_validate(data).model_dump(by_alias=True) if model else data
 
-Required fields:
-- account_holder_name: Name on the account
-- account_number: Bank account number (may be partially masked)
-- bank_name: Name of the bank
-- statement_period: Start and end date of statement
-- transactions: List of transactions with date, description, amount, type (credit/debit)
-- opening_balance: Opening balance
-- closing_balance: Closing balance
-- payment_received_from: Any payments received from the buyer in dispute
+    def _find_similar_extraction(self, raw_text: str, document_type: str) -> Tuple[Any, Optional[Dict[str, Any]]]:
+        """
+        Look for an earlier extraction of a near-identical text.
 
-CRITICAL: If a field is not clearly visible in the text, set it to null. DO NOT guess or make up values.
+        Returns:
+            Tuple of (text embedding, reusable extraction). The embedding is
+            None when the semantic cache is disabled or unavailable; the
+            extraction is None unless a similar one passed the value check.
+        """
+        if not EXTRACTION_SEMANTIC_CACHE_ENABLED:
+            return None, None
 
-Return ONLY valid JSON, no explanations.
+        try:
+            from .rag_service import get_rag_service
+            from .semantic_cache import SemanticCache
 
-Bank Statement Text:
----
-{raw_text}
----
+            embedding = get_rag_service().embed_query(raw_text)
+        except Exception as e:
+            logger.warning(f"[OCR] Semantic extraction cache unavailable: {e}")
+            return None, None
+
+        cache = self._semantic_caches.get(document_type)
+        if cache is None:
+            cache = self._semantic_caches.setdefault(document_type, SemanticCache(
+                similarity_threshold=EXTRACTION_SEMANTIC_SIMILARITY,
+                name=f"extraction:{document_type}",
+            ))
+
+        similar = cache.lookup(embedding)
+        if similar is None or not self._values_in_text(similar, raw_text):
+            return embedding, None
+        return embedding, dict(similar)
+
+    @staticmethod
+    def _values_in_text(extracted: Dict[str, Any], raw_text: str) -> bool:
+        """True if every checkable value of an extraction appears in the text."""
+        haystack = re.sub(r"[\s,]", "", raw_text).lower()
+        checked = 0
+        for key, value in extracted.items():
+            if key in _EXTRACTION_META_KEYS or value is None or isinstance(value, bool):
+                continue
+            if isinstance(value, (int, float)):
+                needle = str(int(value)) if float(value).is_integer() else str(value)
+            elif isinstance(value, str) and not _ISO_DATE_RE.match(value):
+                needle = value
+            else:
+                continue
+            needle = re.sub(r"[\s,]", "", needle).lower()
+            if needle and needle not in haystack:
+                return False
+            checked += 1
+        return checked > 0
+
+    def _extraction_cache_key(self, raw_text: str, document_type: str) -> str:
+        """Hash everything that determines an extraction result."""
+        prefix = f"{self.model}|{self.PROMPT_VERSION}|{document_type}|".encode()
+        return hashlib.sha256(prefix + raw_text.encode()).hexdigest()
+
+    def _document_cache_key(self, file_digest: str, document_type: str) -> str:
+        """Hash the file contents with everything else that determines the result."""
+        prefix = f"file|{self.model}|{self.PROMPT_VERSION}|{document_type}|".encode()
+        return hashlib.sha256(prefix + file_digest.encode()).hexdigest()
+
+    @staticmethod
+    def _text_cache_key(file_digest: str, file_type: str) -> str:
+        """Hash the file contents with the settings that determine its OCR text."""
+        prefix = f"text|{OCR_TEXT_CACHE_SETTINGS}|{file_type}|".encode()
+        return hashlib.sha256(prefix + file_digest.encode()).hexdigest()
+
+    def _get_cached_extraction(self, key: str, document_type: str) -> Optional[Dict[str, Any]]:
+        """
+        Return a cached extraction, or None on a miss or an entry that is
+        unreadable or no longer matches the document type's schema.
+        """
+        try:
+            entry = orjson.loads((EXTRACTION_CACHE_DIR / f"{key}.json").read_bytes())
+            return self._validate_extraction(entry, document_type)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, ValidationError) as e:
+            logger.warning(f"[OCR] Ignoring unusable extraction cache entry {key}: {e}")
+            return None
+
+    def _store_extraction(self, key: str, extracted_data: Dict[str, Any]) -> None:
+        """Write an extraction to the cache atomically."""
+        self._write_cache_file(f"{key}.json", orjson.dumps(extracted_data))
+
+    @staticmethod
+    def _get_cached_text(key: str) -> Optional[str]:
+        """Return cached OCR text, or None on a miss or unreadable entry."""
+        try:
+            return (EXTRACTION_CACHE_DIR / f"{key}.txt").read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"[OCR] Ignoring unusable OCR text cache entry {key}: {e}")
+            return None
+
+    @staticmethod
+    def _write_cache_file(filename: str, data: bytes) -> None:
+        """Write a cache file atomically; failures only cost a future miss."""
+        try:
+            EXTRACTION_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile(dir=EXTRACTION_CACHE_DIR, suffix=".tmp", delete=False) as tmp:
+                tmp.write(data)
+            os.replace(tmp.name, EXTRACTION_CACHE_DIR / filename)
+        except OSError as e:
+            logger.warning(f"[OCR] Could not write cache entry {filename}: {e}")
 
-JSON:"""
+    def process_document(
+        self,
+        file_path: str,
+        file_type: str,
+        document_type: str = "invoice"
+    ) -> Dict[str, Any]:
+        """
+        Full document processing pipeline: OCR + structured extraction.
 
-    def _build_legal_notice_extraction_prompt(self, raw_text: str) -> str:
-        """Build prompt for legal notice extraction."""
-        return f"""Extract the following information from this legal notice and return as JSON:
+        Args:
+            file_path: Path to document file
+            file_type: MIME type of file
+            document_type: Type of document for extraction
 
-Required fields:
-- notice_date: Date of notice (format: YYYY-MM-DD)
-- from_party: Who is sending the notice
-- to_party: Who is receiving the notice
-- lawyer_name: Lawyer/advocate name if mentioned
-- subject_matter: What the notice is about
-- amount_claimed: Amount being claimed
-- deadline_given: Response deadline
-- legal_sections_cited: Any laws/sections mentioned
-- relief_sought: What action is demanded
+        Returns:
+            Dictionary with extracted data and metadata
+        """
+        logger.info(f"[OCR] Processing document: {file_path} ({file_type})")
 
-CRITICAL: If a field is not clearly visible in the text, set it to null. DO NOT guess or make up values.
+        # An identical file already processed as this document type skips
+        # both OCR and extraction
+        file_digest, document_key, cached = self._lookup_document(file_path, document_type)
+        if cached is not None:
+            return self._finish_document(cached, None, file_path, file_type, document_type)
 
-Return ONLY valid JSON, no explanations.
+        # Step 1: Extract raw text
+        raw_text = self._extract_raw_text(file_path, file_type, file_digest)
 
-Legal Notice Text:
----
-{raw_text}
----
+        # Step 2: Extract structured data
+        structured_data = self.extract_structured_data(raw_text, document_type)
 
-JSON:"""
+        return self._finish_document(structured_data, document_key, file_path, file_type, document_type)
 
-    def process_document(
+    async def process_document_async(
         self,
         file_path: str,
         file_type: str,
         document_type: str = "invoice"
     ) -> Dict[str, Any]:
         """
-        Full document processing pipeline: OCR + structured extraction.
+        Run process_document on a worker thread so async callers keep serving
+        other requests during OCR and the Groq round trip.
 
         Args:
             file_path: Path to document file
@@ -522,18 +1458,217 @@ JSON:"""
         Returns:
             Dictionary with extracted data and metadata
         """
-        logger.info(f"[OCR] Processing document: {file_path} ({file_type})")
+        return await asyncio.to_thread(self.process_document, file_path, file_type, document_type)
 
-        # Step 1: Extract raw text
+    def process_documents_batch(
+        self,
+        file_paths: List[str],
+        file_types: List[str],
+        document_type: Union[str, Sequence[str]] = "invoice",
+        batch_size: int = EXTRACTION_BATCH_SIZE,
+    ) -> List[Dict[str, Any]]:
+        """
+        Process several documents, packing up to batch_size OCR texts into
+        each extraction request.
+
+        Intended for bulk uploads and evidence packs, where one Groq round
+        trip per document dominates. Files are OCR'd in parallel, cached
+        results are reused, and a group whose batched response can't be
+        parsed falls back to per-document extraction.
+
+        Args:
+            file_paths: Paths to document files
+            file_types: MIME type of each file
+            document_type: Type of document for extraction, either one for
+                all files or one per file
+            batch_size: Maximum documents per extraction request
+
+        Returns:
+            One result dictionary per file, in input order (same shape as
+            process_document)
+        """
+        if isinstance(document_type, str):
+            document_types = [document_type] * len(file_paths)
+        else:
+            document_types = list(document_type)
+        logger.info(f"[OCR] Batch processing {len(file_paths)} documents ({', '.join(sorted(set(document_types)))})")
+
+        results: List[Optional[Dict[str, Any]]] = [None] * len(file_paths)
+        file_digests: List[Optional[str]] = [None] * len(file_paths)
+        document_keys: List[Optional[str]] = [None] * len(file_paths)
+        misses = []
+        for i, file_path in enumerate(file_paths):
+            file_digests[i], document_keys[i], cached = self._lookup_document(file_path, document_types[i])
+            if cached is not None:
+                results[i] = cached
+                document_keys[i] = None  # Already stored under this key
+            else:
+                misses.append(i)
+
+        # Documents are OCR'd on their own pool: page-level OCR already uses
+        # _OCR_POOL, and waiting on it from inside it could deadlock
+        with ThreadPoolExecutor(max_workers=OCR_CONCURRENCY, thread_name_prefix="ocr-doc") as pool:
+            raw_texts = dict(zip(misses, pool.map(
+                lambda i: self._extract_raw_text(file_paths[i], file_types[i], file_digests[i]), misses
+            )))
+
+            pending = []
+            for i in misses:
+                raw_text = raw_texts[i]
+                cached = None
+                if self.groq_client and _is_extractable(raw_text):
+                    cached = self._get_cached_extraction(
+                        self._extraction_cache_key(raw_text, document_types[i]), document_types[i]
+                    )
+                if cached is not None:
+                    cached["raw_text"] = raw_text
+                    cached["cache_hit"] = True
+                    results[i] = cached
+                elif self.groq_client and _is_extractable(raw_text):
+                    pending.append(i)
+                else:
+                    # Nothing to send to the LLM; reuse the single-document errors
+                    results[i] = self.extract_structured_data(raw_text, document_types[i])
+
+            groups = [pending[start:start + batch_size] for start in range(0, len(pending), batch_size)]
+            group_results = pool.map(
+                lambda group: (
+                    self._extract_group([raw_texts[i] for i in group], [document_types[i] for i in group])
+                    if len(group) > 1
+                    else [self.extract_structured_data(raw_texts[group[0]], document_types[group[0]])]
+                ),
+                groups,
+            )
+            for group, extracted in zip(groups, group_results):
+                if extracted is None:
+                    logger.warning("[OCR] Batched extraction failed, falling back to single calls")
+                    extracted = [self.extract_structured_data(raw_texts[i], document_types[i]) for i in group]
+                for i, data in zip(group, extracted):
+                    results[i] = data
+
+        return [
+            self._finish_document(
+                data,
+                document_keys[i],
+                file_paths[i],
+                file_types[i],
+                document_types[i],
+            )
+            for i, data in enumerate(results)
+        ]
+
+    def _extract_group(self, raw_texts: List[str], document_types: List[str]) -> Optional[List[Dict[str, Any]]]:
+        """
+        Extract several documents in a single LLM request.
+
+        Documents of one type share a single set of instructions; a group
+        of mixed types carries each document's instructions with its text.
+
+        Returns:
+            One extraction per text, in order, or None if the response is
+            unusable.
+        """
+        if self._groq_circuit_open():
+            return None
+
+        if len(set(document_types)) == 1:
+            joined = "\n\n".join(f"=== DOC {n} ===\n{_prompt_text(text)}" for n, text in enumerate(raw_texts, 1))
+            prompt = BATCH_EXTRACTION_PREAMBLE.format(count=len(raw_texts)) + self._build_extraction_prompt(joined, document_types[0])
+        else:
+            sections = "\n\n".join(
+                f"=== DOC {n} ===\n{self._extraction_prompt_prefix(document_type)}{_prompt_text(text)}{EXTRACTION_PROMPT_TEXT_END}"
+                for n, (text, document_type) in enumerate(zip(raw_texts, document_types), 1)
+            )
+            prompt = MIXED_BATCH_EXTRACTION_PREAMBLE.format(count=len(raw_texts)) + sections + EXTRACTION_PROMPT_SUFFIX
+
+        try:
+            response = self.groq_client.chat.completions.create(
+                messages=[
+                    {"role": "system", "content": EXTRACTION_SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
+                ],
+                model=self.model,
+                temperature=0.1,
+                max_tokens=sum(EXTRACTION_MAX_TOKENS.get(t, EXTRACTION_DEFAULT_MAX_TOKENS) for t in document_types),
+                response_format={"type": "json_object"},
+            )
+            self._record_groq_result(success=True)
+            documents = orjson.loads(response.choices[0].message.content).get("documents")
+            if not isinstance(documents, list) or len(documents) != len(raw_texts):
+                return None
+            documents = [self._validate_extraction(data, t) for data, t in zip(documents, document_types)]
+        except _GROQ_OUTAGE_ERRORS as e:
+            self._record_groq_result(success=False)
+            logger.warning(f"[OCR] Batched extraction request failed: {e}")
+            return None
+        except Exception as e:
+            logger.warning(f"[OCR] Batched extraction request failed: {e}")
+            return None
+
+        for raw_text, document_type, extracted_data in zip(raw_texts, document_types, documents):
+            extracted_data["extraction_status"] = "success"
+            self._store_extraction(self._extraction_cache_key(raw_text, document_type), extracted_data)
+            extracted_data["raw_text"] = raw_text
+        logger.info(f"[OCR] Extracted {len(documents)} documents in one request")
+        return documents
+
+    def _lookup_document(
+        self, file_path: str, document_type: str
+    ) -> Tuple[Optional[str], Optional[str], Optional[Dict[str, Any]]]:
+        """Return a file's digest, its document cache key and cached result, if any."""
+        try:
+            file_digest = _file_digest(file_path)
+        except OSError as e:
+            logger.warning(f"[OCR] Could not hash {file_path}: {e}")
+            return None, None, None
+
+        document_key = self._document_cache_key(file_digest, document_type)
+        cached = self._get_cached_extraction(document_key, document_type)
+        if cached is not None:
+            logger.info("[OCR] Document cache hit")
+            cached["cache_hit"] = True
+        return file_digest, document_key, cached
+
+    def _extract_raw_text(self, file_path: str, file_type: str, file_digest: Optional[str] = None) -> str:
+        """
+        Run the OCR/text extraction suited to the file type, reusing the text
+        of an identical file when its digest is given.
+        """
+        text_key = self._text_cache_key(file_digest, file_type) if file_digest else None
+        if text_key:
+            raw_text = self._get_cached_text(text_key)
+            if raw_text is not None:
+                logger.info("[OCR] OCR text cache hit")
+                return raw_text
+
+        complete = True
         if "pdf" in file_type.lower():
-            raw_text = self.extract_text_from_pdf(file_path)
+            raw_text, complete = self._read_pdf(file_path)
         elif "image" in file_type.lower():
             raw_text = self.extract_text_from_image(file_path)
         else:
-            raw_text = "[Unsupported file type for OCR]"
+            return "[Unsupported file type for OCR]"
 
-        # Step 2: Extract structured data
-        structured_data = self.extract_structured_data(raw_text, document_type)
+        # Bracketed text is an OCR error or placeholder, and a scan with a
+        # failed page is incomplete; both are worth retrying
+        if text_key and complete and raw_text and not raw_text.startswith("["):
+            self._write_cache_file(f"{text_key}.txt", raw_text.encode("utf-8"))
+        return raw_text
+
+    def _finish_document(
+        self,
+        structured_data: Dict[str, Any],
+        document_key: Optional[str],
+        file_path: str,
+        file_type: str,
+        document_type: str,
+    ) -> Dict[str, Any]:
+        """Cache a successful result under its file key and add file metadata."""
+        if document_key and structured_data.get("extraction_status") == "success":
+            self._store_extraction(
+                document_key,
+                {k: v for k, v in structured_data.items() if k != "cache_hit"},
+            )
 
         # Add file metadata
         structured_data["file_path"] = file_path
@@ -544,15 +1679,10 @@ JSON:"""
 
     def _count_extracted_fields(self, data: Dict[str, Any]) -> int:
         """Count how many fields were successfully extracted (non-null, non-empty)."""
-        excluded_keys = {'raw_text', 'extraction_status', 'file_path', 'file_type',
-                         'document_type', 'error', 'llm_response', 'extraction_quality'}
-        count = 0
-        for key, value in data.items():
-            if key in excluded_keys:
-                continue
-            if value is not None and value != "" and value != []:
-                count += 1
-        return count
+        return sum(
+            1 for key, value in data.items()
+            if key not in self.NON_FIELD_KEYS and value not in self.EMPTY_VALUES
+        )
 
     def format_for_chat(self, extracted_data: Dict[str, Any]) -> str:
         """
@@ -579,23 +1709,8 @@ JSON:"""
         if field_count < 2:
             return self._format_insufficient_extraction(extracted_data)
 
-        # Route to document-specific formatters
-        if doc_type == "invoice":
-            return self._format_invoice(extracted_data)
-        elif doc_type == "purchase_order":
-            return self._format_purchase_order(extracted_data)
-        elif doc_type == "msme_certificate":
-            return self._format_msme_certificate(extracted_data)
-        elif doc_type == "delivery_proof":
-            return self._format_delivery_proof(extracted_data)
-        elif doc_type == "communication":
-            return self._format_communication(extracted_data)
-        elif doc_type == "bank_statement":
-            return self._format_bank_statement(extracted_data)
-        elif doc_type == "legal_notice":
-            return self._format_legal_notice(extracted_data)
-        else:
-            return self._format_generic(extracted_data)
+        schema = self._FORMAT_SCHEMA.get(doc_type, self._FORMAT_SCHEMA["generic"])
+        return self._render(extracted_data, schema)
 
     def _format_failed_extraction(self, data: Dict[str, Any]) -> str:
         """Format message for failed extraction."""
@@ -639,219 +1754,26 @@ Raw text I found:
 
 Please tell me the key details from this {doc_type} so I can proceed with your case."""
 
-    def _format_invoice(self, data: Dict[str, Any]) -> str:
-        """Format invoice extraction."""
-        lines = ["📄 **Invoice Extracted**\n"]
-
-        if data.get("invoice_number"):
-            lines.append(f"**Invoice Number:** {data['invoice_number']}")
-        if data.get("invoice_date"):
-            lines.append(f"**Invoice Date:** {data['invoice_date']}")
-        if data.get("seller_name"):
-            lines.append(f"**Seller:** {data['seller_name']}")
-        if data.get("seller_gstin"):
-            lines.append(f"**Seller GSTIN:** {data['seller_gstin']}")
-        if data.get("buyer_name"):
-            lines.append(f"**Buyer:** {data['buyer_name']}")
-        if data.get("buyer_gstin"):
-            lines.append(f"**Buyer GSTIN:** {data['buyer_gstin']}")
-        if data.get("total_amount"):
-            lines.append(f"**Total Amount:** ₹{data['total_amount']}")
-        if data.get("tax_amount"):
-            lines.append(f"**Tax/GST:** ₹{data['tax_amount']}")
-        if data.get("due_date"):
-            lines.append(f"**Due Date:** {data['due_date']}")
-        if data.get("payment_terms"):
-            lines.append(f"**Payment Terms:** {data['payment_terms']}")
-
-        items = data.get("items", [])
-        if items and isinstance(items, list):
-            lines.append("\n**Items:**")
-            for item in items[:5]:
-                if isinstance(item, dict):
-                    desc = item.get("description", item.get("name", "Item"))
-                    qty = item.get("quantity", "")
-                    amt = item.get("amount", item.get("rate", ""))
-                    lines.append(f"  • {desc} {f'(Qty: {qty})' if qty else ''} {f'- ₹{amt}' if amt else ''}")
-                else:
-                    lines.append(f"  • {item}")
-
-        lines.append("\n✅ *Please verify these details are correct.*")
-        return "\n".join(lines)
-
-    def _format_purchase_order(self, data: Dict[str, Any]) -> str:
-        """Format purchase order extraction."""
-        lines = ["📄 **Purchase Order Extracted**\n"]
-
-        if data.get("po_number"):
-            lines.append(f"**PO Number:** {data['po_number']}")
-        if data.get("po_date"):
-            lines.append(f"**PO Date:** {data['po_date']}")
-        if data.get("buyer_name"):
-            lines.append(f"**Buyer:** {data['buyer_name']}")
-        if data.get("seller_name"):
-            lines.append(f"**Supplier:** {data['seller_name']}")
-        if data.get("total_amount"):
-            lines.append(f"**Total Value:** ₹{data['total_amount']}")
-        if data.get("delivery_date"):
-            lines.append(f"**Delivery Date:** {data['delivery_date']}")
-        if data.get("payment_terms"):
-            lines.append(f"**Payment Terms:** {data['payment_terms']}")
-
-        lines.append("\n✅ *Please verify these details are correct.*")
-        return "\n".join(lines)
-
-    def _format_msme_certificate(self, data: Dict[str, Any]) -> str:
-        """Format MSME/Udyam certificate extraction."""
-        lines = ["📄 **MSME/Udyam Certificate Extracted**\n"]
-
-        if data.get("udyam_registration_number"):
-            lines.append(f"**Udyam Number:** {data['udyam_registration_number']}")
-        if data.get("enterprise_name"):
-            lines.append(f"**Enterprise Name:** {data['enterprise_name']}")
-        if data.get("enterprise_type"):
-            lines.append(f"**Category:** {data['enterprise_type']}")
-        if data.get("owner_name"):
-            lines.append(f"**Owner:** {data['owner_name']}")
-        if data.get("date_of_registration"):
-            lines.append(f"**Registration Date:** {data['date_of_registration']}")
-        if data.get("major_activity"):
-            lines.append(f"**Activity:** {data['major_activity']}")
-        if data.get("state"):
-            lines.append(f"**State:** {data['state']}")
-        if data.get("district"):
-            lines.append(f"**District:** {data['district']}")
-
-        lines.append("\n✅ *Please verify these details are correct.*")
-        return "\n".join(lines)
-
-    def _format_delivery_proof(self, data: Dict[str, Any]) -> str:
-        """Format delivery receipt extraction."""
-        lines = ["📄 **Delivery Proof Extracted**\n"]
-
-        if data.get("delivery_date"):
-            lines.append(f"**Delivery Date:** {data['delivery_date']}")
-        if data.get("delivery_challan_number"):
-            lines.append(f"**Challan Number:** {data['delivery_challan_number']}")
-        if data.get("sender_name"):
-            lines.append(f"**Sender:** {data['sender_name']}")
-        if data.get("recipient_company"):
-            lines.append(f"**Recipient:** {data['recipient_company']}")
-        if data.get("receiver_name"):
-            lines.append(f"**Received By:** {data['receiver_name']}")
-        if data.get("receiver_signature"):
-            lines.append(f"**Signature Present:** {'Yes' if data['receiver_signature'] else 'No'}")
-        if data.get("vehicle_number"):
-            lines.append(f"**Vehicle:** {data['vehicle_number']}")
-
-        items = data.get("items_delivered", [])
-        if items:
-            lines.append("\n**Items Delivered:**")
-            for item in items[:5]:
-                lines.append(f"  • {item}")
+    def _render(self, data: Dict[str, Any], schema: Tuple[str, list, Optional[tuple]]) -> str:
+        """Render extracted fields for chat following a _FORMAT_SCHEMA entry."""
+        title, fields, bullets = schema
+        lines = [f"📄 **{title} Extracted**\n"]
+        lines.extend(
+            f"**{label}:** {fmt(data[key])}"
+            for key, label, fmt in fields
+            if data.get(key)
+        )
+
+        if bullets:
+            key, heading, fmt = bullets
+            items = data.get(key)
+            if items and isinstance(items, list):
+                lines.append(f"\n**{heading}:**")
+                lines.extend(f"  • {fmt(item)}" for item in items[:5])
 
         lines.append("\n✅ *Please verify these details are correct.*")
         return "\n".join(lines)
 
-    def _format_communication(self, data: Dict[str, Any]) -> str:
-        """Format email/communication extraction."""
-        lines = ["📄 **Communication Record Extracted**\n"]
-
-        if data.get("date"):
-            lines.append(f"**Date:** {data['date']}")
-        if data.get("from"):
-            lines.append(f"**From:** {data['from']}")
-        if data.get("to"):
-            lines.append(f"**To:** {data['to']}")
-        if data.get("subject"):
-            lines.append(f"**Subject:** {data['subject']}")
-        if data.get("amount_mentioned"):
-            lines.append(f"**Amount Mentioned:** ₹{data['amount_mentioned']}")
-        if data.get("deadline_mentioned"):
-            lines.append(f"**Deadline:** {data['deadline_mentioned']}")
-        if data.get("tone"):
-            lines.append(f"**Tone:** {data['tone']}")
-
-        key_points = data.get("key_points", [])
-        if key_points:
-            lines.append("\n**Key Points:**")
-            for point in key_points[:5]:
-                lines.append(f"  • {point}")
-
-        lines.append("\n✅ *Please verify these details are correct.*")
-        return "\n".join(lines)
-
-    def _format_bank_statement(self, data: Dict[str, Any]) -> str:
-        """Format bank statement extraction."""
-        lines = ["📄 **Bank Statement Extracted**\n"]
-
-        if data.get("bank_name"):
-            lines.append(f"**Bank:** {data['bank_name']}")
-        if data.get("account_holder_name"):
-            lines.append(f"**Account Holder:** {data['account_holder_name']}")
-        if data.get("account_number"):
-            lines.append(f"**Account Number:** {data['account_number']}")
-        if data.get("statement_period"):
-            lines.append(f"**Period:** {data['statement_period']}")
-        if data.get("opening_balance"):
-            lines.append(f"**Opening Balance:** ₹{data['opening_balance']}")
-        if data.get("closing_balance"):
-            lines.append(f"**Closing Balance:** ₹{data['closing_balance']}")
-
-        lines.append("\n✅ *Please verify these details are correct.*")
-        return "\n".join(lines)
-
-    def _format_legal_notice(self, data: Dict[str, Any]) -> str:
-        """Format legal notice extraction."""
-        lines = ["📄 **Legal Notice Extracted**\n"]
-
-        if data.get("notice_date"):
-            lines.append(f"**Notice Date:** {data['notice_date']}")
-        if data.get("from_party"):
-            lines.append(f"**From:** {data['from_party']}")
-        if data.get("to_party"):
-            lines.append(f"**To:** {data['to_party']}")
-        if data.get("lawyer_name"):
-            lines.append(f"**Advocate:** {data['lawyer_name']}")
-        if data.get("amount_claimed"):
-            lines.append(f"**Amount Claimed:** ₹{data['amount_claimed']}")
-        if data.get("deadline_given"):
-            lines.append(f"**Response Deadline:** {data['deadline_given']}")
-        if data.get("subject_matter"):
-            lines.append(f"**Subject:** {data['subject_matter']}")
-
-        sections = data.get("legal_sections_cited", [])
-        if sections:
-            lines.append(f"**Sections Cited:** {', '.join(sections) if isinstance(sections, list) else sections}")
-
-        lines.append("\n✅ *Please verify these details are correct.*")
-        return "\n".join(lines)
-
-    def _format_generic(self, data: Dict[str, Any]) -> str:
-        """Format generic document extraction."""
-        lines = ["📄 **Document Extracted**\n"]
-
-        if data.get("document_type"):
-            lines.append(f"**Type:** {data['document_type']}")
-        if data.get("date"):
-            lines.append(f"**Date:** {data['date']}")
-        if data.get("parties"):
-            parties = data['parties']
-            if isinstance(parties, list):
-                lines.append(f"**Parties:** {', '.join(parties)}")
-            else:
-                lines.append(f"**Parties:** {parties}")
-        if data.get("amounts"):
-            lines.append(f"**Amounts:** {data['amounts']}")
-        if data.get("reference_numbers"):
-            lines.append(f"**References:** {data['reference_numbers']}")
-        if data.get("key_details"):
-            lines.append(f"**Details:** {data['key_details']}")
-
-        lines.append("\n✅ *Please verify these details are correct.*")
-        return "\n".join(lines)
-
-
 # Singleton instance
 _ocr_service = None
 
@@ -860,5 +1782,7 @@ def get_ocr_service() -> OCRService:
     """Get or create singleton OCR service instance."""
     global _ocr_service
     if _ocr_service is None:
-        _ocr_service = OCRService()
+        with _ocr_lock:
+            if _ocr_service is None:
+                _ocr_service = OCRService()
     return _ocr_service
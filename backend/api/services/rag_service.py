@@ -5,6 +5,9 @@ Handles PDF parsing, text chunking, embeddings, and similarity search.
 
 import os
 import json
+import time
+import hashlib
+import tempfile
 from pathlib import Path
 from typing import List, Dict, Optional, Tuple
 import numpy as np
@@ -12,8 +15,8 @@ import numpy as np
 # PDF parsing
 from pypdf import PdfReader
 
-# Embeddings
-from sentence_transformers import SentenceTransformer
+# Embeddings and re-ranking
+from sentence_transformers import SentenceTransformer, CrossEncoder
 
 # Vector store
 import faiss
@@ -27,40 +30,116 @@ class RAGService:
     VECTOR_DB_DIR = Path(__file__).parent.parent.parent / "data" / "vector_db"
     INDEX_PATH = VECTOR_DB_DIR / "faiss_index.bin"
     METADATA_PATH = VECTOR_DB_DIR / "chunks_metadata.json"
+    # Chunk embeddings from the last build (fp16), so a rebuild only embeds
+    # chunks whose text changed
+    EMBEDDING_CACHE_PATH = VECTOR_DB_DIR / "emb_cache.npz"
 
     # Chunking config
     CHUNK_SIZE = 500  # characters
     CHUNK_OVERLAP = 50  # characters
+    SENTENCE_SEPARATORS = (". ", "? ", "! ", "; ")  # preferred chunk boundaries, in order
 
     # Retrieval config
-    TOP_K = 4  # number of chunks to retrieve
+    TOP_K = int(os.getenv("RAG_TOP_K", "4"))  # number of chunks to retrieve
+
+    # Index config: exact search is fastest for a small knowledge base; past
+    # this many chunks the index is built as IVF-PQ (coarse clusters + product
+    # quantization) so queries only scan NPROBE clusters of compressed codes.
+    # NPROBE 0 scales it with the index: one in NPROBE_FRACTION clusters.
+    IVF_PQ_MIN_CHUNKS = int(os.getenv("RAG_IVF_PQ_MIN_CHUNKS", "10000"))
+    PQ_SUBQUANTIZERS = 48  # must divide the embedding dimension (384)
+    PQ_BITS = 8  # bits per sub-quantizer code: 48 bytes per vector
+    NPROBE = int(os.getenv("RAG_NPROBE", "0"))
+    NPROBE_FRACTION = 16
+
+    # The index files only change on rebuild, so their existence check is
+    # cached instead of stat'ing both files on every chat turn
+    INDEX_CHECK_TTL_SECONDS = 60
 
     # Embedding model (lightweight, good quality)
     EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+    # Chunks per forward pass when indexing; chunks are short (CHUNK_SIZE),
+    # so larger batches than the library default of 32 still fit easily
+    EMBEDDING_BATCH_SIZE = 64
+
+    # Re-ranking config: over-fetch candidates, keep the best few for the prompt
+    RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    RERANK_CANDIDATES = 8
+    RERANK_TOP_K = 3
 
     def __init__(self):
         """Initialize RAG service with embedding model and load index if exists."""
         self.model: Optional[SentenceTransformer] = None
-        self.index: Optional[faiss.IndexFlatL2] = None
+        self.reranker: Optional[CrossEncoder] = None
+        self.index: Optional[faiss.Index] = None
         self.chunks_metadata: List[Dict] = []
         self._loaded = False
+        self._index_available: Optional[bool] = None
+        self._index_checked_at = 0.0
 
     def _ensure_loaded(self):
         """Lazy load the model and index."""
         if self._loaded:
             return
 
-        # Load embedding model
-        self.model = SentenceTransformer(self.EMBEDDING_MODEL)
+        # Load embedding and re-ranking models
+        self.model = self._load_embedding_model()
+        self.reranker = CrossEncoder(self.RERANK_MODEL)
 
         # Load index if exists
         if self.INDEX_PATH.exists() and self.METADATA_PATH.exists():
             self.index = faiss.read_index(str(self.INDEX_PATH))
+            self._configure_index(self.index)
             with open(self.METADATA_PATH, "r", encoding="utf-8") as f:
                 self.chunks_metadata = json.load(f)
 
+            # Indexes from before the switch to cosine similarity hold raw
+            # vectors under L2; normalized queries would rank them wrongly
+            if self.index.metric_type != faiss.METRIC_INNER_PRODUCT:
+                print("Rebuilding L2 index for inner-product search...")
+                result = self.build_index(force_rebuild=True)
+                if result.get("status") == "error":
+                    print(f"Could not rebuild index, keeping the L2 index: {result.get('message')}")
+
         self._loaded = True
 
+    def _load_embedding_model(self) -> SentenceTransformer:
+        """Load the embedding model, in half precision when it runs on a GPU."""
+        model = SentenceTransformer(self.EMBEDDING_MODEL)
+        if model.device.type == "cuda":
+            model.half()
+        return model
+
+    def _create_index(self, embeddings: np.ndarray) -> faiss.Index:
+        """
+        Build a FAISS index sized to the corpus.
+
+        Embeddings are L2-normalized, so inner product is cosine similarity.
+        Small corpora get an exact IndexFlatIP. Large ones get IVF-PQ with
+        about 4*sqrt(N) clusters, which needs enough vectors to train.
+        """
+        count, dimension = embeddings.shape
+
+        if count < self.IVF_PQ_MIN_CHUNKS or dimension % self.PQ_SUBQUANTIZERS:
+            index = faiss.IndexFlatIP(dimension)
+            index.add(embeddings)
+            return index
+
+        nlist = int(4 * np.sqrt(count))
+        index = faiss.index_factory(
+            dimension, f"IVF{nlist},PQ{self.PQ_SUBQUANTIZERS}x{self.PQ_BITS}", faiss.METRIC_INNER_PRODUCT
+        )
+        index.train(embeddings)
+        index.add(embeddings)
+        self._configure_index(index)
+        return index
+
+    def _configure_index(self, index: faiss.Index) -> None:
+        """Apply search-time parameters (nprobe) to IVF indexes."""
+        ivf = faiss.try_extract_index_ivf(index)
+        if ivf is not None:
+            ivf.nprobe = self.NPROBE or max(1, ivf.nlist // self.NPROBE_FRACTION)
+
     def extract_text_from_pdf(self, pdf_path: Path) -> str:
         """Extract text content from a PDF file."""
         reader = PdfReader(pdf_path)
@@ -84,20 +163,20 @@ class RAGService:
         Returns:
             List of chunk dictionaries with text and metadata
         """
-        # Clean text
-        text = text.replace("\n", " ").replace("\r", " ")
+        # Clean text (split() also breaks on newlines)
         text = " ".join(text.split())  # normalize whitespace
+        text_length = len(text)
 
         chunks = []
         start = 0
 
-        while start < len(text):
+        while start < text_length:
             end = start + self.CHUNK_SIZE
 
             # Try to break at sentence boundary
-            if end < len(text):
+            if end < text_length:
                 # Look for sentence ending near the chunk boundary
-                for sep in [". ", "? ", "! ", "; "]:
+                for sep in self.SENTENCE_SEPARATORS:
                     last_sep = text.rfind(sep, start + self.CHUNK_SIZE // 2, end + 50)
                     if last_sep != -1:
                         end = last_sep + 1
@@ -115,7 +194,7 @@ class RAGService:
 
             # Move start with overlap
             start = end - self.CHUNK_OVERLAP
-            if start >= len(text) - self.CHUNK_OVERLAP:
+            if start >= text_length - self.CHUNK_OVERLAP:
                 break
 
         return chunks
@@ -139,7 +218,7 @@ class RAGService:
 
         # Load model
         if self.model is None:
-            self.model = SentenceTransformer(self.EMBEDDING_MODEL)
+            self.model = self._load_embedding_model()
 
         # Find all PDFs
         pdf_files = list(self.KNOWLEDGE_BASE_DIR.glob("*.pdf"))
@@ -179,14 +258,12 @@ class RAGService:
             return {"status": "error", "message": "No chunks extracted from PDFs"}
 
         # Generate embeddings
-        print(f"Generating embeddings for {len(all_chunks)} chunks...")
         chunk_texts = [c["text"] for c in all_chunks]
-        embeddings = self.model.encode(chunk_texts, show_progress_bar=True)
+        embeddings = self._embed_chunks(chunk_texts)
 
         # Create FAISS index
         dimension = embeddings.shape[1]
-        self.index = faiss.IndexFlatL2(dimension)
-        self.index.add(embeddings.astype(np.float32))
+        self.index = self._create_index(embeddings.astype(np.float32))
 
         # Save index
         faiss.write_index(self.index, str(self.INDEX_PATH))
@@ -198,22 +275,100 @@ class RAGService:
 
         stats["total_chunks"] = len(all_chunks)
         stats["embedding_dimension"] = dimension
+        stats["index_type"] = type(self.index).__name__
         stats["status"] = "success"
 
         self._loaded = True
+        self._index_available = True
+        self._index_checked_at = time.monotonic()
 
         return stats
 
-    def search(self, query: str, top_k: Optional[int] = None) -> List[Dict]:
+    def _embedding_cache_key(self, text: str) -> str:
+        """
+        Key a chunk's embedding by model and text. The model's tokenizer is
+        uncased, so case-only edits to a chunk still hit the cache.
+        """
+        return hashlib.sha256(f"{self.EMBEDDING_MODEL}::{text.lower()}".encode("utf-8")).hexdigest()
+
+    def _load_embedding_cache(self) -> Dict[str, np.ndarray]:
+        """Load cached chunk embeddings; a missing or unreadable cache is empty."""
+        if not self.EMBEDDING_CACHE_PATH.exists():
+            return {}
+        try:
+            with np.load(self.EMBEDDING_CACHE_PATH) as data:
+                return dict(zip(data["keys"].tolist(), data["vectors"]))
+        except Exception as e:
+            print(f"Ignoring unreadable embedding cache: {e}")
+            return {}
+
+    def _save_embedding_cache(self, cache: Dict[str, np.ndarray]) -> None:
+        """Write the embedding cache atomically."""
+        with tempfile.NamedTemporaryFile(dir=self.VECTOR_DB_DIR, suffix=".tmp", delete=False) as tmp:
+            np.savez(tmp, keys=np.array(list(cache)), vectors=np.stack(list(cache.values())))
+        os.replace(tmp.name, self.EMBEDDING_CACHE_PATH)
+
+    def _embed_chunks(self, chunk_texts: List[str]) -> np.ndarray:
+        """
+        Embed chunk texts as L2-normalized float32 vectors, reusing vectors
+        cached by earlier builds.
+
+        Only chunks without a cached vector go to the model. The cache is
+        rewritten with just the current chunks, so it doesn't keep vectors
+        for text that was edited or removed.
+        """
+        cache = self._load_embedding_cache()
+        keys = [self._embedding_cache_key(text) for text in chunk_texts]
+        missing = [i for i, key in enumerate(keys) if key not in cache]
+
+        if missing:
+            print(f"Generating embeddings for {len(missing)} of {len(chunk_texts)} chunks...")
+            # encode() sorts texts by length internally, so batches carry little padding
+            vectors = self.model.encode(
+                [chunk_texts[i] for i in missing],
+                batch_size=self.EMBEDDING_BATCH_SIZE,
+                convert_to_numpy=True,
+                show_progress_bar=True,
+            )
+            for i, vector in zip(missing, vectors):
+                cache[keys[i]] = vector.astype(np.float16)
+        else:
+            print(f"Reusing cached embeddings for all {len(chunk_texts)} chunks")
+
+        current = {key: cache[key] for key in keys}
+        if missing or len(current) != len(cache):
+            self._save_embedding_cache(current)
+
+        # The cache keeps the model's raw output; normalize for inner product
+        embeddings = np.stack([current[key] for key in keys]).astype(np.float32)
+        faiss.normalize_L2(embeddings)
+        return embeddings
+
+    def embed_query(self, query: str) -> np.ndarray:
+        """
+        Embed a single query as an L2-normalized float32 vector.
+
+        Normalized vectors let callers use inner product as cosine similarity.
+        """
+        self._ensure_loaded()
+        return self.model.encode([query], normalize_embeddings=True)[0].astype(np.float32)
+
+    def search(
+        self,
+        query: str,
+        top_k: Optional[int] = None,
+        query_embedding: Optional[np.ndarray] = None,
+    ) -> List[Dict]:
         """
         Search for relevant chunks given a query.
 
         Args:
             query: User's query text
             top_k: Number of results to return (default: self.TOP_K)
+            query_embedding: Precomputed embedding from embed_query(), if any
 
         Returns:
-            List of relevant chunks with scores
+            List of relevant chunks, best first, with cosine similarity scores
         """
         self._ensure_loaded()
 
@@ -223,37 +378,81 @@ class RAGService:
         if top_k is None:
             top_k = self.TOP_K
 
-        # Generate query embedding
-        query_embedding = self.model.encode([query])
+        # Generate query embedding unless the caller already has one
+        if query_embedding is None:
+            query_embedding = self.model.encode([query], normalize_embeddings=True)
 
         # Search FAISS index
         distances, indices = self.index.search(
-            query_embedding.astype(np.float32),
+            query_embedding.reshape(1, -1).astype(np.float32),
             min(top_k, len(self.chunks_metadata))
         )
 
         # Build results
         results = []
         for i, idx in enumerate(indices[0]):
-            if idx < len(self.chunks_metadata):
+            # IVF indexes pad with -1 when fewer than top_k vectors are probed
+            if 0 <= idx < len(self.chunks_metadata):
                 chunk = self.chunks_metadata[idx].copy()
                 chunk["score"] = float(distances[0][i])
                 results.append(chunk)
 
         return results
 
-    def get_context_for_query(self, query: str, top_k: Optional[int] = None) -> str:
+    def rerank(self, query: str, results: List[Dict], top_k: Optional[int] = None) -> List[Dict]:
+        """
+        Re-order retrieved chunks with the cross-encoder and keep the best ones.
+
+        Args:
+            query: User's query text
+            results: Chunks returned by search()
+            top_k: Number of chunks to keep (default: self.RERANK_TOP_K)
+
+        Returns:
+            Top chunks sorted by cross-encoder relevance
+        """
+        if not results:
+            return results
+
+        # build_index() marks the service loaded without the re-ranker
+        if self.reranker is None:
+            self.reranker = CrossEncoder(self.RERANK_MODEL)
+
+        if top_k is None:
+            top_k = self.RERANK_TOP_K
+
+        scores = self.reranker.predict([(query, r["text"]) for r in results])
+        for result, score in zip(results, scores):
+            result["rerank_score"] = float(score)
+
+        results.sort(key=lambda r: r["rerank_score"], reverse=True)
+        return results[:top_k]
+
+    def get_context_for_query(
+        self,
+        query: str,
+        top_k: Optional[int] = None,
+        query_embedding: Optional[np.ndarray] = None,
+    ) -> str:
         """
         Get formatted context string for LLM prompt injection.
 
+        Over-fetches candidates from the index and re-ranks them so only the
+        most relevant chunks are injected into the prompt.
+
         Args:
             query: User's query
-            top_k: Number of chunks to retrieve
+            top_k: Number of chunks to include (default: self.RERANK_TOP_K)
+            query_embedding: Precomputed embedding from embed_query(), if any
 
         Returns:
             Formatted context string ready for prompt injection
         """
-        results = self.search(query, top_k)
+        if top_k is None:
+            top_k = self.RERANK_TOP_K
+
+        results = self.search(query, max(top_k, self.RERANK_CANDIDATES), query_embedding)
+        results = self.rerank(query, results, top_k)
 
         if not results:
             return ""
@@ -265,8 +464,12 @@ class RAGService:
         return "\n\n---\n\n".join(context_parts)
 
     def is_index_available(self) -> bool:
-        """Check if the FAISS index is available."""
-        return self.INDEX_PATH.exists() and self.METADATA_PATH.exists()
+        """Check if the FAISS index is available (re-checked every INDEX_CHECK_TTL_SECONDS)."""
+        now = time.monotonic()
+        if self._index_available is None or now - self._index_checked_at > self.INDEX_CHECK_TTL_SECONDS:
+            self._index_available = self.INDEX_PATH.exists() and self.METADATA_PATH.exists()
+            self._index_checked_at = now
+        return self._index_available
 
 
 # Singleton instance for reuse
@@ -0,0 +1,127 @@
+"""
+Semantic cache keyed by query embeddings.
+Maps the embedding of a user message to a previously computed value (an
+assistant response, retrieved RAG context) so near-identical questions can
+skip the work that produced it.
+"""
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import faiss
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticCache:
+    """Embedding-similarity cache backed by an inner-product FAISS index."""
+
+    # Cosine similarity required for a hit (embeddings must be L2-normalized)
+    SIMILARITY_THRESHOLD = 0.92
+    MAX_ENTRIES = 1024
+    TTL_SECONDS = 3600
+
+    def __init__(
+        self,
+        similarity_threshold: Optional[float] = None,
+        max_entries: Optional[int] = None,
+        ttl_seconds: Optional[int] = None,
+        name: str = "response",
+    ):
+        """Initialize an empty cache; the index is created on first insert."""
+        self.name = name
+        self.similarity_threshold = similarity_threshold or self.SIMILARITY_THRESHOLD
+        self.max_entries = max_entries or self.MAX_ENTRIES
+        self.ttl_seconds = ttl_seconds or self.TTL_SECONDS
+
+        self.index: Optional[faiss.IndexIDMap] = None
+        self.entries: "OrderedDict[int, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+        # Lookups and stores may come from worker threads
+        self._lock = threading.Lock()
+
+    def lookup(self, embedding: np.ndarray) -> Optional[Dict[str, Any]]:
+        """
+        Find a cached value whose key embedding is similar enough.
+
+        Args:
+            embedding: L2-normalized query embedding (1-D)
+
+        Returns:
+            The cached value, or None on miss
+        """
+        with self._lock:
+            return self._lookup(embedding)
+
+    def _lookup(self, embedding: np.ndarray) -> Optional[Dict[str, Any]]:
+        """lookup() without locking."""
+        if self.index is None or self.index.ntotal == 0:
+            self.misses += 1
+            return None
+
+        scores, ids = self.index.search(embedding.reshape(1, -1).astype(np.float32), 1)
+        score, entry_id = float(scores[0][0]), int(ids[0][0])
+
+        entry = self.entries.get(entry_id)
+        if entry is None or score < self.similarity_threshold:
+            self.misses += 1
+            return None
+
+        cached_at, value = entry
+        if time.monotonic() - cached_at > self.ttl_seconds:
+            self._evict(entry_id)
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        logger.info(f"[Semantic Cache] {self.name} hit (similarity={score:.3f})")
+        return value
+
+    def store(self, embedding: np.ndarray, value: Dict[str, Any]) -> None:
+        """
+        Cache a value under a query embedding, evicting the oldest entry when full.
+
+        Args:
+            embedding: L2-normalized query embedding (1-D)
+            value: Value to return for similar future queries
+        """
+        with self._lock:
+            self._store(embedding, value)
+
+    def _store(self, embedding: np.ndarray, value: Dict[str, Any]) -> None:
+        """store() without locking."""
+        if self.index is None:
+            self.index = faiss.IndexIDMap(faiss.IndexFlatIP(embedding.shape[-1]))
+
+        while len(self.entries) >= self.max_entries:
+            oldest_id = next(iter(self.entries))
+            self._evict(oldest_id)
+
+        entry_id = self._next_id
+        self._next_id += 1
+        self.index.add_with_ids(
+            embedding.reshape(1, -1).astype(np.float32),
+            np.array([entry_id], dtype=np.int64),
+        )
+        self.entries[entry_id] = (time.monotonic(), value)
+
+    def _evict(self, entry_id: int) -> None:
+        """Remove an entry from both the index and the value store."""
+        self.index.remove_ids(np.array([entry_id], dtype=np.int64))
+        self.entries.pop(entry_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current size."""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }